@@ -2,7 +2,6 @@
 import os
 import datetime
 import logging
-import boto3
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from flask_login import (
@@ -28,25 +27,29 @@ def create_app():
         from app.database import init_db
         init_db(app)
         logger.info("Database (PostgreSQL) initialized")
+        
+        # Staged photo uploads update photo columns from a background thread
+        from app import photo_uploads
+        photo_uploads.init_app(app)
     else:
         logger.info("Using Google Sheets (Database disabled)")
     
+    # --- Request Metrics (latency, DB/S3/PDF time per endpoint) ---
+    from app import metrics
+    if use_database:
+        from app.models import db
+        with app.app_context():
+            metrics.init_app(app, db.engine)
+    else:
+        metrics.init_app(app)
+    
     # --- Initialize Extensions with App Context ---
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message = "Please log in to access this page."
     login_manager.login_message_category = "warning"
     
-    # S3 Client
-    try:
-        # It's better to initialize clients within the app factory
-        # if they depend on app config or need to be request-specific.
-        # For a global client, this is also a good place to do it.
-        s3_client = boto3.client('s3')
-        app.s3_client = s3_client # You can attach it to the app instance
-        logger.info("Initialized Boto3 S3 client")
-    except Exception as e:
-        logger.critical(f"Failed to initialize Boto3 S3 client: {e}", exc_info=True)
+    # S3 client: app.utils.get_s3_client() creates one per process on first use
 
     # --- User Authentication & RBAC ---
     # SECURITY: Passwords are now loaded from environment variables
@@ -121,6 +124,7 @@ def create_app():
 
     with app.app_context():
         # --- Import and Register Blueprints ---
+        from .decorators import permission_required
         from .routes import sne_routes, blood_camp_routes, attendant_routes, baal_satsang_routes, mobile_token_routes, sewa_badges_routes, calling_list_routes, database_viewer_routes
 
         app.register_blueprint(sne_routes.sne_bp)
@@ -136,11 +140,12 @@ def create_app():
         # --- Context Processor ---
         @app.context_processor
         def inject_global_vars():
-            from . import config
+            # Config structures are not injected here: pages fetch them by versioned URL
+            # (config_payload_url) so they are not re-serialised into every render.
+            from .config_payloads import payload_url
             return dict(
-                ROLES_PERMISSIONS=config.ROLES_PERMISSIONS,
                 current_user=current_user,
-                ATTENDANT_BADGE_PREFIX_CONFIG_JS=config.ATTENDANT_BADGE_PREFIX_CONFIG
+                config_payload_url=payload_url
             )
 
         # --- Core Routes ---
@@ -206,16 +211,55 @@ def create_app():
                 return jsonify({'url': url}), 200
             return jsonify({'url': None}), 200
 
+        @app.route('/get_photo_urls', methods=['POST'])
+        @login_required
+        def get_photo_urls():
+            """
+            Returns presigned S3 URLs for many keys in one request: {"keys": [...]} -> {"urls": {key: url or null}}.
+            Pass "variant": "thumbnail" to get URLs of the small listing thumbnails instead.
+            """
+            from . import config, utils
+            payload = request.get_json(silent=True) or {}
+            keys = payload.get('keys')
+            if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+                return jsonify({'error': "Expected JSON body {'keys': [...]}"}), 400
+            if len(keys) > config.PHOTO_URL_BATCH_LIMIT:
+                return jsonify({'error': f"At most {config.PHOTO_URL_BATCH_LIMIT} keys per request"}), 400
+            keys = [k.strip() for k in keys if k and k.strip() not in ['N/A', 'Upload Error']]
+            thumbnails = payload.get('variant') == 'thumbnail'
+            return jsonify({'urls': utils.get_s3_presigned_urls(config.S3_BUCKET_NAME, keys, thumbnails=thumbnails)}), 200
+
         @app.route('/get_centres/<area>')
         @login_required
         def get_centres_for_area(area):
-            from . import config
-            if area in config.SNE_BADGE_CONFIG:
-                centres = sorted(list(config.SNE_BADGE_CONFIG[area].keys()))
-                return jsonify(centres)
+            from . import config_payloads
+            if area in config_payloads.AREA_CENTRES:
+                # Centres only change with a deploy; served from bytes compiled at startup
+                return config_payloads.json_response(config_payloads.AREA_CENTRES[area], max_age=600)
             else:
                 logger.warning(f"Area '{area}' not found in SNE_BADGE_CONFIG for /get_centres route.")
-                return jsonify([])
+                return config_payloads.json_response(config_payloads.NO_CENTRES, max_age=600)
+
+        @app.route('/config/<name>.<digest>.json')
+        @login_required
+        def config_payload(name, digest):
+            from . import config_payloads
+            if name not in config_payloads.PAYLOADS:
+                return jsonify({'success': False, 'message': 'Unknown config payload'}), 404
+            return config_payloads.versioned_response(name, digest)
+        
+        @app.route('/admin/metrics')
+        @login_required
+        @permission_required('view_metrics')
+        def admin_metrics():
+            """Request metrics of all workers, in Prometheus text format."""
+            from . import metrics
+            if not metrics.enabled():
+                return jsonify({'success': False, 'message': 'Metrics are disabled (METRICS_ENABLED=false)'}), 404
+            response = app.response_class(metrics.render_prometheus(), mimetype='text/plain')
+            response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+            response.cache_control.no_store = True
+            return response
         
         # --- Error Handlers ---
         @app.errorhandler(404)
@@ -0,0 +1,165 @@
+"""
+In-Process Caching Utilities
+Small thread-safe TTL cache plus per-table write versions
+Cached values are dropped when their table is written to or the TTL expires
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Table name -> write counter. Bumped after every commit that touched the table,
+# so any cached value computed under an older version is treated as stale.
+_table_versions = {}
+# Condition (not a plain lock) so subscribers can sleep until a version changes
+_versions_changed = threading.Condition()
+
+
+def get_table_version(table_name):
+    """Returns the current write version of a table (0 if never written)."""
+    return _table_versions.get(table_name, 0)
+
+
+def bump_table_version(*table_names):
+    """
+    Marks tables as changed, invalidating cached values that depend on them.
+    Use this after writes that bypass the ORM unit of work (bulk UPDATEs, raw SQL).
+    """
+    with _versions_changed:
+        for table_name in table_names:
+            _table_versions[table_name] = _table_versions.get(table_name, 0) + 1
+        _versions_changed.notify_all()
+    logger.debug(f"Bumped table versions: {', '.join(table_names)}")
+
+
+def wait_for_table_change(table_name, seen_version, timeout):
+    """
+    Blocks until the table's version differs from seen_version or timeout seconds pass.
+
+    Returns:
+        int: The table's current version (equal to seen_version on timeout)
+    """
+    with _versions_changed:
+        _versions_changed.wait_for(lambda: get_table_version(table_name) != seen_version, timeout=timeout)
+        return get_table_version(table_name)
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache with a fixed time-to-live.
+
+    Entries can depend on one or more tables; an entry is discarded as soon as
+    any of those tables has been written since the entry was stored.
+
+    Usage:
+        facet_cache = TTLCache(ttl_seconds=300)
+        facets = facet_cache.get_or_compute('sne_forms', compute_fn, tables=('sne_forms',))
+    """
+
+    def __init__(self, ttl_seconds, max_entries=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _versions_for(self, tables):
+        return tuple(get_table_version(t) for t in tables)
+
+    def get(self, key, tables=()):
+        """Returns the cached value for key, or None if missing, expired or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            expires_at, versions, value = entry
+            if time.monotonic() >= expires_at or versions != self._versions_for(tables):
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, tables=()):
+        """Stores value under key, tagged with the current versions of tables."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, self._versions_for(tables), value)
+            self._prune()
+
+    def _prune(self):
+        """Keeps the cache within max_entries: drops expired entries, then the oldest ones. Caller holds the lock."""
+        if self.max_entries is None or len(self._entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        # Dicts keep insertion order, so the first keys are the oldest entries
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def get_or_compute(self, key, compute_fn, tables=()):
+        """
+        Returns the cached value for key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key
+            compute_fn: Zero-argument callable producing the value
+            tables: Table names the value depends on
+
+        Returns:
+            Cached or freshly computed value
+        """
+        value = self.get(key, tables)
+        if value is not None:
+            return value
+        # Capture versions before computing so a write racing the computation
+        # leaves the stored entry stale instead of hiding the write.
+        versions = self._versions_for(tables)
+        value = compute_fn()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, versions, value)
+            self._prune()
+        return value
+
+    def invalidate(self, key=None):
+        """Drops a single key, or every entry when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def _collect_written_tables(session, flush_context):
+    """after_flush hook: remember which tables this transaction wrote to."""
+    written = session.info.setdefault('written_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            written.add(table)
+
+
+def _publish_written_tables(session):
+    """after_commit hook: bump versions for tables written in the committed transaction."""
+    written = session.info.pop('written_tables', None)
+    if written:
+        bump_table_version(*written)
+
+
+def _discard_written_tables(session):
+    """after_rollback hook: rolled-back writes never became visible."""
+    session.info.pop('written_tables', None)
+
+
+def track_table_writes():
+    """
+    Installs session event hooks that bump table versions on every ORM commit.
+    Safe to call more than once.
+    """
+    if event.contains(Session, 'after_flush', _collect_written_tables):
+        return
+    event.listen(Session, 'after_flush', _collect_written_tables)
+    event.listen(Session, 'after_commit', _publish_written_tables)
+    event.listen(Session, 'after_rollback', _discard_written_tables)
+    logger.info("Table write tracking enabled for in-process caches")
@@ -0,0 +1,106 @@
+"""
+Table Change Feed
+Lets long-lived requests (dashboard event streams) sleep until a table changes.
+
+Commits made by this process bump the table version immediately (see app.cache).
+Writes made by other gunicorn workers are noticed by one watcher thread per process,
+which compares a cheap table fingerprint every CHANGE_FEED_POLL_SECONDS - and only
+while at least one stream is subscribed, so idle workers run no queries.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from app import config
+from app.cache import get_table_version, bump_table_version
+
+logger = logging.getLogger(__name__)
+
+_subscribers = {}  # table name -> [model, subscriber count]
+_lock = threading.Lock()
+_watcher_thread = None
+_watcher_pid = None
+
+
+class SubscriberLimitReached(Exception):
+    """Raised by subscribe() when this process already has max_subscribers open."""
+
+
+@contextmanager
+def subscribe(app, model, max_subscribers=None):
+    """
+    Registers a subscriber for the model's table for the duration of the block.
+
+    Args:
+        app: Flask app (the watcher thread needs an app context for its queries)
+        model: SQLAlchemy model whose table is watched
+        max_subscribers: Refuse the subscription (SubscriberLimitReached) when this many
+            are already open in the process, across all tables (optional)
+
+    Yields:
+        str: Table name, for use with app.cache.wait_for_table_change()
+    """
+    table_name = model.__tablename__
+    with _lock:
+        if max_subscribers is not None and sum(count for _, count in _subscribers.values()) >= max_subscribers:
+            raise SubscriberLimitReached(f"{max_subscribers} change feed subscribers already open")
+        _subscribers.setdefault(table_name, [model, 0])[1] += 1
+        _ensure_watcher(app)
+    try:
+        yield table_name
+    finally:
+        with _lock:
+            _subscribers[table_name][1] -= 1
+            if _subscribers[table_name][1] <= 0:
+                del _subscribers[table_name]
+
+
+def subscriber_count():
+    """Number of open subscriptions in this process."""
+    with _lock:
+        return sum(count for _, count in _subscribers.values())
+
+
+def _ensure_watcher(app):
+    """Starts the watcher thread if none is running in this process. Caller holds _lock."""
+    global _watcher_thread, _watcher_pid
+    if _watcher_thread and _watcher_thread.is_alive() and _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    _watcher_thread = threading.Thread(target=_watch, args=(app,), name='change-feed', daemon=True)
+    _watcher_thread.start()
+    logger.info(f"Started change feed watcher (pid={_watcher_pid})")
+
+
+def _watch(app):
+    from app import db_helpers
+
+    global _watcher_thread
+    seen = {}  # table name -> (version, fingerprint) at the last check
+    while True:
+        with _lock:
+            if not _subscribers:
+                # Exit under the lock so a new subscriber starts a fresh watcher
+                _watcher_thread = None
+                logger.info("Change feed watcher stopped (no subscribers)")
+                return
+            watched = {table_name: model for table_name, (model, _) in _subscribers.items()}
+
+        for table_name, model in watched.items():
+            try:
+                with app.app_context():
+                    fingerprint = db_helpers.get_table_fingerprint(model)
+            except Exception as e:
+                logger.warning(f"Change feed could not read {table_name}: {e}")
+                continue
+            version = get_table_version(table_name)
+            previous = seen.get(table_name)
+            # Only bump for writes this process has not already announced itself
+            if previous and previous[1] != fingerprint and previous[0] == version:
+                logger.debug(f"Change feed: {table_name} changed in another worker")
+                bump_table_version(table_name)
+            seen[table_name] = (get_table_version(table_name), fingerprint)
+
+        time.sleep(config.CHANGE_FEED_POLL_SECONDS)
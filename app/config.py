@@ -15,11 +15,28 @@ if not SECRET_KEY:
         sys.exit(1)
 
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # Max upload size (16MB)
+# Werkzeug spools multipart bodies larger than 500KB to a temp file, so photos reach the
+# handlers as on-disk streams; the settings below keep the S3 side bounded as well
+S3_MULTIPART_CHUNK_BYTES = int(os.environ.get('S3_MULTIPART_CHUNK_MB', '5')) * 1024 * 1024  # S3 minimum part size is 5MB
+S3_UPLOAD_MAX_CONCURRENCY = int(os.environ.get('S3_UPLOAD_MAX_CONCURRENCY', '2'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 # --- S3 Configuration ---
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'rssbsne')
 AWS_REGION = os.environ.get('AWS_REGION', 'ap-south-1')
+PRESIGNED_URL_EXPIRATION = 3600  # Seconds a photo URL stays valid
+PRESIGNED_URL_REFRESH_MARGIN = 300  # Cached URLs are re-signed this long before they expire
+PRESIGNED_URL_CACHE_SIZE = int(os.environ.get('PRESIGNED_URL_CACHE_SIZE', '5000'))
+PHOTO_URL_BATCH_LIMIT = 200  # Max keys per /get_photo_urls request
+
+# --- Staged Photo Uploads ---
+# Submissions write photos to a local spool and return immediately; a background
+# thread uploads them to S3 (set PHOTO_UPLOAD_ASYNC=false to upload inline)
+PHOTO_UPLOAD_ASYNC = os.environ.get('PHOTO_UPLOAD_ASYNC', 'true').lower() in ('true', '1', 'yes')
+PHOTO_SPOOL_DIR = os.environ.get('PHOTO_SPOOL_DIR', 'instance/photo_spool')
+PHOTO_UPLOAD_MAX_RETRIES = int(os.environ.get('PHOTO_UPLOAD_MAX_RETRIES', '5'))
+# Failed and abandoned jobs in the spool are retried on this schedule, busy queue or not
+PHOTO_UPLOAD_SWEEP_SECONDS = int(os.environ.get('PHOTO_UPLOAD_SWEEP_SECONDS', '300'))
 
 # --- Google Sheets & Service Accounts ---
 # SECURITY: Store service account JSON files outside the repository in production
@@ -75,12 +92,34 @@ SNE_TEXT_ELEMENTS = {
     "area":     {"coords": (100, 1950), "size": 110, "color": "black", "is_bold": True},
     "address":  {"coords": (1750, 250), "size": 110, "color": "black", "is_bold": True}
 }
+SNE_BADGE_SIZE_MM = (125, 80)
+# SNE badge background pre-scaled to print resolution (the template above is ~3x larger than
+# needed). Built by scripts/build_badge_assets.py - rerun it after changing sne_badge.png.
+# Coordinates above stay in template pixels; they are scaled using the asset's metadata.
+SNE_BADGE_PRINT_DPI = 300
+# Layered badges embed stored photos larger than their box at this resolution downscaled
+# (photos stored before ingest was added are camera originals)
+BADGE_PHOTO_PRINT_DPI = SNE_BADGE_PRINT_DPI
+SNE_BADGE_ASSET_PATH = 'app/static/images/build/sne_badge.json'
+# SNE and attendant badge text as real PDF text (embedded font subsets) instead of pixels
+BADGE_VECTOR_TEXT = os.environ.get('BADGE_VECTOR_TEXT', 'true').lower() in ('true', '1', 'yes')
 ATTENDANT_BADGE_SEWADAR_TEMPLATE_PATH = 'app/static/images/sne_attendant_badge_sewadar.png'
 ATTENDANT_BADGE_FAMILY_TEMPLATE_PATH = 'app/static/images/sne_attendant_badge_family.png'
 ATTENDANT_PHOTO_PASTE_X_PX = 70; ATTENDANT_PHOTO_PASTE_Y_PX = 100
 ATTENDANT_PHOTO_BOX_WIDTH_PX = 100; ATTENDANT_PHOTO_BOX_HEIGHT_PX = 140
 ATTENDANT_SNE_PHOTO_PASTE_X_PX = 575; ATTENDANT_SNE_PHOTO_PASTE_Y_PX = 100
 ATTENDANT_SNE_PHOTO_BOX_WIDTH_PX = 100; ATTENDANT_SNE_PHOTO_BOX_HEIGHT_PX = 140
+# Uploaded photos are shrunk (aspect kept) until just covering the largest badge photo box,
+# EXIF-rotated and re-encoded before they go to S3 (PHOTO_INGEST=false stores the raw upload)
+PHOTO_INGEST_ENABLED = os.environ.get('PHOTO_INGEST', 'true').lower() in ('true', '1', 'yes')
+PHOTO_MAX_WIDTH_PX = max(SNE_PHOTO_BOX_WIDTH_PX, ATTENDANT_PHOTO_BOX_WIDTH_PX, ATTENDANT_SNE_PHOTO_BOX_WIDTH_PX)
+PHOTO_MAX_HEIGHT_PX = max(SNE_PHOTO_BOX_HEIGHT_PX, ATTENDANT_PHOTO_BOX_HEIGHT_PX, ATTENDANT_SNE_PHOTO_BOX_HEIGHT_PX)
+PHOTO_OUTPUT_FORMAT = os.environ.get('PHOTO_OUTPUT_FORMAT', 'JPEG').upper()  # JPEG or WEBP
+PHOTO_OUTPUT_QUALITY = int(os.environ.get('PHOTO_OUTPUT_QUALITY', '85'))
+PHOTO_KEEP_ORIGINAL = os.environ.get('PHOTO_KEEP_ORIGINAL', 'false').lower() in ('true', '1', 'yes')  # Also store raw upload under originals/
+PHOTO_ORIGINAL_PREFIX = 'originals/'  # Kept original of <key> is stored at originals/<key>.orig (type in its ContentType)
+PHOTO_THUMBNAIL_SIZE_PX = int(os.environ.get('PHOTO_THUMBNAIL_SIZE_PX', '128'))  # Listing thumbnails (long side)
+PHOTO_THUMBNAIL_PREFIX = 'thumbnails/'  # Thumbnail of <key> is stored at thumbnails/<key>.jpg
 ATTENDANT_TEXT_ELEMENTS = {
     "badge_id": {"coords": (20, 250), "size": 27, "color": (0,0,139), "is_bold": True},
     "name":     {"coords": (20, 290), "size": 25, "color": "black", "is_bold": True},
@@ -302,6 +341,46 @@ REASON_COLORS = ['#a855f7', '#ec4899', '#f59e0b', '#10b981', '#0ea5e9', '#6366f1
 DONOR_TYPE_COLORS = {'First-Time': '#3b82f6', 'Repeat': '#f97316'}
 AGE_GROUP_BINS = [(18, 25), (26, 35), (36, 45), (46, 55), (56, 65), (66, 120)]
 
+# --- Blood Camp Dashboard Updates ---
+# Dashboards subscribe to /blood_camp/dashboard_stream (Server-Sent Events) and get a new
+# snapshot only when donors change. Each open stream holds a worker thread for up to
+# DASHBOARD_STREAM_MAX_SECONDS; under sync gunicorn workers (the default `gunicorn -w N`) a few
+# open dashboards would block every form submission, and the worker timeout kills the stream.
+# Streaming is therefore on by default only with threaded workers (GUNICORN_THREADS > 1, with
+# `--worker-class gthread --threads N`); otherwise dashboards poll dashboard_data.
+# DASHBOARD_STREAM_ENABLED=true/false overrides the detection.
+_gunicorn_threads = int(os.environ.get('GUNICORN_THREADS', '1') or '1')
+DASHBOARD_STREAM_ENABLED = os.environ.get(
+    'DASHBOARD_STREAM_ENABLED', 'true' if _gunicorn_threads > 1 else 'false'
+).lower() in ('true', '1', 'yes')
+DASHBOARD_STREAM_MAX_SECONDS = int(os.environ.get('DASHBOARD_STREAM_MAX_SECONDS', '600'))  # Client reconnects after this
+# Open streams per worker process; keep it below GUNICORN_THREADS so form submissions always
+# find a free thread. Further dashboards get a 503 and poll dashboard_data instead.
+DASHBOARD_STREAM_MAX_CLIENTS = int(os.environ.get('DASHBOARD_STREAM_MAX_CLIENTS', str(max(1, _gunicorn_threads // 2))))
+DASHBOARD_STREAM_HEARTBEAT_SECONDS = 15  # Keep-alive comment so proxies don't drop idle streams
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '30'))
+# How often each worker checks for donor changes made by other workers (only while streams are open)
+CHANGE_FEED_POLL_SECONDS = float(os.environ.get('CHANGE_FEED_POLL_SECONDS', '5'))
+
+# --- Blood Donation Certificates ---
+CERTIFICATE_BATCH_MAX = int(os.environ.get('CERTIFICATE_BATCH_MAX', '1000'))  # Certificates per batch PDF
+
+# --- Blood Donor Status Updates ---
+STATUS_BULK_MAX = int(os.environ.get('STATUS_BULK_MAX', '500'))  # Donor status updates per /blood_camp/update_status_bulk request
+
+# --- Request Metrics ---
+# Per-endpoint latency, DB/S3/PDF time per request; served to admins at /admin/metrics (Prometheus text)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Workers share their totals through files here, so a scrape counts all workers whichever one answers;
+# must be one directory for all workers of the app (empty = each worker reports only itself)
+METRICS_DIR = os.environ.get('METRICS_DIR', 'instance/metrics')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))  # Max staleness of other workers' totals
+
+# --- Offline Submission Sync ---
+# Operator clients queue forms while the venue link is down and flush them to
+# /blood_camp/sync and /sne/sync in batches
+SYNC_BATCH_MAX = int(os.environ.get('SYNC_BATCH_MAX', '200'))  # Queued forms per sync request
+
 # --- Baal Satsang Token Types (Keep as is) ---
 BAAL_SATSANG_TOKEN_TYPES = {
     "sangat": "Baal Satsang Token Sangat",
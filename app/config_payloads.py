@@ -0,0 +1,68 @@
+"""
+Config Payloads
+Config-derived JSON for the area/centre dropdowns, serialised once at startup.
+
+Each payload is stored as (body bytes, content hash). Requests serve the stored bytes
+instead of sorting and serialising the config on every call, and pages reference the
+payloads by a hashed URL (/config/<name>.<hash>.json) that browsers can cache until
+a deploy changes the config - at which point the hash, and so the URL, changes.
+"""
+import hashlib
+import json
+from types import MappingProxyType
+
+from flask import Response, request, url_for, redirect
+
+from app import config
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _compile(data):
+    """Serialises data to compact JSON bytes and returns (body, content hash)"""
+    body = json.dumps(data, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()[:16]
+
+
+# Name -> (body, hash), served at /config/<name>.<hash>.json. Centre lists are not here:
+# forms load them per area from /get_centres/<area> (AREA_CENTRES below).
+PAYLOADS = MappingProxyType({
+    'attendant_prefixes': _compile(config.ATTENDANT_BADGE_PREFIX_CONFIG),
+})
+
+# Area -> (body, hash) for the /get_centres/<area> route
+AREA_CENTRES = MappingProxyType({
+    area: _compile(sorted(centres)) for area, centres in config.SNE_BADGE_CONFIG.items()
+})
+NO_CENTRES = _compile([])
+
+
+def payload_url(name):
+    """Versioned URL of a payload, for use in templates"""
+    return url_for('config_payload', name=name, digest=PAYLOADS[name][1])
+
+
+def json_response(payload, max_age):
+    """
+    Response for a precompiled (body, hash) payload, answering If-None-Match with 304.
+    Only login-protected routes use this, hence private.
+    """
+    body, digest = payload
+    response = Response(body, mimetype='application/json')
+    response.set_etag(digest)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if max_age >= IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+def versioned_response(name, digest):
+    """
+    Serves a payload by its hashed URL. A stale hash (a page rendered before a deploy)
+    redirects to the current URL instead of serving new content under the old name.
+    """
+    payload = PAYLOADS[name]
+    if digest != payload[1]:
+        return redirect(payload_url(name))
+    return json_response(payload, IMMUTABLE_MAX_AGE)
@@ -5,14 +5,27 @@ Replaces Google Sheets utility functions with database equivalents
 """
 import logging
 import os
-from datetime import datetime
-from sqlalchemy import func, and_, or_, text
+import zlib
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, and_, or_, text, select, literal, union_all, case, update, insert, bindparam
 from sqlalchemy.exc import IntegrityError
-from app.models import db, SNEForm, BloodCampDonor, Attendant
+from app.models import db, SNEForm, BloodCampDonor, Attendant, SubmissionKey
 from app.database import DatabaseConfig
+from app.cache import TTLCache, bump_table_version
 
 logger = logging.getLogger(__name__)
 
+# Distinct filter values change rarely; writes invalidate immediately, the TTL
+# bounds staleness across gunicorn workers (each worker has its own cache).
+_facet_cache = TTLCache(ttl_seconds=int(os.environ.get('FACET_CACHE_TTL', '300')))
+
+# Admin statistics are cached briefly; recent_24h windows move with the clock.
+_stats_cache = TTLCache(ttl_seconds=int(os.environ.get('STATS_CACHE_TTL', '30')))
+
+# Table fingerprints behind conditional GET ETags; this worker's writes invalidate them
+# immediately, the TTL bounds how long other workers' writes go unnoticed.
+_fingerprint_cache = TTLCache(ttl_seconds=float(os.environ.get('FINGERPRINT_CACHE_TTL', '5')))
+
 
 # ============================================================================
 # Database Compatibility Helpers
@@ -37,6 +50,73 @@ def case_insensitive_like(column, pattern):
         return column.ilike(pattern)
 
 
+def conditional_count(condition):
+    """
+    Count of rows matching condition, usable alongside other aggregates in one scan.
+    
+    Args:
+        condition: SQLAlchemy boolean expression
+        
+    Returns:
+        SQLAlchemy aggregate expression (0 when no rows match)
+    """
+    if DatabaseConfig.use_sqlite():
+        # SQLite: portable conditional aggregation
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    else:
+        # PostgreSQL: Use native aggregate FILTER clause
+        return func.count().filter(condition)
+
+
+def begin_id_allocation_transaction():
+    """
+    Start the ID-allocation transaction with the write lock already held (SQLite only).
+    
+    SQLite's default deferred BEGIN takes the write lock only at the INSERT, so two
+    submissions can read the same MAX() and collide, or fail with "database is locked"
+    when upgrading their read snapshot. BEGIN IMMEDIATE takes the lock up front and
+    concurrent allocators queue on busy_timeout instead. PostgreSQL uses advisory
+    locks instead, so this is a no-op there.
+    """
+    if not DatabaseConfig.use_sqlite() or not DatabaseConfig.sqlite_tuning_enabled():
+        return
+    
+    session = db.session()
+    if session.in_transaction():
+        if session.in_nested_transaction() or session.new or session.dirty or session.deleted:
+            # Caller owns pending work in this transaction; keep it as-is
+            return
+        if session.connection().get_execution_options().get('sqlite_begin_mode') == 'IMMEDIATE':
+            return
+        # End the read-only transaction (e.g., earlier duplicate checks) so the next BEGIN can be IMMEDIATE
+        session.commit()
+    
+    session.connection(execution_options={'sqlite_begin_mode': 'IMMEDIATE'})
+
+
+def advisory_lock_id(lock_key):
+    """
+    Stable 31-bit advisory lock ID for a key.
+    
+    Python's hash() is salted per process, so every gunicorn worker would lock a
+    different ID for the same sequence; CRC32 gives all workers the same ID.
+    """
+    return zlib.crc32(lock_key.encode('utf-8')) & 0x7FFFFFFF
+
+
+def acquire_id_allocation_lock(lock_key):
+    """
+    Serialize ID allocation for lock_key across workers (PostgreSQL only).
+    
+    Uses a transaction-scoped advisory lock: it is released by the COMMIT/ROLLBACK
+    that ends the INSERT, and leaves nothing behind on the server connection, so it
+    is safe behind PgBouncer in transaction mode (session-level pg_advisory_lock is not).
+    The caller must insert the allocated ID in the same session transaction without
+    committing in between.
+    """
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': advisory_lock_id(lock_key)})
+
+
 # ============================================================================
 # SNE Form Database Functions
 # ============================================================================
@@ -59,17 +139,13 @@ def get_next_sne_badge_id_postgres(area, centre, prefix, start_num):
     try:
         # Use PostgreSQL advisory lock for PostgreSQL
         if not DatabaseConfig.use_sqlite():
-            # Use PostgreSQL advisory lock based on area+centre+prefix hash
+            # Use PostgreSQL advisory lock based on area+centre+prefix
             # This ensures only one transaction generates IDs for this area/centre at a time
             # Different area/centre combinations can generate IDs concurrently
-            lock_key = f"{area}|{centre}|{prefix}"
-            lock_id = abs(hash(lock_key)) % (2**31)  # Convert to 32-bit integer
-            
-            # Acquire advisory lock (automatically released at transaction end)
-            db.session.execute(text(f"SELECT pg_advisory_xact_lock({lock_id})"))
-        
-        # SQLite uses database-level locking automatically within a transaction
-        # No explicit lock needed - the EXCLUSIVE lock is acquired on write
+            acquire_id_allocation_lock(f"{area}|{centre}|{prefix}")
+        else:
+            # SQLite: hold the database write lock (BEGIN IMMEDIATE) until the INSERT commits
+            begin_id_allocation_transaction()
         
         # Find maximum badge ID for this specific area+centre+prefix combination
         # This keeps each centre's sequence independent within their designated range
@@ -148,6 +224,13 @@ def get_sne_by_badge_id(badge_id):
     return SNEForm.query.filter_by(badge_id=badge_id).first()
 
 
+def get_sne_photo_filenames(badge_ids):
+    """Photo column of these SNE badges in one query: dict badge_id -> photo_filename."""
+    if not badge_ids:
+        return {}
+    return dict(db.session.query(SNEForm.badge_id, SNEForm.photo_filename).filter(SNEForm.badge_id.in_(set(badge_ids))).all())
+
+
 def get_all_sne_forms(area=None, centre=None, limit=None):
     """
     Get all SNE forms with optional filters.
@@ -176,7 +259,7 @@ def get_all_sne_forms(area=None, centre=None, limit=None):
 
 
 def create_sne_form(badge_id, submission_date, area, satsang_place, first_name, 
-                    last_name, **kwargs):
+                    last_name, submission_key=None, **kwargs):
     """
     Create new SNE form record.
     
@@ -187,6 +270,7 @@ def create_sne_form(badge_id, submission_date, area, satsang_place, first_name,
         satsang_place: Centre/Satsang place
         first_name: First name
         last_name: Last name
+        submission_key: Idempotency key of the submitted form (optional), saved with the record
         **kwargs: Additional fields
         
     Returns:
@@ -204,6 +288,8 @@ def create_sne_form(badge_id, submission_date, area, satsang_place, first_name,
         )
         
         db.session.add(sne)
+        if submission_key:
+            db.session.add(SubmissionKey(kind=SUBMISSION_KIND_SNE, key=submission_key, record_id=badge_id))
         db.session.commit()
         
         logger.info(f"Created SNE form: {badge_id}")
@@ -213,6 +299,10 @@ def create_sne_form(badge_id, submission_date, area, satsang_place, first_name,
         db.session.rollback()
         error_str = str(e.orig)
         
+        # The same form was recorded by a concurrent request (e.g., a double-clicked Submit)
+        if submission_key and get_submission_record_ids(SUBMISSION_KIND_SNE, [submission_key]):
+            logger.warning(f"SNE submission {submission_key} already recorded, not creating {badge_id}")
+            return None, False, "DUPLICATE_SUBMISSION"
         # Check if it's a duplicate badge_id error
         if 'badge_id' in error_str and 'already exists' in error_str:
             logger.error(f"Duplicate badge_id error for {badge_id}: {e}")
@@ -346,14 +436,11 @@ def get_next_donor_id_postgres(prefix="BD"):
     try:
         # Use PostgreSQL advisory lock for PostgreSQL
         if not DatabaseConfig.use_sqlite():
-            # Use PostgreSQL advisory lock based on prefix hash
-            lock_id = abs(hash(prefix)) % (2**31)
-            
-            # Acquire advisory lock (automatically released at transaction end)
-            db.session.execute(text(f"SELECT pg_advisory_xact_lock({lock_id})"))
-        
-        # SQLite uses database-level locking automatically within a transaction
-        # No explicit lock needed - the EXCLUSIVE lock is acquired on write
+            # Use PostgreSQL advisory lock based on prefix
+            acquire_id_allocation_lock(prefix)
+        else:
+            # SQLite: hold the database write lock (BEGIN IMMEDIATE) until the INSERT commits
+            begin_id_allocation_transaction()
         
         # Find maximum donor ID for this prefix (globally unique)
         max_donor_row = db.session.query(
@@ -418,6 +505,36 @@ def find_donor_by_mobile_and_name_postgres(mobile_number, donor_name):
         return None
 
 
+def donor_name_matches(stored_name, donor_name):
+    """Name rule of find_donor_by_mobile_and_name_postgres: case-insensitive partial match, trimmed."""
+    return donor_name.strip().lower() in (stored_name or '').strip().lower()
+
+
+def find_donors_by_mobile_and_name_postgres(pairs):
+    """
+    Batch form of find_donor_by_mobile_and_name_postgres: one query for many donors.
+    
+    Args:
+        pairs: Iterable of (cleaned mobile number, donor name)
+        
+    Returns:
+        dict: (mobile number, donor name) -> latest matching BloodCampDonor, for the pairs that match
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    candidates = BloodCampDonor.query.filter(
+        BloodCampDonor.mobile_number.in_({mobile_number for mobile_number, _ in pairs})
+    ).order_by(BloodCampDonor.submission_timestamp.desc()).all()
+    found = {}
+    for mobile_number, donor_name in pairs:
+        donor = next((candidate for candidate in candidates
+                      if candidate.mobile_number == mobile_number and donor_name_matches(candidate.name_of_donor, donor_name)), None)
+        if donor:
+            found[(mobile_number, donor_name)] = donor
+    return found
+
+
 def get_donor_by_id(donor_id):
     """Get blood donor by donor ID"""
     return BloodCampDonor.query.filter_by(donor_id=donor_id).first()
@@ -450,7 +567,29 @@ def get_all_donors(area=None, status=None, limit=None):
     return query.all()
 
 
-def create_blood_donor(donor_id, mobile_number, name_of_donor, **kwargs):
+def get_accepted_donors(donor_ids=None, donation_date=None):
+    """
+    Accepted donors selected by donor ID and/or donation date, in one query (certificate batches).
+    
+    Args:
+        donor_ids: List of donor IDs (optional)
+        donation_date: date object (optional)
+        
+    Returns:
+        List of BloodCampDonor objects ordered by donor ID
+    """
+    # Status is matched the way the certificate lookup does (sheet-migrated rows vary in case)
+    query = BloodCampDonor.query.filter(func.lower(func.trim(BloodCampDonor.status)) == 'accepted')
+    
+    if donor_ids is not None:
+        query = query.filter(BloodCampDonor.donor_id.in_(donor_ids))
+    if donation_date:
+        query = query.filter(BloodCampDonor.donation_date == donation_date)
+    
+    return query.order_by(BloodCampDonor.donor_id).all()
+
+
+def create_blood_donor(donor_id, mobile_number, name_of_donor, submission_key=None, **kwargs):
     """
     Create new blood donor record.
     
@@ -458,6 +597,7 @@ def create_blood_donor(donor_id, mobile_number, name_of_donor, **kwargs):
         donor_id: Unique donor ID
         mobile_number: Mobile number
         name_of_donor: Donor name
+        submission_key: Idempotency key of the submitted form (optional), saved with the record
         **kwargs: Additional fields
         
     Returns:
@@ -473,6 +613,8 @@ def create_blood_donor(donor_id, mobile_number, name_of_donor, **kwargs):
         )
         
         db.session.add(donor)
+        if submission_key:
+            db.session.add(SubmissionKey(kind=SUBMISSION_KIND_BLOOD_CAMP, key=submission_key, record_id=donor_id))
         db.session.commit()
         
         logger.info(f"Created blood donor: {donor_id}")
@@ -482,6 +624,10 @@ def create_blood_donor(donor_id, mobile_number, name_of_donor, **kwargs):
         db.session.rollback()
         error_str = str(e.orig)
         
+        # The same form was recorded by a concurrent request (e.g., a double-clicked Submit)
+        if submission_key and get_submission_record_ids(SUBMISSION_KIND_BLOOD_CAMP, [submission_key]):
+            logger.warning(f"Blood camp submission {submission_key} already recorded, not creating {donor_id}")
+            return None, False, "DUPLICATE_SUBMISSION"
         # Check if it's a duplicate donor_id error
         if 'donor_id' in error_str and 'already exists' in error_str:
             logger.error(f"Duplicate donor_id error for {donor_id}: {e}")
@@ -530,6 +676,64 @@ def update_donor_status(donor_id, status, reason_for_rejection=None):
         return False
 
 
+def update_donor_statuses(updates):
+    """
+    Update the status of many blood donors in one transaction (status desk bulk updates):
+    one SELECT for the donor IDs that exist and one executemany UPDATE, instead of a
+    SELECT and a commit per donor.
+    
+    Args:
+        updates: List of dicts with donor_id, status and reason_for_rejection (optional)
+        
+    Returns:
+        set: Donor IDs that were found and updated
+    """
+    if not updates:
+        return set()
+    
+    try:
+        donor_ids = {item['donor_id'] for item in updates}
+        found = set(db.session.scalars(
+            select(BloodCampDonor.donor_id).where(BloodCampDonor.donor_id.in_(donor_ids))
+        ))
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                'b_donor_id': item['donor_id'],
+                'b_status': item['status'],
+                'b_reason': item.get('reason_for_rejection') or None,
+                'b_updated_at': now,
+            }
+            for item in updates if item['donor_id'] in found
+        ]
+        if rows:
+            donors = BloodCampDonor.__table__
+            db.session.execute(
+                update(donors)
+                .where(donors.c.donor_id == bindparam('b_donor_id'))
+                .values(
+                    status=bindparam('b_status'),
+                    # As in update_donor_status, an empty reason keeps the stored one
+                    reason_for_rejection=func.coalesce(bindparam('b_reason'), donors.c.reason_for_rejection),
+                    updated_at=bindparam('b_updated_at'),
+                ),
+                rows,
+            )
+        db.session.commit()
+        
+        # Bulk UPDATEs bypass the ORM unit of work, so invalidate caches by hand (once per batch)
+        if rows:
+            bump_table_version(BloodCampDonor.__tablename__)
+        logger.info(f"Bulk status update: {len(rows)} updates applied, {len(donor_ids - found)} donor IDs not found")
+        return found
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in bulk donor status update: {e}", exc_info=True)
+        raise
+
+
 # ============================================================================
 # Attendant Database Functions
 # ============================================================================
@@ -681,6 +885,358 @@ def update_attendant(badge_id, **kwargs):
         return False
 
 
+# ============================================================================
+# Staged Photo Functions
+# ============================================================================
+
+# Columns that can hold a pending photo marker (see app/photo_uploads.py)
+PHOTO_COLUMNS = (
+    SNEForm.photo_filename,
+    Attendant.photo_filename,
+    Attendant.sne_photo_filename,
+)
+
+
+def finalize_pending_photo(pending_value, s3_key):
+    """
+    Replace a pending photo marker with its S3 key once the upload has finished.
+
+    Args:
+        pending_value: Marker stored at submission time ('pending:<s3 key>')
+        s3_key: Uploaded S3 object key
+
+    Returns:
+        int: Number of rows updated (0 if the record was deleted or its photo replaced)
+    """
+    try:
+        updated = 0
+        tables = set()
+        for column in PHOTO_COLUMNS:
+            result = db.session.execute(
+                update(column.class_).where(column == pending_value).values({column.key: s3_key})
+            )
+            if result.rowcount:
+                updated += result.rowcount
+                tables.add(column.class_.__tablename__)
+        db.session.commit()
+        # Bulk UPDATEs bypass the ORM unit of work, so invalidate caches by hand
+        if tables:
+            bump_table_version(*tables)
+        return updated
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error finalizing pending photo {s3_key}: {e}", exc_info=True)
+        raise
+
+
+# ============================================================================
+# Submission Sync Functions
+# ============================================================================
+
+# SubmissionKey.kind of each form
+SUBMISSION_KIND_BLOOD_CAMP = 'blood_camp'
+SUBMISSION_KIND_SNE = 'sne'
+
+
+def get_submission_record_ids(kind, keys):
+    """
+    Record IDs already assigned to submissions with these idempotency keys.
+    
+    Args:
+        kind: Submission kind (SUBMISSION_KIND_*)
+        keys: Idempotency keys
+        
+    Returns:
+        dict: key -> donor_id / badge_id, for the keys that were seen before
+    """
+    if not keys:
+        return {}
+    rows = db.session.query(SubmissionKey.key, SubmissionKey.record_id).filter(
+        SubmissionKey.kind == kind,
+        SubmissionKey.key.in_(set(keys))
+    ).all()
+    return dict(rows)
+
+
+def _insert_keyed_records(kind, model, entries, build_row):
+    """
+    Inserts a batch of records with their idempotency keys and commits. The caller must
+    hold the ID allocation lock, so keys are re-checked here: a resend of the same
+    batch that waited on the lock gets the IDs the first one committed.
+    
+    build_row(entry) allocates the next ID and returns (record_id, column values).
+    Returns dict: key -> (record_id, created boolean)
+    """
+    results = {
+        key: (record_id, False)
+        for key, record_id in get_submission_record_ids(kind, [entry[0] for entry in entries]).items()
+    }
+    rows = []
+    key_rows = []
+    for entry in entries:
+        key = entry[0]
+        if key in results:
+            continue
+        record_id, row = build_row(entry)
+        rows.append(row)
+        key_rows.append({'kind': kind, 'key': key, 'record_id': record_id})
+        results[key] = (record_id, True)
+    
+    if rows:
+        # executemany INSERTs; ORM-added objects would be inserted one statement per row
+        db.session.execute(insert(model), rows)
+        db.session.execute(insert(SubmissionKey), key_rows)
+    db.session.commit()
+    
+    # Bulk INSERTs bypass the ORM unit of work, so invalidate caches by hand (once per batch)
+    if rows:
+        bump_table_version(model.__tablename__)
+    created = sum(1 for _, was_created in results.values() if was_created)
+    logger.info(f"Synced {kind} batch: {created} created, {len(results) - created} already synced")
+    return results
+
+
+def create_blood_donors_batch(entries, prefix="BD"):
+    """
+    Insert a batch of queued blood camp submissions in one transaction. Donor IDs for
+    the whole batch are allocated under a single lock, instead of a lock, MAX() query
+    and commit per donor.
+    
+    Args:
+        entries: List of (idempotency key, mobile number, donor name, fields), fields as
+                 for create_blood_donor; keys must be unique within the batch
+        prefix: Donor ID prefix
+        
+    Returns:
+        tuple: (dict key -> (donor_id, created boolean), success boolean, error_message)
+    """
+    try:
+        # Takes the allocation lock and returns the first free ID; the rest follow on from it
+        next_num = int(get_next_donor_id_postgres(prefix)[len(prefix):])
+        submission_timestamp = datetime.utcnow()
+        
+        def build_row(entry):
+            nonlocal next_num
+            _, mobile_number, name_of_donor, fields = entry
+            donor_id = f"{prefix}{next_num:05d}"
+            next_num += 1
+            return donor_id, dict(
+                fields,
+                donor_id=donor_id,
+                mobile_number=mobile_number,
+                name_of_donor=name_of_donor,
+                submission_timestamp=submission_timestamp
+            )
+        
+        return _insert_keyed_records(SUBMISSION_KIND_BLOOD_CAMP, BloodCampDonor, entries, build_row), True, None
+        
+    except IntegrityError as e:
+        db.session.rollback()
+        logger.error(f"Integrity error syncing {len(entries)} blood donors: {e}")
+        return None, False, f"INTEGRITY_ERROR: {e.orig}"
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error syncing {len(entries)} blood donors: {e}", exc_info=True)
+        return None, False, f"DATABASE_ERROR: {str(e)}"
+
+
+def create_sne_forms_batch(entries):
+    """
+    Insert a batch of queued SNE submissions in one transaction, allocating badge IDs
+    for every area/centre sequence in the batch under that sequence's lock.
+    
+    Args:
+        entries: List of (idempotency key, prefix, start_num, fields), fields as for
+                 SNEForm including area and satsang_place; keys must be unique within the batch
+        
+    Returns:
+        tuple: (dict key -> (badge_id, created boolean), success boolean, error_message)
+    """
+    try:
+        # Lock the sequences in a fixed order so two batches can't deadlock on each other
+        sequences = sorted({(fields['area'], fields['satsang_place'], prefix, start_num)
+                            for _, prefix, start_num, fields in entries})
+        next_nums = {}
+        for area, centre, prefix, start_num in sequences:
+            first_badge_id = get_next_sne_badge_id_postgres(area, centre, prefix, start_num)
+            next_nums[(area, centre, prefix)] = int(first_badge_id[len(prefix):])
+        
+        def build_row(entry):
+            _, prefix, _, fields = entry
+            sequence = (fields['area'], fields['satsang_place'], prefix)
+            badge_id = f"{prefix}{next_nums[sequence]}"
+            next_nums[sequence] += 1
+            return badge_id, dict(fields, badge_id=badge_id)
+        
+        return _insert_keyed_records(SUBMISSION_KIND_SNE, SNEForm, entries, build_row), True, None
+        
+    except IntegrityError as e:
+        db.session.rollback()
+        logger.error(f"Integrity error syncing {len(entries)} SNE forms: {e}")
+        return None, False, f"INTEGRITY_ERROR: {e.orig}"
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error syncing {len(entries)} SNE forms: {e}", exc_info=True)
+        return None, False, f"DATABASE_ERROR: {str(e)}"
+
+
+# ============================================================================
+# Database Viewer Filter Facets
+# ============================================================================
+
+# Filter dropdowns shown by the database viewer, per table: facet name -> column
+VIEWER_FACET_COLUMNS = {
+    'sne_forms': {
+        'areas': SNEForm.area,
+        'centres': SNEForm.satsang_place,
+    },
+    'blood_camp_donors': {
+        'areas': BloodCampDonor.area,
+        'blood_groups': BloodCampDonor.blood_group,
+        'allow_calls': BloodCampDonor.allow_call,
+        'donation_locations': BloodCampDonor.donation_location,
+        'statuses': BloodCampDonor.status,
+    },
+}
+
+
+def _compute_table_facets(table_name):
+    """Runs one UNION ALL query returning (facet, value, count) for every facet column."""
+    columns = VIEWER_FACET_COLUMNS[table_name]
+    facet_selects = [
+        select(
+            literal(facet_name).label('facet'),
+            column.label('value'),
+            func.count().label('count')
+        ).where(
+            and_(column.isnot(None), column != '')
+        ).group_by(column)
+        for facet_name, column in columns.items()
+    ]
+    rows = db.session.execute(union_all(*facet_selects)).all()
+    
+    facets = {facet_name: [] for facet_name in columns}
+    for facet_name, value, count in rows:
+        facets[facet_name].append((value, count))
+    
+    logger.info(f"Refreshed filter facets for {table_name} ({len(rows)} values)")
+    return {facet_name: tuple(sorted(values)) for facet_name, values in facets.items()}
+
+
+def get_table_facets(table_name):
+    """
+    Get distinct filter values with record counts for a database viewer table.
+    Served from an in-process cache refreshed on write or after FACET_CACHE_TTL seconds.
+    
+    Args:
+        table_name: Table name (e.g., 'blood_camp_donors')
+        
+    Returns:
+        dict: Facet name -> tuple of (value, count) sorted by value,
+              e.g. {'areas': (('Chandigarh', 12), ...)}. Empty for tables without facets.
+    """
+    if table_name not in VIEWER_FACET_COLUMNS:
+        return {}
+    
+    return _facet_cache.get_or_compute(
+        table_name,
+        lambda: _compute_table_facets(table_name),
+        tables=(table_name,)
+    )
+
+
+# ============================================================================
+# Statistics Functions
+# ============================================================================
+
+def _compute_database_stats():
+    """Computes admin statistics with one grouped query per table."""
+    sne_recent_cutoff = date.today() - timedelta(days=1)
+    donor_recent_cutoff = datetime.now() - timedelta(days=1)
+    
+    # SNE: per-area counts; total and recent_24h are summed from the groups
+    sne_rows = db.session.query(
+        SNEForm.area,
+        func.count(SNEForm.id),
+        conditional_count(SNEForm.submission_date >= sne_recent_cutoff)
+    ).group_by(SNEForm.area).all()
+    
+    sne_stats = {'total': 0, 'by_area': {}, 'recent_24h': 0}
+    for area, count, recent in sne_rows:
+        sne_stats['by_area'][area] = count
+        sne_stats['total'] += count
+        sne_stats['recent_24h'] += recent
+    
+    # Blood donors: grouped by (blood_group, status) and rolled up both ways
+    donor_rows = db.session.query(
+        BloodCampDonor.blood_group,
+        BloodCampDonor.status,
+        func.count(BloodCampDonor.id),
+        conditional_count(BloodCampDonor.submission_timestamp >= donor_recent_cutoff)
+    ).group_by(BloodCampDonor.blood_group, BloodCampDonor.status).all()
+    
+    blood_stats = {'total': 0, 'by_blood_group': {}, 'by_status': {}, 'recent_24h': 0}
+    for blood_group, status, count, recent in donor_rows:
+        blood_stats['by_blood_group'][blood_group] = blood_stats['by_blood_group'].get(blood_group, 0) + count
+        blood_stats['by_status'][status] = blood_stats['by_status'].get(status, 0) + count
+        blood_stats['total'] += count
+        blood_stats['recent_24h'] += recent
+    
+    # Attendants: grouped by (attendant_type, area) and rolled up both ways
+    attendant_rows = db.session.query(
+        Attendant.attendant_type,
+        Attendant.area,
+        func.count(Attendant.id)
+    ).group_by(Attendant.attendant_type, Attendant.area).all()
+    
+    attendant_stats = {'total': 0, 'by_type': {}, 'by_area': {}}
+    for attendant_type, area, count in attendant_rows:
+        attendant_stats['by_type'][attendant_type] = attendant_stats['by_type'].get(attendant_type, 0) + count
+        attendant_stats['by_area'][area] = attendant_stats['by_area'].get(area, 0) + count
+        attendant_stats['total'] += count
+    
+    return {
+        'sne_forms': sne_stats,
+        'blood_donors': blood_stats,
+        'attendants': attendant_stats
+    }
+
+
+def get_database_stats():
+    """
+    Get SNE, blood donor and attendant statistics for the admin database viewer.
+    Uses three grouped queries in total; results are cached for STATS_CACHE_TTL seconds
+    and dropped as soon as any of the three tables is written.
+    
+    Returns:
+        dict: {'sne_forms': {...}, 'blood_donors': {...}, 'attendants': {...}}
+    """
+    return _stats_cache.get_or_compute(
+        'database_stats',
+        _compute_database_stats,
+        tables=(SNEForm.__tablename__, BloodCampDonor.__tablename__, Attendant.__tablename__)
+    )
+
+
+def get_table_fingerprint(model):
+    """
+    Cheap change token for a table: (row count, latest updated_at).
+    Any insert, ORM/Core update or delete changes it, whichever process made the write.
+    """
+    count, last_updated = db.session.query(func.count(model.id), func.max(model.updated_at)).one()
+    return count, last_updated
+
+
+def get_cached_table_fingerprint(model):
+    """
+    get_table_fingerprint() cached per table until this process writes the table (or the
+    TTL passes), so repeated polls between writes run no query.
+    """
+    table_name = model.__tablename__
+    return _fingerprint_cache.get_or_compute(table_name, lambda: get_table_fingerprint(model), tables=(table_name,))
+
+
 # ============================================================================
 # Common Database Functions
 # ============================================================================
@@ -703,28 +1259,46 @@ def safe_commit():
 
 def get_dashboard_stats():
     """
-    Get dashboard statistics.
+    Get dashboard statistics in two database round trips:
+    one conditional-aggregation pass over blood_camp_donors for status counts,
+    and one UNION ALL query for table totals and the SNE area breakdown.
     
     Returns:
         dict: Statistics for dashboard
     """
     try:
-        stats = {
-            'total_sne': db.session.query(func.count(SNEForm.id)).scalar(),
-            'total_donors': db.session.query(func.count(BloodCampDonor.id)).scalar(),
-            'total_attendants': db.session.query(func.count(Attendant.id)).scalar(),
-            'pending_donors': db.session.query(func.count(BloodCampDonor.id)).filter_by(status='Pending').scalar(),
-            'accepted_donors': db.session.query(func.count(BloodCampDonor.id)).filter_by(status='Accepted').scalar(),
-            'rejected_donors': db.session.query(func.count(BloodCampDonor.id)).filter_by(status='Rejected').scalar(),
-        }
+        # Round trip 1: all donor status counts in a single scan
+        pending_donors, accepted_donors, rejected_donors = db.session.query(
+            conditional_count(BloodCampDonor.status == 'Pending'),
+            conditional_count(BloodCampDonor.status == 'Accepted'),
+            conditional_count(BloodCampDonor.status == 'Rejected')
+        ).one()
+        
+        # Round trip 2: table totals plus SNE area-wise breakdown
+        totals_query = union_all(
+            select(literal('total').label('kind'), literal('sne_forms').label('key'), func.count(SNEForm.id)),
+            select(literal('total'), literal('blood_camp_donors'), func.count(BloodCampDonor.id)),
+            select(literal('total'), literal('attendants'), func.count(Attendant.id)),
+            select(literal('sne_area'), SNEForm.area, func.count(SNEForm.id)).group_by(SNEForm.area)
+        )
         
-        # Get area-wise breakdown
-        area_breakdown = db.session.query(
-            SNEForm.area,
-            func.count(SNEForm.id).label('count')
-        ).group_by(SNEForm.area).all()
+        totals = {}
+        area_breakdown = {}
+        for kind, key, count in db.session.execute(totals_query):
+            if kind == 'total':
+                totals[key] = count
+            else:
+                area_breakdown[key] = count
         
-        stats['area_breakdown'] = {area: count for area, count in area_breakdown}
+        stats = {
+            'total_sne': totals.get('sne_forms', 0),
+            'total_donors': totals.get('blood_camp_donors', 0),
+            'total_attendants': totals.get('attendants', 0),
+            'pending_donors': pending_donors,
+            'accepted_donors': accepted_donors,
+            'rejected_donors': rejected_donors,
+            'area_breakdown': area_breakdown
+        }
         
         return stats
         
@@ -1,6 +1,8 @@
 # decorators.py
+import datetime
+import hashlib
 from functools import wraps
-from flask import flash, redirect, url_for, request # Added request for 'next' URL
+from flask import flash, redirect, url_for, request, make_response # Added request for 'next' URL
 from flask_login import current_user
 # Note: We don't import 'app' or 'login_manager' here to avoid new circular dependencies.
 # login_manager.unauthorized() is typically called by Flask-Login itself if @login_required is used.
@@ -34,3 +36,56 @@ def permission_required(permission):
             return f(*args, **kwargs)
         return decorated_function
     return decorator
+
+
+def conditional_get(*models, max_age=0):
+    """
+    Conditional GET (ETag / 304 Not Modified) for read-only JSON endpoints.
+    Place *after* @login_required / @permission_required.
+
+    With models, the ETag is derived from the request URL, the user, today's date and
+    the tables' fingerprint (row count + latest updated_at, the same in every worker),
+    and is checked before the view runs: an unchanged result skips the queries and
+    serialisation. Fingerprints are cached per table until this worker writes it or
+    FINGERPRINT_CACHE_TTL passes, so polls between writes run no query at all. Without models, the ETag is a hash of the response body, which only
+    saves the transfer - use that for cheap single-row lookups.
+
+    Args:
+        models: SQLAlchemy models the response is derived from
+        max_age: Seconds the browser may reuse the response without asking (0 = always revalidate)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = None
+            if models:
+                from app import db_helpers
+                fingerprints = [db_helpers.get_cached_table_fingerprint(model) for model in models]
+                token = repr((request.full_path, current_user.get_id(), datetime.date.today(), fingerprints))
+                etag = hashlib.sha1(token.encode('utf-8')).hexdigest()
+                if request.if_none_match.contains(etag):
+                    response = make_response('', 304)
+                    response.set_etag(etag)
+                    _set_cache_headers(response, max_age)
+                    return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if etag:
+                response.set_etag(etag)
+            else:
+                response.add_etag()
+            _set_cache_headers(response, max_age)
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
+
+
+def _set_cache_headers(response, max_age):
+    # private: responses depend on the logged-in session, shared caches must not keep them
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if not max_age:
+        response.cache_control.no_cache = True
+    response.vary.add('Cookie')
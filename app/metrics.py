@@ -0,0 +1,444 @@
+"""
+Request Instrumentation
+Per-endpoint latency histograms plus the database, S3 and PDF time spent by each request,
+served in Prometheus text format at /admin/metrics.
+
+    rssb_http_requests_total{endpoint,method,status}        requests handled
+    rssb_http_request_duration_seconds{endpoint,method}     request latency
+    rssb_http_request_db_queries{endpoint}                  SQL statements per request
+    rssb_http_request_<db|s3|pdf>_seconds{endpoint}         time per request in each component
+    rssb_operation_duration_seconds{component,operation}    individual S3 calls and PDF renders,
+                                                            including the background photo uploader
+
+Each gunicorn worker counts in memory and writes its totals to METRICS_DIR (at most every
+METRICS_FLUSH_SECONDS, on exit, and whenever it answers a scrape). The worker answering a scrape
+adds up every worker's file, so the counters do not depend on which worker served it. Files of
+workers that have exited are folded into retired.json, so their requests are never uncounted.
+The workers included are exported as rssb_process_info{pid}. With METRICS_DIR empty each
+worker reports only itself. Disable metrics with METRICS_ENABLED=false.
+"""
+import os
+import json
+import time
+import atexit
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+from app import config
+
+try:
+    import fcntl
+except ImportError:  # Windows development server: a single process, nothing to retire
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'rssb'
+
+# Histogram upper bounds; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Request components timed besides the request itself
+COMPONENTS = ('db', 's3', 'pdf')
+
+_lock = threading.Lock()
+# Metric name -> {label values tuple: value}; histogram values are [bucket counts..., count, sum]
+_counters = {}
+_histograms = {}
+# Metric name -> (help text, label names, buckets) for the exposition output
+_metric_meta = {}
+_started_at = time.time()
+
+RETIRED_FILE = 'retired.json'
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _define(name, help_text, label_names, buckets=None):
+    _metric_meta[name] = (help_text, label_names, buckets)
+    (_histograms if buckets is not None else _counters)[name] = {}
+
+
+_define('http_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+_define('http_request_duration_seconds', 'Request latency.', ('endpoint', 'method'), LATENCY_BUCKETS)
+_define('http_request_db_queries', 'SQL statements executed per request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+for _component in COMPONENTS:
+    _define(f'http_request_{_component}_seconds', f'Time per request spent in {_component} calls.',
+            ('endpoint',), LATENCY_BUCKETS)
+_define('operation_duration_seconds', 'Duration of individual S3 calls and PDF renders.',
+        ('component', 'operation'), LATENCY_BUCKETS)
+
+
+def _inc(name, labels, amount=1):
+    with _lock:
+        series = _counters[name]
+        series[labels] = series.get(labels, 0) + amount
+
+
+def _observe(name, labels, value):
+    buckets = _metric_meta[name][2]
+    with _lock:
+        series = _histograms[name]
+        values = series.get(labels)
+        if values is None:
+            values = series[labels] = [0] * (len(buckets) + 3)
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-2] += 1
+        values[-1] += value
+
+
+def enabled():
+    """Metrics are collected unless METRICS_ENABLED=false."""
+    return config.METRICS_ENABLED
+
+
+# ============================================================================
+# Recording
+# ============================================================================
+
+def record(component, operation, seconds):
+    """
+    Records one timed call (e.g. an S3 PutObject or a PDF render). Inside a request it
+    also counts towards that request's time for the component, unless a timed() block
+    for the component is already counting it.
+    """
+    if not enabled():
+        return
+    _observe('operation_duration_seconds', (component, operation), seconds)
+    if has_request_context() and 'metrics_components' in g and component not in g.metrics_timing:
+        totals = g.metrics_components[component]
+        totals[0] += 1
+        totals[1] += seconds
+    elif not has_request_context():
+        flush()  # Background uploads: no request end to flush at
+
+
+@contextmanager
+def timed(component, operation):
+    """
+    Times the enclosed block (or decorated function) with record(). Within a request the
+    block counts as one call of the component; calls recorded inside it (e.g. the requests
+    of an S3 upload, which s3transfer may make from its own threads) are not added again.
+    """
+    outermost = has_request_context() and 'metrics_timing' in g and component not in g.metrics_timing
+    if outermost:
+        g.metrics_timing.add(component)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if outermost:
+            g.metrics_timing.discard(component)
+        record(component, operation, time.perf_counter() - started)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    # Component -> [calls, seconds]
+    g.metrics_components = {component: [0, 0.0] for component in COMPONENTS}
+    # Components with an open timed() block
+    g.metrics_timing = set()
+
+
+def _after_request(response):
+    if 'metrics_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_started
+    endpoint = request.endpoint or 'unmatched'
+
+    _inc('http_requests_total', (endpoint, request.method, str(response.status_code)))
+    _observe('http_request_duration_seconds', (endpoint, request.method), elapsed)
+    _observe('http_request_db_queries', (endpoint,), g.metrics_components['db'][0])
+    for component, (calls, seconds) in g.metrics_components.items():
+        # db is observed for every request; S3 and PDF only for requests that used them
+        if calls or component == 'db':
+            _observe(f'http_request_{component}_seconds', (endpoint,), seconds)
+    flush()
+    return response
+
+
+# ============================================================================
+# Instrumented Libraries
+# ============================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    # Only request-time queries; per-statement histograms would cost more than they tell
+    if has_request_context() and 'metrics_components' in g:
+        totals = g.metrics_components['db']
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def _handle_error(exception_context):
+    # The failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_query_started'):
+        connection.info['metrics_query_started'].pop()
+
+
+def instrument_engine(engine):
+    """Counts and times the SQL statements each request executes."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def _s3_call_started(model, context, **kwargs):
+    context['metrics_call'] = (model.name, time.perf_counter())
+
+
+def _s3_call_finished(context, **kwargs):
+    call = context.pop('metrics_call', None)
+    if call is not None:
+        operation, started = call
+        record('s3', operation, time.perf_counter() - started)
+
+
+def instrument_s3_client(client):
+    """Times every API call made through a boto3 S3 client (uploads, deletes, gets)."""
+    if not enabled():
+        return
+    events = client.meta.events
+    # before-parameter-build is emitted to every handler (a before-call handler can short-circuit the rest);
+    # after-call also fires for error responses, after-call-error for failed sends
+    events.register('before-parameter-build.s3', _s3_call_started, unique_id='metrics-s3-started')
+    events.register('after-call.s3', _s3_call_finished, unique_id='metrics-s3-finished')
+    events.register('after-call-error.s3', _s3_call_finished, unique_id='metrics-s3-failed')
+
+
+def init_app(app, engine=None):
+    """Installs the request hooks, and the SQL statement hooks when a database engine is given."""
+    if not enabled():
+        logger.info("Request metrics disabled (METRICS_ENABLED=false)")
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if engine is not None:
+        instrument_engine(engine)
+    atexit.register(flush, force=True)
+    logger.info("Request metrics enabled")
+
+
+# ============================================================================
+# Shared Store (all workers)
+# ============================================================================
+
+def _metrics_dir():
+    """METRICS_DIR (relative to the project root), or None when workers report only themselves."""
+    metrics_dir = config.METRICS_DIR
+    if not metrics_dir:
+        return None
+    if not os.path.isabs(metrics_dir):
+        metrics_dir = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), metrics_dir)
+    os.makedirs(metrics_dir, exist_ok=True)
+    return metrics_dir
+
+
+def _worker_filename(pid, started_at):
+    # The start time keeps a reused pid from overwriting an exited worker's totals
+    return f"worker-{pid}-{int(started_at * 1000)}.json"
+
+
+def _snapshot():
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {name: {labels: list(values) for labels, values in series.items()}
+                      for name, series in _histograms.items()}
+    return counters, histograms
+
+
+def _dump(path, counters, histograms, **extra):
+    data = dict(extra,
+                counters={name: [[list(labels), value] for labels, value in series.items()]
+                          for name, series in counters.items()},
+                histograms={name: [[list(labels), values] for labels, values in series.items()]
+                            for name, series in histograms.items()})
+    # Write-then-rename so a scrape never reads a half-written file
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(data, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+        return None
+
+
+def _merge(counters, histograms, data):
+    """Adds a worker file's totals to counters/histograms (metrics no longer defined are dropped)."""
+    for name, series in data.get('counters', {}).items():
+        if name not in _counters:
+            continue
+        target = counters.setdefault(name, {})
+        for labels, value in series:
+            labels = tuple(labels)
+            target[labels] = target.get(labels, 0) + value
+    for name, series in data.get('histograms', {}).items():
+        if name not in _histograms:
+            continue
+        target = histograms.setdefault(name, {})
+        width = len(_metric_meta[name][2]) + 3
+        for labels, values in series:
+            if len(values) != width:  # Buckets changed since the file was written
+                continue
+            labels = tuple(labels)
+            if labels in target:
+                target[labels] = [total + value for total, value in zip(target[labels], values)]
+            else:
+                target[labels] = list(values)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Someone else's process reusing the pid
+        return True
+    return True
+
+
+def flush(force=False):
+    """
+    Writes this worker's totals to its file in METRICS_DIR. Unless forced, at most once
+    every METRICS_FLUSH_SECONDS, and skipped while another thread is writing it.
+    """
+    global _last_flush
+    metrics_dir = _metrics_dir() if enabled() else None
+    if metrics_dir is None:
+        return
+    if not force and time.monotonic() - _last_flush < config.METRICS_FLUSH_SECONDS:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = time.monotonic()
+        counters, histograms = _snapshot()
+        path = os.path.join(metrics_dir, _worker_filename(os.getpid(), _started_at))
+        _dump(path, counters, histograms, pid=os.getpid(), started_at=_started_at)
+    except OSError as e:
+        logger.warning(f"Could not write metrics file: {e}")
+    finally:
+        _flush_lock.release()
+
+
+def _collect():
+    """
+    Totals of all workers plus the [(pid, started_at)] of the live workers included. This
+    worker counts with its in-memory values; the others with their last flushed file.
+    """
+    counters, histograms = _snapshot()
+    workers = [(os.getpid(), _started_at)]
+    metrics_dir = _metrics_dir()
+    if metrics_dir is None:
+        return counters, histograms, workers
+    flush(force=True)
+    own_file = _worker_filename(os.getpid(), _started_at)
+    retired_path = os.path.join(metrics_dir, RETIRED_FILE)
+
+    lock_file = open(os.path.join(metrics_dir, '.lock'), 'a')
+    try:
+        if fcntl is not None:
+            # One scrape at a time folds exited workers into retired.json
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        retired = _load(retired_path) or {}
+        exited = []
+        for filename in sorted(os.listdir(metrics_dir)):
+            if not (filename.startswith('worker-') and filename.endswith('.json')) or filename == own_file:
+                continue
+            path = os.path.join(metrics_dir, filename)
+            data = _load(path)
+            if data is None:
+                continue
+            if fcntl is not None and not _pid_alive(data['pid']):
+                exited.append((path, data))
+                continue
+            _merge(counters, histograms, data)
+            workers.append((data['pid'], data['started_at']))
+
+        if exited:
+            retired_counters, retired_histograms = {}, {}
+            for data in [retired] + [data for _, data in exited]:
+                _merge(retired_counters, retired_histograms, data)
+            _dump(retired_path, retired_counters, retired_histograms)
+            for path, _ in exited:
+                os.remove(path)
+            retired = _load(retired_path)
+            logger.info(f"Retired metrics of {len(exited)} exited worker(s)")
+        _merge(counters, histograms, retired)
+    finally:
+        lock_file.close()  # Releases the flock
+    return counters, histograms, sorted(workers)
+
+
+# ============================================================================
+# Exposition
+# ============================================================================
+
+def _label_text(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+def render_prometheus():
+    """All workers' metrics in Prometheus text exposition format (0.0.4)."""
+    counters, histograms, workers = _collect()
+
+    lines = [
+        f'# HELP {PREFIX}_process_info Running worker processes included in these metrics.',
+        f'# TYPE {PREFIX}_process_info gauge',
+    ]
+    lines += [f'{PREFIX}_process_info{{pid="{pid}"}} 1' for pid, _ in workers]
+    lines += [
+        f'# HELP {PREFIX}_process_start_time_seconds Start time of each worker process since the epoch.',
+        f'# TYPE {PREFIX}_process_start_time_seconds gauge',
+    ]
+    lines += [f'{PREFIX}_process_start_time_seconds{{pid="{pid}"}} {started_at:.3f}' for pid, started_at in workers]
+    for name, (help_text, label_names, buckets) in _metric_meta.items():
+        full_name = f'{PREFIX}_{name}'
+        lines.append(f'# HELP {full_name} {help_text}')
+        if buckets is None:
+            lines.append(f'# TYPE {full_name} counter')
+            for labels, value in sorted(counters.get(name, {}).items()):
+                lines.append(f'{full_name}{_label_text(label_names, labels)} {value}')
+            continue
+
+        lines.append(f'# TYPE {full_name} histogram')
+        for labels, values in sorted(histograms.get(name, {}).items()):
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), values):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_bound(bound)
+                lines.append(f'{full_name}_bucket{_label_text(label_names, labels, [("le", le)])} {cumulative}')
+            lines.append(f'{full_name}_count{_label_text(label_names, labels)} {values[-2]}')
+            lines.append(f'{full_name}_sum{_label_text(label_names, labels)} {values[-1]:.6f}')
+    return '\n'.join(lines) + '\n'
@@ -174,3 +174,24 @@ class Attendant(db.Model):
     
     def __repr__(self):
         return f'<Attendant {self.badge_id} - {self.name} ({self.attendant_type})>'
+
+
+class SubmissionKey(db.Model):
+    """Client idempotency key of a submitted form, mapped to the record ID it was assigned"""
+    __tablename__ = 'submission_keys'
+    
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # blood_camp/sne
+    key = db.Column(db.String(64), nullable=False)  # Generated by the client (UUID)
+    record_id = db.Column(db.String(20), nullable=False)  # donor_id / badge_id assigned to the submission
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'key', name='uq_submission_kind_key'),
+    )
+    
+    def __repr__(self):
+        return f'<SubmissionKey {self.kind}:{self.key} -> {self.record_id}>'
@@ -0,0 +1,274 @@
+"""
+Staged Photo Uploads
+Form submissions write photos to a local spool directory and store a pending marker
+('pending:<s3 key>') in the photo column. A background thread per worker process
+uploads spooled photos to S3 with retries and then swaps the marker for the real key.
+
+Spool layout (PHOTO_SPOOL_DIR):
+    <sha1 of key>.photo           photo bytes
+    <sha1 of key>.extra<n>        objects uploaded with the photo (thumbnail, kept original)
+    <sha1 of key>.json            upload job (bucket, key, content type), waiting
+    <sha1 of key>.json.inflight   upload job claimed by a worker
+Jobs survive restarts: leftover files are picked up again by the periodic sweep.
+"""
+import os
+import glob
+import json
+import time
+import queue
+import shutil
+import hashlib
+import logging
+import threading
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = 'pending:'
+
+# Jobs younger than this may belong to a request that has not committed its row yet
+_SWEEP_GRACE_SECONDS = 300
+# Claimed jobs older than this were abandoned by a worker that died mid-upload
+_INFLIGHT_STALE_SECONDS = 900
+
+_app = None
+_jobs = queue.Queue()
+_worker_lock = threading.Lock()
+_worker_thread = None
+_worker_pid = None
+
+
+def is_pending(value):
+    """Checks if a photo column value is a pending (not yet uploaded) photo."""
+    return bool(value) and value.startswith(PENDING_PREFIX)
+
+
+def s3_key_of(value):
+    """Returns the S3 key for a photo column value, pending or not."""
+    return value[len(PENDING_PREFIX):] if is_pending(value) else value
+
+
+def _spool_dir():
+    spool_dir = config.PHOTO_SPOOL_DIR
+    if not os.path.isabs(spool_dir):
+        spool_dir = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), spool_dir)
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_dir
+
+
+def _spool_paths(s3_key):
+    stem = os.path.join(_spool_dir(), hashlib.sha1(s3_key.encode('utf-8')).hexdigest())
+    return f"{stem}.photo", f"{stem}.json"
+
+
+def _extra_path(data_path, index):
+    return f"{data_path[:-len('.photo')]}.extra{index}"
+
+
+def init_app(app):
+    """
+    Registers the app used by the upload thread to update photo columns, and starts
+    the thread right away if the spool still holds jobs (e.g. from before a restart)
+    instead of waiting for the next submission to dispatch one.
+    """
+    global _app
+    _app = app
+    if enabled() and _has_spooled_jobs():
+        _ensure_worker()
+
+
+def _has_spooled_jobs():
+    try:
+        return any(name.endswith(('.json', '.json.inflight')) for name in os.listdir(_spool_dir()))
+    except OSError as e:
+        logger.error(f"Cannot read photo spool: {e}")
+        return False
+
+
+def enabled():
+    """Staged uploads need the app (for the database update) and PHOTO_UPLOAD_ASYNC."""
+    return config.PHOTO_UPLOAD_ASYNC and _app is not None
+
+
+def stage(stream, bucket_name, s3_key, content_type, extras=()):
+    """
+    Writes a photo to the spool.
+
+    Args:
+        stream: File-like object with the photo bytes to upload
+        bucket_name: Target S3 bucket
+        s3_key: Final S3 object key
+        content_type: MIME type stored with the object
+        extras: (stream, s3_key, content_type) tuples uploaded alongside the photo
+                (thumbnail, kept original)
+
+    Returns:
+        str: Pending marker to store in the photo column
+    """
+    data_path, meta_path = _spool_paths(s3_key)
+    with open(data_path, 'wb') as f:
+        shutil.copyfileobj(stream, f)
+    job = {
+        'bucket': bucket_name,
+        's3_key': s3_key,
+        'content_type': content_type,
+        'staged_at': time.time(),
+        'extras': [],
+    }
+    for index, (extra_stream, extra_key, extra_content_type) in enumerate(extras):
+        extra_stream.seek(0)
+        with open(_extra_path(data_path, index), 'wb') as f:
+            shutil.copyfileobj(extra_stream, f)
+        job['extras'].append({'s3_key': extra_key, 'content_type': extra_content_type})
+    # Write-then-rename so a sweep never sees a half-written job
+    with open(f"{meta_path}.tmp", 'w') as f:
+        json.dump(job, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    logger.info(f"Staged photo for background upload: {s3_key}")
+    return f"{PENDING_PREFIX}{s3_key}"
+
+
+def dispatch(*values):
+    """Queues pending photos for upload. Call after the row referencing them is committed."""
+    for value in values:
+        if is_pending(value):
+            _ensure_worker()
+            _jobs.put(s3_key_of(value))
+
+
+def discard(value):
+    """Drops a staged photo whose row was never saved or has been replaced."""
+    _remove_spool_files(s3_key_of(value))
+    logger.info(f"Discarded staged photo: {s3_key_of(value)}")
+
+
+def _remove_spool_files(s3_key):
+    data_path, meta_path = _spool_paths(s3_key)
+    extras = glob.glob(glob.escape(data_path[:-len('.photo')]) + '.extra*')
+    for path in [meta_path, f"{meta_path}.inflight", data_path] + extras:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_staged(value):
+    """Returns the spooled bytes of a pending photo, or None once it has been uploaded."""
+    data_path, _ = _spool_paths(s3_key_of(value))
+    try:
+        with open(data_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _ensure_worker():
+    """Starts the upload thread once per process (gunicorn forks after import)."""
+    global _worker_thread, _worker_pid
+    with _worker_lock:
+        if _worker_thread and _worker_thread.is_alive() and _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        _worker_thread = threading.Thread(target=_run_worker, name='photo-uploader', daemon=True)
+        _worker_thread.start()
+        logger.info(f"Started background photo uploader (pid={_worker_pid})")
+
+
+def _run_worker():
+    _sweep()
+    # Sweep on a fixed schedule: waiting for an idle queue would never retry failed or
+    # abandoned jobs on a busy camp day
+    next_sweep = time.monotonic() + config.PHOTO_UPLOAD_SWEEP_SECONDS
+    while True:
+        if time.monotonic() >= next_sweep:
+            _sweep()
+            next_sweep = time.monotonic() + config.PHOTO_UPLOAD_SWEEP_SECONDS
+        try:
+            s3_key = _jobs.get(timeout=max(0.0, next_sweep - time.monotonic()))
+        except queue.Empty:
+            continue
+        try:
+            _process(s3_key)
+        except Exception as e:
+            logger.error(f"Unexpected error in photo uploader for {s3_key}: {e}", exc_info=True)
+
+
+def _sweep():
+    """Re-queues jobs left in the spool by failed uploads or dead workers."""
+    now = time.time()
+    try:
+        names = os.listdir(_spool_dir())
+    except OSError as e:
+        logger.error(f"Cannot read photo spool: {e}")
+        return
+    for name in names:
+        path = os.path.join(_spool_dir(), name)
+        try:
+            age = now - os.path.getmtime(path)
+            if name.endswith('.json.inflight') and age > _INFLIGHT_STALE_SECONDS:
+                os.rename(path, path[:-len('.inflight')])
+                path = path[:-len('.inflight')]
+            elif not (name.endswith('.json') and age > _SWEEP_GRACE_SECONDS):
+                continue
+            with open(path) as f:
+                _jobs.put(json.load(f)['s3_key'])
+        except (OSError, ValueError, KeyError):
+            continue
+
+
+def _process(s3_key):
+    from app import db_helpers
+    from app.utils import get_s3_client, get_s3_upload_config
+
+    data_path, meta_path = _spool_paths(s3_key)
+    inflight_path = f"{meta_path}.inflight"
+    try:
+        # Atomic claim: only one worker process gets to upload this job
+        os.rename(meta_path, inflight_path)
+    except FileNotFoundError:
+        return
+    # Claim time, not staging time, decides when the job counts as abandoned
+    os.utime(inflight_path)
+    with open(inflight_path) as f:
+        job = json.load(f)
+
+    s3_client = get_s3_client()
+    upload_config = get_s3_upload_config()
+    for attempt in range(1, config.PHOTO_UPLOAD_MAX_RETRIES + 1):
+        try:
+            for index, extra in enumerate(job.get('extras', [])):
+                s3_client.upload_file(_extra_path(data_path, index), job['bucket'], extra['s3_key'],
+                                      ExtraArgs={'ContentType': extra['content_type']} if extra.get('content_type') else None,
+                                      Config=upload_config)
+            s3_client.upload_file(data_path, job['bucket'], s3_key,
+                                  ExtraArgs={'ContentType': job['content_type']} if job.get('content_type') else None,
+                                  Config=upload_config)
+            break
+        except FileNotFoundError:
+            logger.info(f"Staged photo {s3_key} was discarded before upload")
+            return
+        except Exception as e:
+            if attempt == config.PHOTO_UPLOAD_MAX_RETRIES:
+                logger.error(f"Photo upload failed after {attempt} attempts, leaving in spool for retry: {s3_key}: {e}")
+                os.rename(inflight_path, meta_path)
+                return
+            delay = min(60, 2 ** attempt)
+            logger.warning(f"Photo upload attempt {attempt} failed for {s3_key}, retrying in {delay}s: {e}")
+            time.sleep(delay)
+
+    try:
+        with _app.app_context():
+            updated = db_helpers.finalize_pending_photo(f"{PENDING_PREFIX}{s3_key}", s3_key)
+    except Exception as e:
+        logger.error(f"Uploaded {s3_key} but could not update its record, will retry: {e}", exc_info=True)
+        os.rename(inflight_path, meta_path)
+        return
+    if not updated:
+        # Row deleted or photo replaced while uploading - nothing references the object
+        logger.warning(f"No record references uploaded photo {s3_key}, deleting it from S3")
+        s3_client.delete_object(Bucket=job['bucket'], Key=s3_key)
+        for extra in job.get('extras', []):
+            s3_client.delete_object(Bucket=job['bucket'], Key=extra['s3_key'])
+    _remove_spool_files(s3_key)
+    logger.info(f"Uploaded staged photo to S3: {s3_key} ({updated} record(s) updated)")
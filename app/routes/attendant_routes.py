@@ -18,7 +18,7 @@ from app import config
 from app import db_helpers
 from app.models import db, Attendant
 # Import the decorator from the new decorators.py file
-from app.decorators import permission_required
+from app.decorators import permission_required, conditional_get
 
 # --- Blueprint Definition ---
 attendant_bp = Blueprint('attendant', __name__, url_prefix='/attendant')
@@ -99,8 +99,8 @@ def submit_form():
         flash("Error verifying Badge ID uniqueness. Please try again.", "error")
         return redirect(url_for('attendant.form_page'))
 
-    # --- Handle Photo Upload ---
-    s3_object_key = utils.handle_photo_upload(
+    # --- Handle Photo Upload (staged; uploaded to S3 in the background after commit) ---
+    s3_object_key = utils.stage_photo_upload(
         files.get('photo'),
         config.S3_BUCKET_NAME,
         s3_prefix='attendants',
@@ -112,7 +112,7 @@ def submit_form():
     # --- Handle SNE Photo Upload ---
     sne_s3_object_key = "N/A"
     if attendant_type == 'Family' and 'sne_photo' in files and sne_id:
-        sne_s3_object_key = utils.handle_photo_upload(
+        sne_s3_object_key = utils.stage_photo_upload(
             files.get('sne_photo'),
             config.S3_BUCKET_NAME,
             s3_prefix='sne_members',
@@ -151,6 +151,7 @@ def submit_form():
         attendant, success, error_msg = db_helpers.create_attendant(badge_id, **attendant_dict)
         if success:
             logger.info(f"Successfully added attendant data for Badge ID: {badge_id}")
+            utils.dispatch_photo_uploads(s3_object_key, sne_s3_object_key)
             flash(f'Attendant data submitted successfully! Badge ID: {badge_id}', 'success')
             return redirect(url_for('attendant.form_page'))
         else:
@@ -213,6 +214,7 @@ def lookup_sne_member(sne_badge_id):
 @attendant_bp.route('/search', methods=['GET'])
 @login_required
 @permission_required('search_attendant_entries')
+@conditional_get(Attendant)
 def search_entries():
     """Searches attendant data by name or badge ID and returns JSON. PostgreSQL version."""
     search_name = request.args.get('name', '').strip().lower()
@@ -501,7 +503,8 @@ def generate_pdf():
         "font_path": config.FONT_PATH,
         "font_bold_path": config.FONT_BOLD_PATH,
         "s3_bucket": config.S3_BUCKET_NAME,
-        "wrap_config": {'field_key': 'address', 'width': 20, 'spacing': 4}
+        "wrap_config": {'field_key': 'address', 'width': 20, 'spacing': 4},
+        "vector_text": config.BADGE_VECTOR_TEXT
     }
 
     pdf_ready_data = []
@@ -1,14 +1,18 @@
 # blood_camp_routes.py (Updated for circular import fix, RBAC, and ID format)
 import datetime
+import json
 import re
 import logging
 import collections # For Counter
+import contextlib
 import threading # For thread-safe ID generation
 import time # For retry delays
+import types
+import uuid
 from dateutil import parser as date_parser
 
 from flask import (
-    Blueprint, render_template, request, redirect, url_for, flash, jsonify,
+    Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response,
     current_app # current_app can be useful for accessing app context if needed
 )
 from flask_login import login_required
@@ -20,10 +24,13 @@ from flask_login import current_user
 from app import utils
 from app import config
 from app import db_helpers
+from app import change_feed
+from app import metrics
+from app.cache import TTLCache, get_table_version, wait_for_table_change
 from app.models import db, BloodCampDonor
 from sqlalchemy import and_
 # Import the decorator from the new decorators.py file
-from app.decorators import permission_required
+from app.decorators import permission_required, conditional_get
 
 # --- Blueprint Definition ---
 blood_camp_bp = Blueprint('blood_camp', __name__, url_prefix='/blood_camp')
@@ -33,6 +40,10 @@ logger = logging.getLogger(__name__)
 # This prevents race conditions when multiple users submit forms simultaneously
 _donor_id_lock = threading.Lock()
 
+# Dashboard aggregates, dropped when blood_camp_donors is written (or after the TTL,
+# which bounds staleness for writes made by other workers)
+_dashboard_cache = TTLCache(ttl_seconds=config.DASHBOARD_CACHE_TTL, max_entries=64)
+
 # Mapping from sheet header names to incoming form field names where they differ.
 # This resolves issues where certain headers were transformed into incorrect keys
 # (e.g., "Name of Donor" -> "name_of_donor" but form uses "donor_name").
@@ -90,6 +101,74 @@ def find_donor_by_mobile_and_name(sheet, mobile_number, donor_name):
     # PostgreSQL version - sheet parameter ignored
     return db_helpers.find_donor_by_mobile_and_name_postgres(mobile_number, donor_name)
 
+def _submitted_donor_id(submission_key):
+    """Donor ID already recorded for a submitted form's idempotency key, or None."""
+    if not submission_key:
+        return None
+    return db_helpers.get_submission_record_ids(db_helpers.SUBMISSION_KIND_BLOOD_CAMP, [submission_key]).get(submission_key)
+
+def _validate_donor_form(form_data):
+    """
+    Checks the mandatory fields of a submitted blood camp form.
+    Returns (cleaned mobile number, donor name, error message or None).
+    """
+    mobile_number = str(form_data.get('mobile_no') or '').strip()
+    donor_name = str(form_data.get('donor_name') or '').strip()
+
+    if not mobile_number:
+        return mobile_number, donor_name, "Mobile number is required."
+    if not donor_name:
+        return mobile_number, donor_name, "Donor name is required."
+
+    cleaned_mobile_number = utils.clean_phone_number(mobile_number)
+    if len(cleaned_mobile_number) != 10:
+        return cleaned_mobile_number, donor_name, "Mobile number must be 10 digits."
+
+    required_fields = ['donor_name', 'father_husband_name', 'dob', 'gender', 'city', 'blood_group', 'donation_date', 'donation_location']
+    missing_fields = [field for field in required_fields if not form_data.get(field)]
+    if missing_fields:
+        return cleaned_mobile_number, donor_name, f"Missing required fields: {', '.join(missing_fields)}"
+    return cleaned_mobile_number, donor_name, None
+
+def _parse_form_date(value, default):
+    """Parses a date entered on the form, returning default if it is empty or unparseable."""
+    if not value:
+        return default
+    try:
+        return date_parser.parse(value).date()
+    except (ValueError, OverflowError):
+        return default
+
+def _donor_fields(form_data, existing_donor=None):
+    """
+    Column values of a donation record (each donation is a separate row). A repeat
+    donation falls back to the donor's previous details for fields not on the form
+    and carries their first donation date and donation count forward.
+    """
+    def previous(column):
+        return (getattr(existing_donor, column) if existing_donor else None) or ''
+
+    donation_date = _parse_form_date(form_data.get('donation_date', datetime.date.today().isoformat()), datetime.date.today())
+    return {
+        'father_husband_name': form_data.get('father_husband_name', previous('father_husband_name')),
+        'date_of_birth': _parse_form_date(form_data.get('dob', ''), None),
+        'gender': form_data.get('gender', previous('gender')),
+        'occupation': form_data.get('occupation', previous('occupation')),
+        'house_no': form_data.get('house_no', previous('house_no')),
+        'sector': form_data.get('sector', previous('sector')),
+        'city': form_data.get('city', previous('city')),
+        'blood_group': form_data.get('blood_group', previous('blood_group')),
+        'allow_call': form_data.get('allow_call', previous('allow_call')),
+        'donation_date': donation_date,
+        'donation_location': form_data.get('donation_location', ''),
+        'first_donation_date': (existing_donor.first_donation_date if existing_donor else None) or donation_date,
+        'total_donations': ((existing_donor.total_donations or 0) if existing_donor else 0) + 1,
+        # Prefer the existing donor's area
+        'area': infer_area(form_data.get('donation_location', ''), form_data.get('city', ''), previous('area')),
+        'status': '',  # Reset status for new donation
+        'reason_for_rejection': ''
+    }
+
 # --- Blood Camp Routes ---
 @blood_camp_bp.route('/form')
 @login_required
@@ -101,12 +180,15 @@ def form_page():
     return render_template('blood_camp_form.html',
                            today_date=today_date,
                            current_year=current_year,
+                           submission_key=uuid.uuid4().hex,
+                           sync_batch_max=config.SYNC_BATCH_MAX,
                            # current_user is available globally
                            donation_locations=config.BLOOD_CAMP_DONATION_LOCATIONS)
 
 @blood_camp_bp.route('/search_donor', methods=['GET'])
 @login_required
 @permission_required('search_blood_donor')
+@conditional_get()
 def search_donor_route():
     """Endpoint called by JS to search for an existing donor by mobile and name.
     PostgreSQL version - requires both mobile number and name for accurate donor identification."""
@@ -159,99 +241,42 @@ def submit_form():
     """Handles blood camp form submission (new donor or new donation).
     Now uses phone number + name to identify unique donors. PostgreSQL version."""
     form_data = request.form.to_dict()
-    mobile_number = form_data.get('mobile_no', '').strip()
-    donor_name = form_data.get('donor_name', '').strip()
-
-    if not mobile_number:
-        flash("Mobile number is required.", "error")
-        return redirect(url_for('blood_camp.form_page'))
-    
-    if not donor_name:
-        flash("Donor name is required.", "error")
-        return redirect(url_for('blood_camp.form_page'))
-        
-    cleaned_mobile_number = utils.clean_phone_number(mobile_number)
-    if len(cleaned_mobile_number) != 10:
-        flash("Mobile number must be 10 digits.", "error")
+    # A resubmitted form (double-clicked Submit) gets the original outcome, without allocating an ID
+    submission_key = utils.clean_idempotency_key(form_data.get('submission_key'))
+    submitted_donor_id = _submitted_donor_id(submission_key)
+    if submitted_donor_id:
+        flash(f'This form was already submitted. Donor ID: {submitted_donor_id}', 'success')
         return redirect(url_for('blood_camp.form_page'))
 
-    required_fields = ['donor_name', 'father_husband_name', 'dob', 'gender', 'city', 'blood_group', 'donation_date', 'donation_location']
-    missing_fields = [field for field in required_fields if not form_data.get(field)]
-    if missing_fields:
-        flash(f"Missing required fields: {', '.join(missing_fields)}", "error")
+    cleaned_mobile_number, donor_name, error = _validate_donor_form(form_data)
+    if error:
+        flash(error, "error")
         return redirect(url_for('blood_camp.form_page'))
 
     try:
         # Search by BOTH mobile number AND name (returns BloodCampDonor object or None)
         existing_donor_data = find_donor_by_mobile_and_name(None, cleaned_mobile_number, donor_name)
-        current_donation_date = form_data.get('donation_date', datetime.date.today().isoformat())
+        donor_dict = _donor_fields(form_data, existing_donor_data)
 
         if existing_donor_data:
             # --- Record New Donation for Existing Donor ---
             donor_id = existing_donor_data.donor_id
-            first_donation_date = existing_donor_data.first_donation_date or current_donation_date
-            total_donations = (existing_donor_data.total_donations or 0) + 1
-            
-            # Derive area (prefer existing donor's area)
-            derived_area = infer_area(
-                form_data.get('donation_location', ''),
-                form_data.get('city', ''),
-                existing_donor_data.area or ''
-            )
-            
-            # Parse donation date
-            try:
-                if isinstance(current_donation_date, str):
-                    donation_date_obj = date_parser.parse(current_donation_date).date()
-                else:
-                    donation_date_obj = current_donation_date
-            except:
-                donation_date_obj = datetime.date.today()
-            
-            # Parse DOB
-            try:
-                dob_str = form_data.get('dob', '')
-                dob_obj = date_parser.parse(dob_str).date() if dob_str else None
-            except:
-                dob_obj = None
-            
-            # Parse first donation date
-            try:
-                if isinstance(first_donation_date, str):
-                    first_donation_date_obj = date_parser.parse(first_donation_date).date()
-                else:
-                    first_donation_date_obj = first_donation_date
-            except:
-                first_donation_date_obj = donation_date_obj
-            
-            # Create new donation record (each donation is a separate row/record)
-            donor_dict = {
-                'father_husband_name': form_data.get('father_husband_name', existing_donor_data.father_husband_name or ''),
-                'date_of_birth': dob_obj,
-                'gender': form_data.get('gender', existing_donor_data.gender or ''),
-                'occupation': form_data.get('occupation', existing_donor_data.occupation or ''),
-                'house_no': form_data.get('house_no', existing_donor_data.house_no or ''),
-                'sector': form_data.get('sector', existing_donor_data.sector or ''),
-                'city': form_data.get('city', existing_donor_data.city or ''),
-                'blood_group': form_data.get('blood_group', existing_donor_data.blood_group or ''),
-                'allow_call': form_data.get('allow_call', existing_donor_data.allow_call or ''),
-                'donation_date': donation_date_obj,
-                'donation_location': form_data.get('donation_location', ''),
-                'first_donation_date': first_donation_date_obj,
-                'total_donations': total_donations,
-                'area': derived_area,
-                'status': '',  # Reset status for new donation
-                'reason_for_rejection': ''
-            }
+            total_donations = donor_dict['total_donations']
             
             # Retry logic for duplicate donor_id (race condition)
             max_retries = 3
             retry_count = 0
             while retry_count < max_retries:
-                new_donor, success, error_msg = db_helpers.create_blood_donor(donor_id, cleaned_mobile_number, donor_name, **donor_dict)
+                new_donor, success, error_msg = db_helpers.create_blood_donor(donor_id, cleaned_mobile_number, donor_name,
+                                                                              submission_key=submission_key, **donor_dict)
                 if success:
                     flash(f'New donation recorded successfully for Donor ID: {donor_id} (Total Donations: {total_donations})', 'success')
                     break
+                elif error_msg == "DUPLICATE_SUBMISSION":
+                    # Donor forms have no photo to clean up; if they get one, keep the photo the recorded
+                    # donation references, as sne_routes.submit_form does
+                    flash(f'This form was already submitted. Donor ID: {_submitted_donor_id(submission_key)}', 'success')
+                    break
                 elif error_msg == "DUPLICATE_DONOR_ID":
                     retry_count += 1
                     if retry_count >= max_retries:
@@ -265,14 +290,6 @@ def submit_form():
                     break
         else:
             # --- Register New Donor ---
-            first_donation_date = current_donation_date
-            total_donations = 1
-            derived_area = infer_area(
-                form_data.get('donation_location', ''),
-                form_data.get('city', ''),
-                ''
-            )
-            
             # Generate new donor ID with retry logic
             max_id_retries = 3
             id_retry_count = 0
@@ -290,51 +307,19 @@ def submit_form():
                         return redirect(url_for('blood_camp.form_page'))
                     logger.warning(f"Donor ID generation attempt {id_retry_count} failed, retrying...")
             
-            # Parse donation date
-            try:
-                if isinstance(current_donation_date, str):
-                    donation_date_obj = date_parser.parse(current_donation_date).date()
-                else:
-                    donation_date_obj = current_donation_date
-            except:
-                donation_date_obj = datetime.date.today()
-            
-            # Parse DOB
-            try:
-                dob_str = form_data.get('dob', '')
-                dob_obj = date_parser.parse(dob_str).date() if dob_str else None
-            except:
-                dob_obj = None
-            
-            # Create new donor record
-            donor_dict = {
-                'father_husband_name': form_data.get('father_husband_name', ''),
-                'date_of_birth': dob_obj,
-                'gender': form_data.get('gender', ''),
-                'occupation': form_data.get('occupation', ''),
-                'house_no': form_data.get('house_no', ''),
-                'sector': form_data.get('sector', ''),
-                'city': form_data.get('city', ''),
-                'blood_group': form_data.get('blood_group', ''),
-                'allow_call': form_data.get('allow_call', ''),
-                'donation_date': donation_date_obj,
-                'donation_location': form_data.get('donation_location', ''),
-                'first_donation_date': donation_date_obj,
-                'total_donations': total_donations,
-                'area': derived_area,
-                'status': '',
-                'reason_for_rejection': ''
-            }
-            
             # Retry logic for duplicate donor_id (race condition)
             max_insert_retries = 3
             insert_retry_count = 0
             
             while insert_retry_count < max_insert_retries:
-                new_donor, success, error_msg = db_helpers.create_blood_donor(new_donor_id, cleaned_mobile_number, donor_name, **donor_dict)
+                new_donor, success, error_msg = db_helpers.create_blood_donor(new_donor_id, cleaned_mobile_number, donor_name,
+                                                                              submission_key=submission_key, **donor_dict)
                 if success:
                     flash(f'New donor registered successfully! Donor ID: {new_donor_id}', 'success')
                     break
+                elif error_msg == "DUPLICATE_SUBMISSION":
+                    flash(f'This form was already submitted. Donor ID: {_submitted_donor_id(submission_key)}', 'success')
+                    break
                 elif error_msg == "DUPLICATE_DONOR_ID":
                     insert_retry_count += 1
                     if insert_retry_count >= max_insert_retries:
@@ -357,6 +342,80 @@ def submit_form():
         flash(f"A server error occurred during submission: {e}", "error")
         return redirect(url_for('blood_camp.form_page'))
 
+@blood_camp_bp.route('/sync', methods=['POST'])
+@login_required
+@permission_required('submit_blood_camp_form')
+def sync_submissions():
+    """
+    API endpoint for operator clients that queue forms while offline. Takes JSON
+    {"entries": [{"key": "<client UUID>", "form": {<blood camp form fields>}}, ...]}
+    and records all valid entries in one transaction. Returns a result per entry, in order:
+    "created" or "already_synced" (both with the donor_id), or "invalid" (with a message).
+    Resending a batch is safe: keys that were synced before return their original donor ID.
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"success": False, "error": "A non-empty 'entries' list is required."}), 400
+    if len(entries) > config.SYNC_BATCH_MAX:
+        return jsonify({"success": False, "error": f"At most {config.SYNC_BATCH_MAX} entries per request."}), 400
+
+    entries = [entry if isinstance(entry, dict) else {} for entry in entries]
+    keys = [utils.clean_idempotency_key(entry.get('key')) for entry in entries]
+    synced = db_helpers.get_submission_record_ids(db_helpers.SUBMISSION_KIND_BLOOD_CAMP, [key for key in keys if key])
+
+    results = []
+    valid = {}  # key -> (form data, mobile number, donor name), in submission order
+    for key, entry in zip(keys, entries):
+        form_data = entry.get('form') if isinstance(entry.get('form'), dict) else {}
+        form_data = {field: str(value) for field, value in form_data.items() if value is not None}
+        if not key:
+            results.append({"key": entry.get('key'), "result": "invalid", "message": "A key of 8-64 letters, digits, '-' or '_' is required."})
+            continue
+        results.append({"key": key})
+        if key in synced or key in valid:
+            continue
+        cleaned_mobile_number, donor_name, error = _validate_donor_form(form_data)
+        if error:
+            results[-1].update({"result": "invalid", "message": error})
+            continue
+        valid[key] = (form_data, cleaned_mobile_number, donor_name)
+
+    # Repeat donors: one lookup for the whole batch. A donor queued earlier in the batch counts
+    # as their latest donation, as if the entries had been submitted one by one.
+    existing_donors = db_helpers.find_donors_by_mobile_and_name_postgres(
+        (mobile_number, donor_name) for _, mobile_number, donor_name in valid.values())
+    queued = collections.defaultdict(list)  # mobile number -> donations queued in this batch
+    batch = {}
+    for key, (form_data, cleaned_mobile_number, donor_name) in valid.items():
+        previous_donation = next((donation for donation in reversed(queued[cleaned_mobile_number])
+                                  if db_helpers.donor_name_matches(donation.name_of_donor, donor_name)), None)
+        fields = _donor_fields(form_data, previous_donation or existing_donors.get((cleaned_mobile_number, donor_name)))
+        queued[cleaned_mobile_number].append(types.SimpleNamespace(name_of_donor=donor_name, **fields))
+        batch[key] = (key, cleaned_mobile_number, donor_name, fields)
+
+    assigned = {}
+    if batch:
+        assigned, success, error_msg = db_helpers.create_blood_donors_batch(list(batch.values()), prefix="BD")
+        if not success:
+            return jsonify({"success": False, "error": f"Error saving entries: {error_msg}. No entries were saved."}), 500
+
+    # A key repeated within the batch is created once; its later entries report already_synced
+    reported = set()
+    for result in results:
+        key = result['key']
+        if 'result' in result:
+            continue
+        if key in assigned:
+            donor_id, created = assigned[key]
+            result.update({"result": "created" if created and key not in reported else "already_synced", "donor_id": donor_id})
+            reported.add(key)
+        else:
+            result.update({"result": "already_synced", "donor_id": synced[key]})
+    created_count = sum(1 for result in results if result['result'] == 'created')
+    logger.info(f"Blood camp sync by {current_user.id}: {created_count}/{len(entries)} created.")
+    return jsonify({"success": True, "created": created_count, "results": results})
+
 @blood_camp_bp.route('/status')
 @login_required
 @permission_required('access_blood_camp_status_update')
@@ -372,6 +431,7 @@ def status_page():
 @blood_camp_bp.route('/get_donor_details/<donor_id>', methods=['GET'])
 @login_required
 @permission_required('get_blood_donor_details')
+@conditional_get()
 def get_donor_details_route(donor_id):
     """Endpoint called by JS to fetch donor details for status update. PostgreSQL version."""
     cleaned_donor_id = donor_id.strip().upper()
@@ -399,32 +459,38 @@ def get_donor_details_route(donor_id):
         logger.error(f"Error fetching donor details for {cleaned_donor_id}: {e}", exc_info=True)
         return jsonify({"error": "Server error fetching details."}), 500
 
+def _validate_status_update(donor_id, status, reason):
+    """
+    Normalises one status update as entered at the status desk.
+    Returns (donor_id, status, reason, error message or None).
+    """
+    donor_id = str(donor_id or '').strip().upper()
+    status = str(status or '').strip().capitalize()
+    reason = str(reason or '').strip()
+
+    # Validate donor ID
+    if re.fullmatch(r'\d{4,}', donor_id):
+        donor_id = f"BD{donor_id}"
+    if not re.fullmatch(r'BD\d{4,}', donor_id):
+        return donor_id, status, reason, "A valid Donor ID (e.g., BD0001) is required."
+    if status not in ['Accepted', 'Rejected']:
+        return donor_id, status, reason, "Status must be 'Accepted' or 'Rejected'."
+    if status == 'Rejected' and not reason:
+        return donor_id, status, reason, "A reason is required when rejecting a donor."
+    if status == 'Accepted':
+        reason = ''  # Clear reason if accepted
+    return donor_id, status, reason, None
+
 @blood_camp_bp.route('/update_status', methods=['POST'])
 @login_required
 @permission_required('update_blood_donor_status')
 def update_status_route():
     """Handles the submission to update a donor's status. PostgreSQL version."""
-    donor_id_from_form = request.form.get('token_id', '').strip().upper()
-    status = request.form.get('status', '').strip().capitalize()
-    reason = request.form.get('reason', '').strip()
-
-    # Validate donor ID
-    if not donor_id_from_form:
-        flash("A valid Donor ID (e.g., BD0001) is required.", "error")
-        return redirect(url_for('blood_camp.status_page'))
-    if re.fullmatch(r'\d{4,}', donor_id_from_form):
-        donor_id_from_form = f"BD{donor_id_from_form}"
-    if not re.fullmatch(r'BD\d{4,}', donor_id_from_form):
-        flash("A valid Donor ID (e.g., BD0001) is required.", "error")
-        return redirect(url_for('blood_camp.status_page'))
-    if not status or status not in ['Accepted', 'Rejected']:
-        flash("Status must be 'Accepted' or 'Rejected'.", "error")
-        return redirect(url_for('blood_camp.status_page'))
-    if status == 'Rejected' and not reason:
-        flash("A reason is required when rejecting a donor.", "error")
+    donor_id_from_form, status, reason, error = _validate_status_update(
+        request.form.get('token_id'), request.form.get('status'), request.form.get('reason'))
+    if error:
+        flash(error, "error")
         return redirect(url_for('blood_camp.status_page'))
-    if status == 'Accepted':
-        reason = ''  # Clear reason if accepted
 
     try:
         # Update donor status in PostgreSQL
@@ -442,6 +508,48 @@ def update_status_route():
         flash(f"Error updating status: {e}", "error")
         return redirect(url_for('blood_camp.status_page'))
 
+@blood_camp_bp.route('/update_status_bulk', methods=['POST'])
+@login_required
+@permission_required('update_blood_donor_status')
+def update_status_bulk_route():
+    """
+    API endpoint for the status desk to clear many donors at once. Takes JSON
+    {"updates": [{"donor_id": "BD00012", "status": "Accepted"},
+                 {"donor_id": "BD00013", "status": "Rejected", "reason": "Low Hb"}, ...]}
+    and applies all valid entries in one transaction. Returns a result per entry, in order:
+    "updated", "not_found" or "invalid" (with a message).
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"success": False, "error": "A non-empty 'updates' list is required."}), 400
+    if len(entries) > config.STATUS_BULK_MAX:
+        return jsonify({"success": False, "error": f"At most {config.STATUS_BULK_MAX} updates per request."}), 400
+
+    results = []
+    valid_updates = []
+    for entry in entries:
+        entry = entry if isinstance(entry, dict) else {}
+        donor_id, status, reason, error = _validate_status_update(entry.get('donor_id'), entry.get('status'), entry.get('reason'))
+        if error:
+            results.append({"donor_id": donor_id, "result": "invalid", "message": error})
+        else:
+            results.append({"donor_id": donor_id, "status": status})
+            valid_updates.append({"donor_id": donor_id, "status": status, "reason_for_rejection": reason})
+
+    try:
+        updated_ids = db_helpers.update_donor_statuses(valid_updates)
+    except Exception as e:
+        logger.error(f"Error in bulk status update of {len(valid_updates)} donors: {e}", exc_info=True)
+        return jsonify({"success": False, "error": "Error updating statuses. No changes were saved."}), 500
+
+    for result in results:
+        if 'result' not in result:
+            result['result'] = 'updated' if result['donor_id'] in updated_ids else 'not_found'
+    updated_count = sum(1 for result in results if result['result'] == 'updated')
+    logger.info(f"Bulk status update by {current_user.id}: {updated_count}/{len(entries)} updated.")
+    return jsonify({"success": True, "updated": updated_count, "results": results})
+
 @blood_camp_bp.route('/dashboard')
 @login_required
 @permission_required('access_blood_camp_dashboard')
@@ -449,174 +557,252 @@ def dashboard_page():
     """Displays the blood camp dashboard."""
     logger.info("Dashboard route accessed by user: %s", current_user.id)
     current_year = datetime.date.today().year
-    return render_template('dashboard.html', current_year=current_year)
+    return render_template('dashboard.html', current_year=current_year,
+                           stream_enabled=config.DASHBOARD_STREAM_ENABLED)
+
+def _compute_dashboard_data(filter_date):
+    """Aggregates the latest entry per donor into the dashboard KPIs and chart series."""
+    # Get all blood donors (latest entries per donor_id)
+    from sqlalchemy import func
+
+    # Subquery to get latest submission timestamp for each donor_id
+    latest_subquery = db.session.query(
+        BloodCampDonor.donor_id,
+        func.max(BloodCampDonor.submission_timestamp).label('max_timestamp')
+    ).group_by(BloodCampDonor.donor_id).subquery()
+
+    # Join to get the full records of latest entries
+    query = db.session.query(BloodCampDonor).join(
+        latest_subquery,
+        and_(
+            BloodCampDonor.donor_id == latest_subquery.c.donor_id,
+            BloodCampDonor.submission_timestamp == latest_subquery.c.max_timestamp
+        )
+    )
+
+    # Apply date filter if provided
+    if filter_date:
+        query = query.filter(func.date(BloodCampDonor.submission_timestamp) == filter_date)
+
+    donors = query.all()
+
+    # Initialize aggregation containers
+    today_str = datetime.date.today().isoformat()
+    registrations_today = 0
+    accepted_count = 0
+    rejected_count = 0
+    blood_groups = []
+    genders = []
+    ages = []
+    statuses = []
+    rejection_reasons = []
+    donor_types_list = []
+    allow_calls = []
+    location_values = []
+
+    # Process each donor
+    for donor in donors:
+        entry_date = donor.submission_timestamp.date() if donor.submission_timestamp else None
+        
+        # Registrations KPI logic
+        if filter_date:
+            if entry_date == filter_date:
+                registrations_today += 1
+        else:
+            if entry_date and entry_date.isoformat() == today_str:
+                registrations_today += 1
+        
+        # Status counts
+        stat = (donor.status or '').strip().capitalize()
+        if stat == "Accepted":
+            accepted_count += 1
+            statuses.append("Accepted")
+        elif stat == "Rejected":
+            rejected_count += 1
+            statuses.append("Rejected")
+            reason_text = (donor.reason_for_rejection or '').strip()
+            if reason_text:
+                rejection_reasons.append(reason_text)
+        else:
+            statuses.append("Other/Pending")
+        
+        # Blood group distribution
+        bg = (donor.blood_group or '').strip().upper()
+        blood_groups.append(bg if bg else "Unknown")
+        
+        # Gender distribution
+        gen = (donor.gender or '').strip().capitalize()
+        genders.append(gen if gen else "Unknown")
+        
+        # Age distribution
+        if donor.date_of_birth:
+            age = utils.calculate_age_from_dob(donor.date_of_birth.isoformat())
+            if age is not None:
+                ages.append(age)
+        
+        # Donor types (first-time vs repeat)
+        num_donations = donor.total_donations or 1
+        donor_types_list.append("Repeat" if num_donations > 1 else "First-Time")
+        
+        # Communication opt-in
+        call_pref = (donor.allow_call or '').strip().capitalize()
+        allow_calls.append(call_pref if call_pref in ["Yes", "No"] else "Unknown")
+        
+        # Donation locations
+        loc_raw = (donor.donation_location or '').strip()
+        location_values.append(loc_raw if loc_raw else "Unknown")
+
+    # Calculate derived metrics
+    total_decided = accepted_count + rejected_count
+    acceptance_rate = (accepted_count / total_decided * 100) if total_decided > 0 else 0.0
+
+    # Age group binning
+    age_group_counts = collections.defaultdict(int)
+    for age_val in ages:
+        binned = False
+        for min_age, max_age in config.AGE_GROUP_BINS:
+            if min_age <= age_val <= max_age:
+                age_group_counts[f"{min_age}-{max_age}"] += 1
+                binned = True
+                break
+        if not binned:
+            age_group_counts["> 65" if age_val > 65 else "< 18"] += 1
+
+    # Sort age groups
+    try:
+        sorted_age_group_keys = sorted(
+            age_group_counts.keys(),
+            key=lambda x: int(re.search(r'\d+', x.replace('<', '').replace('>', '')).group())
+        )
+    except Exception:
+        sorted_age_group_keys = sorted(age_group_counts.keys())
+    sorted_age_group_counts_final = {k: age_group_counts[k] for k in sorted_age_group_keys}
+
+    # Build response
+    response_payload = {
+        "kpis": {
+            "registrations_today": registrations_today,
+            "accepted_total": accepted_count,
+            "rejected_total": rejected_count,
+            "acceptance_rate": round(acceptance_rate, 1)
+        },
+        "blood_group_distribution": dict(collections.Counter(blood_groups)),
+        "gender_distribution": dict(collections.Counter(genders)),
+        "age_group_distribution": sorted_age_group_counts_final,
+        "status_counts": {
+            "Accepted": collections.Counter(statuses).get("Accepted", 0),
+            "Rejected": collections.Counter(statuses).get("Rejected", 0),
+            "Other/Pending": collections.Counter(statuses).get("Other/Pending", 0)
+        },
+        "rejection_reasons": dict(collections.Counter(rejection_reasons).most_common(10)),
+        "donor_types": dict(collections.Counter(donor_types_list)),
+        "communication_opt_in": dict(collections.Counter(allow_calls)),
+        "donation_location_distribution": dict(collections.Counter(location_values))
+    }
+
+    if filter_date:
+        response_payload["filter_date"] = filter_date.isoformat()
+    return response_payload
+
+def get_dashboard_data(filter_date=None):
+    """
+    Dashboard payload for a date (or all dates), computed once per donor-table change
+    and shared by every poll and event stream in this worker.
+    """
+    # Today's date is part of the key: 'registrations_today' rolls over at midnight
+    return _dashboard_cache.get_or_compute(
+        (filter_date, datetime.date.today()),
+        lambda: _compute_dashboard_data(filter_date),
+        tables=(BloodCampDonor.__tablename__,)
+    )
+
+def _parse_dashboard_date():
+    """Optional ?date=YYYY-MM-DD filter; invalid values are ignored."""
+    date_str = request.args.get('date', '').strip()
+    if date_str:
+        try:
+            return datetime.date.fromisoformat(date_str)
+        except ValueError:
+            pass
+    return None
 
 @blood_camp_bp.route('/dashboard_data')
 @login_required
 @permission_required('view_blood_camp_dashboard_data')
+@conditional_get(BloodCampDonor)
 def dashboard_data_route():
     """Provides data for the blood camp dashboard charts. PostgreSQL version.
     
     Optional Query Param:
         date=YYYY-MM-DD -> If provided, metrics are computed ONLY for entries on that date.
     """
-    # Parse optional date filter
-    date_str = request.args.get('date', '').strip()
-    filter_date = None
-    if date_str:
-        try:
-            filter_date = datetime.date.fromisoformat(date_str)
-        except ValueError:
-            filter_date = None
-    
     try:
-        # Get all blood donors (latest entries per donor_id)
-        from sqlalchemy import func
-        
-        # Subquery to get latest submission timestamp for each donor_id
-        latest_subquery = db.session.query(
-            BloodCampDonor.donor_id,
-            func.max(BloodCampDonor.submission_timestamp).label('max_timestamp')
-        ).group_by(BloodCampDonor.donor_id).subquery()
-        
-        # Join to get the full records of latest entries
-        query = db.session.query(BloodCampDonor).join(
-            latest_subquery,
-            and_(
-                BloodCampDonor.donor_id == latest_subquery.c.donor_id,
-                BloodCampDonor.submission_timestamp == latest_subquery.c.max_timestamp
-            )
-        )
-        
-        # Apply date filter if provided
-        if filter_date:
-            query = query.filter(func.date(BloodCampDonor.submission_timestamp) == filter_date)
-        
-        donors = query.all()
-        
-        # Initialize aggregation containers
-        today_str = datetime.date.today().isoformat()
-        registrations_today = 0
-        accepted_count = 0
-        rejected_count = 0
-        blood_groups = []
-        genders = []
-        ages = []
-        statuses = []
-        rejection_reasons = []
-        donor_types_list = []
-        allow_calls = []
-        location_values = []
-        
-        # Process each donor
-        for donor in donors:
-            entry_date = donor.submission_timestamp.date() if donor.submission_timestamp else None
-            
-            # Registrations KPI logic
-            if filter_date:
-                if entry_date == filter_date:
-                    registrations_today += 1
-            else:
-                if entry_date and entry_date.isoformat() == today_str:
-                    registrations_today += 1
-            
-            # Status counts
-            stat = (donor.status or '').strip().capitalize()
-            if stat == "Accepted":
-                accepted_count += 1
-                statuses.append("Accepted")
-            elif stat == "Rejected":
-                rejected_count += 1
-                statuses.append("Rejected")
-                reason_text = (donor.reason_for_rejection or '').strip()
-                if reason_text:
-                    rejection_reasons.append(reason_text)
-            else:
-                statuses.append("Other/Pending")
-            
-            # Blood group distribution
-            bg = (donor.blood_group or '').strip().upper()
-            blood_groups.append(bg if bg else "Unknown")
-            
-            # Gender distribution
-            gen = (donor.gender or '').strip().capitalize()
-            genders.append(gen if gen else "Unknown")
-            
-            # Age distribution
-            if donor.date_of_birth:
-                age = utils.calculate_age_from_dob(donor.date_of_birth.isoformat())
-                if age is not None:
-                    ages.append(age)
-            
-            # Donor types (first-time vs repeat)
-            num_donations = donor.total_donations or 1
-            donor_types_list.append("Repeat" if num_donations > 1 else "First-Time")
-            
-            # Communication opt-in
-            call_pref = (donor.allow_call or '').strip().capitalize()
-            allow_calls.append(call_pref if call_pref in ["Yes", "No"] else "Unknown")
-            
-            # Donation locations
-            loc_raw = (donor.donation_location or '').strip()
-            location_values.append(loc_raw if loc_raw else "Unknown")
-        
-        # Calculate derived metrics
-        total_decided = accepted_count + rejected_count
-        acceptance_rate = (accepted_count / total_decided * 100) if total_decided > 0 else 0.0
-        
-        # Age group binning
-        age_group_counts = collections.defaultdict(int)
-        for age_val in ages:
-            binned = False
-            for min_age, max_age in config.AGE_GROUP_BINS:
-                if min_age <= age_val <= max_age:
-                    age_group_counts[f"{min_age}-{max_age}"] += 1
-                    binned = True
-                    break
-            if not binned:
-                age_group_counts["> 65" if age_val > 65 else "< 18"] += 1
-        
-        # Sort age groups
-        try:
-            sorted_age_group_keys = sorted(
-                age_group_counts.keys(),
-                key=lambda x: int(re.search(r'\d+', x.replace('<', '').replace('>', '')).group())
-            )
-        except Exception:
-            sorted_age_group_keys = sorted(age_group_counts.keys())
-        sorted_age_group_counts_final = {k: age_group_counts[k] for k in sorted_age_group_keys}
-        
-        # Build response
-        response_payload = {
-            "kpis": {
-                "registrations_today": registrations_today,
-                "accepted_total": accepted_count,
-                "rejected_total": rejected_count,
-                "acceptance_rate": round(acceptance_rate, 1)
-            },
-            "blood_group_distribution": dict(collections.Counter(blood_groups)),
-            "gender_distribution": dict(collections.Counter(genders)),
-            "age_group_distribution": sorted_age_group_counts_final,
-            "status_counts": {
-                "Accepted": collections.Counter(statuses).get("Accepted", 0),
-                "Rejected": collections.Counter(statuses).get("Rejected", 0),
-                "Other/Pending": collections.Counter(statuses).get("Other/Pending", 0)
-            },
-            "rejection_reasons": dict(collections.Counter(rejection_reasons).most_common(10)),
-            "donor_types": dict(collections.Counter(donor_types_list)),
-            "communication_opt_in": dict(collections.Counter(allow_calls)),
-            "donation_location_distribution": dict(collections.Counter(location_values))
-        }
-        
-        if filter_date:
-            response_payload["filter_date"] = filter_date.isoformat()
-        
-        return jsonify(response_payload)
-        
+        return jsonify(get_dashboard_data(_parse_dashboard_date()))
     except Exception as e:
         logger.error(f"Dashboard Data: Error processing data: {e}", exc_info=True)
         return jsonify({"error": f"Server error processing dashboard data: {e}"}), 500
 
+@blood_camp_bp.route('/dashboard_stream')
+@login_required
+@permission_required('view_blood_camp_dashboard_data')
+def dashboard_stream_route():
+    """
+    Server-Sent Events stream of dashboard snapshots (same payload as dashboard_data).
+
+    Sends a 'snapshot' event on connect and again only when donors change and the
+    payload differs; otherwise just a keep-alive comment every few seconds. The stream
+    ends after DASHBOARD_STREAM_MAX_SECONDS and the browser reconnects on its own.
+
+    Each stream holds a worker thread, so at most DASHBOARD_STREAM_MAX_CLIENTS are open per
+    process; beyond that it answers 503 and the dashboard falls back to polling dashboard_data.
+    """
+    if not config.DASHBOARD_STREAM_ENABLED:
+        return jsonify({"error": "Dashboard streaming is disabled"}), 404
+
+    filter_date = _parse_dashboard_date()
+    app = current_app._get_current_object()
+
+    # Subscribed here rather than in generate(), so the limit can still be answered with a 503;
+    # released when the response closes, even if the stream never started
+    subscription = contextlib.ExitStack()
+    try:
+        table_name = subscription.enter_context(
+            change_feed.subscribe(app, BloodCampDonor, max_subscribers=config.DASHBOARD_STREAM_MAX_CLIENTS))
+    except change_feed.SubscriberLimitReached:
+        logger.info("Dashboard stream refused: DASHBOARD_STREAM_MAX_CLIENTS streams already open")
+        return jsonify({"error": "Too many open dashboard streams; poll dashboard_data instead"}), 503
+
+    def generate():
+        deadline = time.monotonic() + config.DASHBOARD_STREAM_MAX_SECONDS
+        yield "retry: 5000\n\n"
+        version = None
+        last_body = None
+        while time.monotonic() < deadline:
+            current_version = get_table_version(table_name)
+            if current_version != version:
+                version = current_version
+                try:
+                    with app.app_context():
+                        body = json.dumps(get_dashboard_data(filter_date), sort_keys=True)
+                except Exception as e:
+                    logger.error(f"Dashboard stream: Error processing data: {e}", exc_info=True)
+                    yield f"event: failure\ndata: {json.dumps({'error': str(e)})}\n\n"
+                    return
+                if body != last_body:
+                    last_body = body
+                    yield f"event: snapshot\nid: {version}\ndata: {body}\n\n"
+                    continue
+            yield ": keep-alive\n\n"
+            wait_for_table_change(table_name, version,
+                                  timeout=min(config.DASHBOARD_STREAM_HEARTBEAT_SECONDS, max(0, deadline - time.monotonic())))
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx: pass events through unbuffered
+    })
+    response.call_on_close(subscription.close)
+    return response
+
 @blood_camp_bp.route('/certificate_printer')
 @login_required
 @permission_required('access_blood_camp_certificate_printer')
@@ -672,6 +858,67 @@ def get_donor_for_certificate(donor_id):
         logger.error(f"Error fetching donor details for certificate {donor_id}: {e}", exc_info=True)
         return jsonify({"error": "Server error fetching details."}), 500
 
+CERTIFICATE_FIELDS = {  # Form field prefix -> default position (mm from top-left)
+    'name': (50, 80),
+    'location': (50, 110),
+    'date': (50, 140),
+    'serial': (50, 170),
+}
+
+def _certificate_layout_from_form():
+    """Text positions, font size and orientation from the certificate form. Raises ValueError."""
+    return {
+        'positions': {
+            field: (float(request.form.get(f'{field}_x', default_x)), float(request.form.get(f'{field}_y', default_y)))
+            for field, (default_x, default_y) in CERTIFICATE_FIELDS.items()
+        },
+        'font_size': int(request.form.get('font_size', 12)),
+        'orientation': request.form.get('orientation', 'landscape').strip().lower(),
+    }
+
+@metrics.timed('pdf', 'certificate_pdf')
+def _render_certificates(certificates, layout):
+    """
+    Draws each certificate (dict of CERTIFICATE_FIELDS key -> text) on its own page of a single
+    ReportLab canvas and returns the PDF bytes. Every page starts in the certificate font.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from io import BytesIO
+
+    buffer = BytesIO()
+    # Use landscape or portrait orientation based on form selection
+    pagesize = landscape(A4) if layout['orientation'] == 'landscape' else A4
+    c = canvas.Canvas(buffer, pagesize=pagesize, initialFontName="Helvetica-Bold", initialFontSize=layout['font_size'])
+    width, height = pagesize
+
+    for certificate in certificates:
+        # ReportLab uses bottom-left origin, so we need to adjust Y
+        for field, (x_mm, y_mm) in layout['positions'].items():
+            c.drawString(x_mm * mm, height - (y_mm * mm), certificate.get(field, ''))
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def _serial_numbers(first_serial_no, count):
+    """
+    Hospital serial numbers for a batch: the trailing number of the first one is incremented
+    per certificate, keeping its prefix and zero padding ("HSP-0098" -> "HSP-0099", ...).
+    """
+    match = re.fullmatch(r'(.*?)(\d+)', first_serial_no)
+    if not match:
+        return [first_serial_no] * count
+    prefix, number = match.groups()
+    return [f"{prefix}{int(number) + offset:0{len(number)}d}" for offset in range(count)]
+
+def _certificate_pdf_response(pdf_bytes, filename):
+    from flask import make_response
+    response = make_response(pdf_bytes)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'inline; filename={filename}'
+    return response
+
 @blood_camp_bp.route('/generate_certificate_pdf', methods=['POST'])
 @login_required
 @permission_required('access_blood_camp_certificate_printer')
@@ -685,16 +932,7 @@ def generate_certificate_pdf():
     
     # Position parameters
     try:
-        name_x = float(request.form.get('name_x', 50))
-        name_y = float(request.form.get('name_y', 80))
-        location_x = float(request.form.get('location_x', 50))
-        location_y = float(request.form.get('location_y', 110))
-        date_x = float(request.form.get('date_x', 50))
-        date_y = float(request.form.get('date_y', 140))
-        serial_x = float(request.form.get('serial_x', 50))
-        serial_y = float(request.form.get('serial_y', 170))
-        font_size = int(request.form.get('font_size', 12))
-        orientation = request.form.get('orientation', 'landscape').strip().lower()
+        layout = _certificate_layout_from_form()
     except ValueError:
         flash("Invalid position values provided.", "error")
         return redirect(url_for('blood_camp.certificate_printer_page'))
@@ -705,44 +943,72 @@ def generate_certificate_pdf():
 
     try:
         # Generate the certificate PDF
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import A4, landscape
-        from io import BytesIO
-
-        buffer = BytesIO()
-        # Use landscape or portrait orientation based on form selection
-        pagesize = landscape(A4) if orientation == 'landscape' else A4
-        c = canvas.Canvas(buffer, pagesize=pagesize)
-        width, height = pagesize
-
-        # Convert mm to points (1 mm = 2.834645669 points)
-        mm_to_points = 2.834645669
-        
-        # Set font
-        c.setFont("Helvetica-Bold", font_size)
-
-        # Draw text at specified positions (converting mm to points, and flipping Y coordinate)
-        # ReportLab uses bottom-left origin, so we need to adjust Y
-        c.drawString(name_x * mm_to_points, height - (name_y * mm_to_points), donor_name)
-        c.drawString(location_x * mm_to_points, height - (location_y * mm_to_points), donation_location)
-        c.drawString(date_x * mm_to_points, height - (date_y * mm_to_points), donation_date)
-        c.drawString(serial_x * mm_to_points, height - (serial_y * mm_to_points), hospital_serial_no)
-
-        c.showPage()
-        c.save()
-
-        buffer.seek(0)
-        
-        from flask import make_response
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'inline; filename=certificate_{donor_id}.pdf'
+        pdf_bytes = _render_certificates([{
+            'name': donor_name,
+            'location': donation_location,
+            'date': donation_date,
+            'serial': hospital_serial_no,
+        }], layout)
         
         logger.info(f"Generated certificate for Donor ID: {donor_id}")
-        return response
+        return _certificate_pdf_response(pdf_bytes, f"certificate_{donor_id}.pdf")
 
     except Exception as e:
         logger.error(f"Error generating certificate PDF for {donor_id}: {e}", exc_info=True)
         flash(f"Error generating certificate: {e}", "error")
         return redirect(url_for('blood_camp.certificate_printer_page'))
 
+@blood_camp_bp.route('/generate_certificates_batch', methods=['POST'])
+@login_required
+@permission_required('access_blood_camp_certificate_printer')
+def generate_certificates_batch():
+    """
+    Generates one PDF with a certificate page per accepted donor, selected by a list/range of
+    donor IDs and/or a donation date. Donors are fetched in one query, ordered by donor ID.
+    """
+    donor_ids_raw = request.form.get('donor_ids', '').strip()
+    batch_date_raw = request.form.get('batch_donation_date', '').strip()
+    first_serial_no = request.form.get('first_serial_no', '').strip()
+
+    try:
+        layout = _certificate_layout_from_form()
+        batch_date = datetime.date.fromisoformat(batch_date_raw) if batch_date_raw else None
+        donor_ids = utils.parse_donor_ids(donor_ids_raw, limit=config.CERTIFICATE_BATCH_MAX) if donor_ids_raw else None
+    except ValueError as e:
+        flash(f"Invalid batch certificate request: {e}", "error")
+        return redirect(url_for('blood_camp.certificate_printer_page'))
+
+    if not donor_ids and not batch_date:
+        flash("Enter donor IDs or a donation date to print a batch of certificates.", "error")
+        return redirect(url_for('blood_camp.certificate_printer_page'))
+
+    try:
+        donors = db_helpers.get_accepted_donors(donor_ids=donor_ids, donation_date=batch_date)
+        if not donors:
+            flash("No accepted donors found for the given donor IDs / date.", "warning")
+            return redirect(url_for('blood_camp.certificate_printer_page'))
+        if len(donors) > config.CERTIFICATE_BATCH_MAX:
+            flash(f"{len(donors)} accepted donors match; print at most {config.CERTIFICATE_BATCH_MAX} per batch.", "error")
+            return redirect(url_for('blood_camp.certificate_printer_page'))
+        if donor_ids:
+            skipped = len(donor_ids) - len(donors)
+            if skipped:
+                logger.info(f"Certificate batch: {skipped} requested donor IDs are missing, not accepted or outside the date.")
+
+        serial_numbers = _serial_numbers(first_serial_no, len(donors))
+        pdf_bytes = _render_certificates([{
+            'name': donor.name_of_donor or '',
+            'location': donor.donation_location or '',
+            'date': donor.donation_date.isoformat() if donor.donation_date else '',
+            'serial': serial_no,
+        } for donor, serial_no in zip(donors, serial_numbers)], layout)
+
+        logger.info(f"Generated {len(donors)} certificates ({donors[0].donor_id} - {donors[-1].donor_id})")
+        suffix = batch_date.isoformat() if batch_date else f"{donors[0].donor_id}-{donors[-1].donor_id}"
+        return _certificate_pdf_response(pdf_bytes, f"certificates_{suffix}.pdf")
+
+    except Exception as e:
+        logger.error(f"Error generating certificate batch: {e}", exc_info=True)
+        flash(f"Error generating certificates: {e}", "error")
+        return redirect(url_for('blood_camp.certificate_printer_page'))
+
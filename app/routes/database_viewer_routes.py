@@ -5,6 +5,7 @@ from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
 
 from app import config, db_helpers
+from app.database import get_pool_stats
 from app.models import db, SNEForm, BloodCampDonor, Attendant
 from app.decorators import permission_required
 
@@ -86,13 +87,8 @@ def view_table(table_name):
     
     try:
         if table_name == 'sne_forms':
-            # Get distinct values for filters
-            areas = db.session.query(SNEForm.area).distinct().order_by(SNEForm.area).all()
-            centres = db.session.query(SNEForm.satsang_place).distinct().order_by(SNEForm.satsang_place).all()
-            filter_options = {
-                'areas': [a[0] for a in areas if a[0]],
-                'centres': [c[0] for c in centres if c[0]]
-            }
+            # Distinct filter values with counts (cached, refreshed on write)
+            filter_options = db_helpers.get_table_facets(table_name)
             
             from app.db_helpers import case_insensitive_like
             
@@ -148,19 +144,8 @@ def view_table(table_name):
                       'Emergency Contact', 'Emergency Phone', 'Emergency Relation']
             
         elif table_name == 'blood_camp_donors':
-            # Get distinct values for filters
-            areas = db.session.query(BloodCampDonor.area).distinct().order_by(BloodCampDonor.area).all()
-            blood_groups = db.session.query(BloodCampDonor.blood_group).distinct().order_by(BloodCampDonor.blood_group).all()
-            allow_calls = db.session.query(BloodCampDonor.allow_call).distinct().order_by(BloodCampDonor.allow_call).all()
-            donation_locations = db.session.query(BloodCampDonor.donation_location).distinct().order_by(BloodCampDonor.donation_location).all()
-            statuses = db.session.query(BloodCampDonor.status).distinct().order_by(BloodCampDonor.status).all()
-            filter_options = {
-                'areas': [a[0] for a in areas if a[0]],
-                'blood_groups': [b[0] for b in blood_groups if b[0]],
-                'allow_calls': [c[0] for c in allow_calls if c[0]],
-                'donation_locations': [d[0] for d in donation_locations if d[0]],
-                'statuses': [s[0] for s in statuses if s[0]]
-            }
+            # Distinct filter values with counts (cached, refreshed on write)
+            filter_options = db_helpers.get_table_facets(table_name)
             
             from app.db_helpers import case_insensitive_like
             
@@ -345,76 +330,33 @@ def delete_record(table_name, record_id):
 @login_required
 @permission_required('access_database_viewer')
 def database_stats():
-    """Get database statistics as JSON."""
+    """
+    Get database statistics as JSON.
+    Not ETag-validated: recent_24h moves with the clock even when no row changes, and
+    get_database_stats already serves repeat requests from its table-versioned cache.
+    """
     try:
-        from sqlalchemy import func
-        
-        # SNE statistics
-        sne_stats = {
-            'total': db.session.query(SNEForm).count(),
-            'by_area': db.session.query(
-                SNEForm.area, 
-                func.count(SNEForm.id)
-            ).group_by(SNEForm.area).all(),
-            'recent_24h': db.session.query(SNEForm).filter(
-                SNEForm.submission_date >= datetime.date.today() - datetime.timedelta(days=1)
-            ).count()
-        }
-        
-        # Blood donor statistics
-        blood_stats = {
-            'total': db.session.query(BloodCampDonor).count(),
-            'by_blood_group': db.session.query(
-                BloodCampDonor.blood_group,
-                func.count(BloodCampDonor.id)
-            ).group_by(BloodCampDonor.blood_group).all(),
-            'by_status': db.session.query(
-                BloodCampDonor.status,
-                func.count(BloodCampDonor.id)
-            ).group_by(BloodCampDonor.status).all(),
-            'recent_24h': db.session.query(BloodCampDonor).filter(
-                BloodCampDonor.submission_timestamp >= datetime.datetime.now() - datetime.timedelta(days=1)
-            ).count()
-        }
-        
-        # Attendant statistics
-        attendant_stats = {
-            'total': db.session.query(Attendant).count(),
-            'by_type': db.session.query(
-                Attendant.attendant_type,
-                func.count(Attendant.id)
-            ).group_by(Attendant.attendant_type).all(),
-            'by_area': db.session.query(
-                Attendant.area,
-                func.count(Attendant.id)
-            ).group_by(Attendant.area).all()
-        }
-        
-        return jsonify({
-            'success': True,
-            'sne_forms': {
-                'total': sne_stats['total'],
-                'by_area': dict(sne_stats['by_area']),
-                'recent_24h': sne_stats['recent_24h']
-            },
-            'blood_donors': {
-                'total': blood_stats['total'],
-                'by_blood_group': dict(blood_stats['by_blood_group']),
-                'by_status': dict(blood_stats['by_status']),
-                'recent_24h': blood_stats['recent_24h']
-            },
-            'attendants': {
-                'total': attendant_stats['total'],
-                'by_type': dict(attendant_stats['by_type']),
-                'by_area': dict(attendant_stats['by_area'])
-            }
-        })
+        stats = db_helpers.get_database_stats()
+        return jsonify({'success': True, **stats})
         
     except Exception as e:
         logger.error(f"Error getting database stats: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@db_viewer_bp.route('/pool_stats')
+@login_required
+@permission_required('access_database_viewer')
+def pool_stats():
+    """Get connection pool statistics for the worker serving this request as JSON."""
+    try:
+        return jsonify({'success': True, **get_pool_stats()})
+        
+    except Exception as e:
+        logger.error(f"Error getting pool stats: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @db_viewer_bp.route('/export/<table_name>')
 @login_required
 @permission_required('access_database_viewer')
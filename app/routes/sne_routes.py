@@ -2,6 +2,7 @@
 import datetime
 import re
 import logging
+import uuid
 from io import BytesIO
 
 from flask import (
@@ -19,9 +20,9 @@ from flask_login import current_user
 from app import utils
 from app import config
 from app import db_helpers
-from app.models import db
+from app.models import db, SNEForm
 # Import the decorator from the new decorators.py file
-from app.decorators import permission_required
+from app.decorators import permission_required, conditional_get
 
 # --- Blueprint Definition ---
 sne_bp = Blueprint('sne', __name__, url_prefix='/sne')
@@ -49,6 +50,48 @@ def get_next_sne_badge_id(sheet, area, centre):
     
     return db_helpers.get_next_sne_badge_id_postgres(area, centre, prefix, start_num)
 
+def _submitted_badge_id(submission_key):
+    """Badge ID already recorded for a submitted form's idempotency key, or None."""
+    if not submission_key:
+        return None
+    return db_helpers.get_submission_record_ids(db_helpers.SUBMISSION_KIND_SNE, [submission_key]).get(submission_key)
+
+def _validate_sne_form(form_data):
+    """Checks the mandatory fields of a submitted SNE form. Returns an error message or None."""
+    mandatory_fields = ['area', 'satsang_place', 'first_name', 'father_husband_name',
+                        'gender', 'dob', 'aadhaar_no', 'emergency_contact_name',
+                        'emergency_contact_number', 'emergency_contact_relation', 'address', 'state']
+    missing_fields = [field for field in mandatory_fields if not form_data.get(field)]
+    if missing_fields:
+        return f"Missing mandatory SNE fields: {', '.join(missing_fields)}"
+    return None
+
+def _sne_fields(form_data, photo_filename):
+    """Column values of a new SNE record, apart from the badge ID. Raises ValueError for malformed dates."""
+    dob_str = form_data.get('dob', '')
+    submission_date_str = form_data.get('submission_date', datetime.date.today().isoformat())
+    return {
+        'submission_date': datetime.datetime.strptime(submission_date_str, '%Y-%m-%d').date(),
+        'area': form_data.get('area', '').strip(),
+        'satsang_place': form_data.get('satsang_place', '').strip(),
+        'first_name': form_data.get('first_name', ''),
+        'last_name': form_data.get('last_name', ''),
+        'father_husband_name': form_data.get('father_husband_name', ''),
+        'gender': form_data.get('gender', ''),
+        'date_of_birth': datetime.datetime.strptime(dob_str, '%Y-%m-%d').date() if dob_str else None,
+        'age': utils.calculate_age_from_dob(dob_str),
+        'blood_group': form_data.get('blood_group', ''),
+        'aadhaar_no': utils.clean_aadhaar_number(form_data.get('aadhaar_no', '').strip()),
+        'mobile_no': form_data.get('mobile_no', ''),
+        'emergency_contact_name': form_data.get('emergency_contact_name', ''),
+        'emergency_contact_number': form_data.get('emergency_contact_number', ''),
+        'emergency_contact_relation': form_data.get('emergency_contact_relation', ''),
+        'address': form_data.get('address', ''),
+        'state': form_data.get('state', ''),
+        'pin_code': form_data.get('pin_code', ''),
+        'photo_filename': photo_filename
+    }
+
 # --- SNE Routes ---
 @sne_bp.route('/form')
 @login_required
@@ -62,6 +105,8 @@ def form_page():
                            areas=config.AREAS,
                            states=config.STATES,
                            relations=config.RELATIONS,
+                           submission_key=uuid.uuid4().hex,
+                           sync_batch_max=config.SYNC_BATCH_MAX,
                            # current_user is available globally via context_processor
                            current_year=current_year)
 
@@ -79,14 +124,18 @@ def submit_form():
         aadhaar_no = form_data.get('aadhaar_no', '').strip()
         selected_area = form_data.get('area', '').strip()
         selected_centre = form_data.get('satsang_place', '').strip()
-        dob_str = form_data.get('dob', '')
 
-        mandatory_fields = ['area', 'satsang_place', 'first_name', 'father_husband_name',
-                            'gender', 'dob', 'aadhaar_no', 'emergency_contact_name',
-                            'emergency_contact_number', 'emergency_contact_relation', 'address', 'state']
-        missing_fields = [field for field in mandatory_fields if not form_data.get(field)]
-        if missing_fields:
-            flash(f"Missing mandatory SNE fields: {', '.join(missing_fields)}", "error")
+        # A resubmitted form (double-clicked Submit) gets the original outcome, before the
+        # Aadhaar check (which would flag the first submission) and without allocating an ID
+        submission_key = utils.clean_idempotency_key(form_data.get('submission_key'))
+        submitted_badge_id = _submitted_badge_id(submission_key)
+        if submitted_badge_id:
+            flash(f'This form was already submitted. Badge ID: {submitted_badge_id}', 'success')
+            return redirect(url_for('sne.form_page'))
+
+        error = _validate_sne_form(form_data)
+        if error:
+            flash(error, "error")
             return redirect(url_for('sne.form_page'))
 
         existing_badge_id = check_sne_aadhaar_exists(sheet, aadhaar_no, selected_area)
@@ -99,7 +148,8 @@ def submit_form():
 
         cleaned_aadhaar = utils.clean_aadhaar_number(aadhaar_no)
         unique_part = cleaned_aadhaar if cleaned_aadhaar else f"{form_data.get('first_name', 'user')}_{form_data.get('last_name', '')}"
-        s3_object_key = utils.handle_photo_upload(
+        # Staged locally; uploaded to S3 in the background once the record is committed
+        s3_object_key = utils.stage_photo_upload(
             files.get('photo'),
             config.S3_BUCKET_NAME,
             s3_prefix='sne_photos',
@@ -128,50 +178,30 @@ def submit_form():
                     return redirect(url_for('sne.form_page'))
                 logger.warning(f"Badge ID generation attempt {retry_count} failed, retrying...")
 
-        calculated_age = utils.calculate_age_from_dob(dob_str)
         # Save to PostgreSQL
         try:
-            submission_date_str = form_data.get('submission_date', datetime.date.today().isoformat())
-            submission_date = datetime.datetime.strptime(submission_date_str, '%Y-%m-%d').date() if isinstance(submission_date_str, str) else submission_date_str
-            
-            dob = datetime.datetime.strptime(dob_str, '%Y-%m-%d').date() if dob_str else None
-            
-            sne_data = {
-                'father_husband_name': form_data.get('father_husband_name', ''),
-                'gender': form_data.get('gender', ''),
-                'date_of_birth': dob,
-                'age': calculated_age,
-                'blood_group': form_data.get('blood_group', ''),
-                'aadhaar_no': utils.clean_aadhaar_number(aadhaar_no),
-                'mobile_no': form_data.get('mobile_no', ''),
-                'emergency_contact_name': form_data.get('emergency_contact_name', ''),
-                'emergency_contact_number': form_data.get('emergency_contact_number', ''),
-                'emergency_contact_relation': form_data.get('emergency_contact_relation', ''),
-                'address': form_data.get('address', ''),
-                'state': form_data.get('state', ''),
-                'pin_code': form_data.get('pin_code', ''),
-                'photo_filename': s3_object_key
-            }
+            sne_data = _sne_fields(form_data, s3_object_key)
             
             # Attempt to insert with retry logic for duplicate badge_id
             max_insert_retries = 3
             insert_retry_count = 0
             
             while insert_retry_count < max_insert_retries:
-                sne_form, success, error_msg = db_helpers.create_sne_form(
-                    badge_id=new_badge_id,
-                    submission_date=submission_date,
-                    area=selected_area,
-                    satsang_place=selected_centre,
-                    first_name=form_data.get('first_name', ''),
-                    last_name=form_data.get('last_name', ''),
-                    **sne_data
-                )
+                sne_form, success, error_msg = db_helpers.create_sne_form(badge_id=new_badge_id, submission_key=submission_key, **sne_data)
                 
                 if success:
                     logger.info(f"Successfully added SNE data to PostgreSQL for Badge ID: {new_badge_id}")
+                    utils.dispatch_photo_uploads(s3_object_key)
                     flash(f'SNE Data submitted successfully! Badge ID: {new_badge_id}', 'success')
                     return redirect(url_for('sne.form_page'))
+                elif error_msg == "DUPLICATE_SUBMISSION":
+                    # Recorded by a concurrent request; its photo is the one kept, so never delete a key it references
+                    submitted_badge_id = _submitted_badge_id(submission_key)
+                    submitted_form = db_helpers.get_sne_by_badge_id(submitted_badge_id) if submitted_badge_id else None
+                    if submitted_form is None or submitted_form.photo_filename != s3_object_key:
+                        utils.delete_s3_object(config.S3_BUCKET_NAME, s3_object_key)
+                    flash(f'This form was already submitted. Badge ID: {submitted_badge_id}', 'success')
+                    return redirect(url_for('sne.form_page'))
                 elif error_msg == "DUPLICATE_BADGE_ID":
                     # Race condition detected - generate new badge ID and retry
                     insert_retry_count += 1
@@ -198,6 +228,95 @@ def submit_form():
         flash(f'An unexpected error occurred: {e}', 'error')
         return redirect(url_for('sne.form_page'))
 
+@sne_bp.route('/sync', methods=['POST'])
+@login_required
+@permission_required('submit_sne_form')
+def sync_submissions():
+    """
+    API endpoint for operator clients that queue forms while offline. Takes JSON
+    {"entries": [{"key": "<client UUID>", "form": {<SNE form fields>}}, ...]} and records
+    all valid entries in one transaction. Returns a result per entry, in order: "created"
+    or "already_synced" (both with the badge_id), or "invalid" (with a message).
+    Resending a batch is safe: keys that were synced before return their original badge ID.
+    Photos are not part of the batch: synced records have none, and their results carry
+    photo_pending=true until one is added from the edit form.
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"success": False, "error": "A non-empty 'entries' list is required."}), 400
+    if len(entries) > config.SYNC_BATCH_MAX:
+        return jsonify({"success": False, "error": f"At most {config.SYNC_BATCH_MAX} entries per request."}), 400
+
+    entries = [entry if isinstance(entry, dict) else {} for entry in entries]
+    keys = [utils.clean_idempotency_key(entry.get('key')) for entry in entries]
+    synced = db_helpers.get_submission_record_ids(db_helpers.SUBMISSION_KIND_SNE, [key for key in keys if key])
+
+    results = []
+    batch = {}
+    batch_aadhaars = set()
+    for key, entry in zip(keys, entries):
+        form_data = entry.get('form') if isinstance(entry.get('form'), dict) else {}
+        form_data = {field: str(value) for field, value in form_data.items() if value is not None}
+        if not key:
+            results.append({"key": entry.get('key'), "result": "invalid", "message": "A key of 8-64 letters, digits, '-' or '_' is required."})
+            continue
+        results.append({"key": key})
+        if key in synced or key in batch:
+            continue
+
+        error = _validate_sne_form(form_data)
+        if not error:
+            try:
+                fields = _sne_fields(form_data, "N/A")
+            except ValueError:
+                error = "Dates must be in YYYY-MM-DD format."
+        if not error:
+            area, centre = fields['area'], fields['satsang_place']
+            if centre not in config.SNE_BADGE_CONFIG.get(area, {}):
+                error = "Invalid Area or Centre for SNE Badge ID generation."
+            elif (fields['aadhaar_no'], area) in batch_aadhaars:
+                error = f"SNE Aadhaar {fields['aadhaar_no']} appears more than once for Area '{area}' in this batch."
+        if not error:
+            existing_badge_id = check_sne_aadhaar_exists(None, fields['aadhaar_no'], area)
+            if existing_badge_id:
+                error = f"SNE Aadhaar {fields['aadhaar_no']} already exists for Area '{area}' (Badge ID '{existing_badge_id}')."
+            elif existing_badge_id is False:
+                error = "Error verifying SNE Aadhaar uniqueness. Please try again."
+        if error:
+            results[-1].update({"result": "invalid", "message": error})
+            continue
+
+        centre_config = config.SNE_BADGE_CONFIG[area][centre]
+        batch[key] = (key, centre_config["prefix"], centre_config["start"], fields)
+        batch_aadhaars.add((fields['aadhaar_no'], area))
+
+    assigned = {}
+    if batch:
+        assigned, success, error_msg = db_helpers.create_sne_forms_batch(list(batch.values()))
+        if not success:
+            return jsonify({"success": False, "error": f"Error saving entries: {error_msg}. No entries were saved."}), 500
+
+    # A key repeated within the batch is created once; its later entries report already_synced
+    reported = set()
+    for result in results:
+        key = result['key']
+        if 'result' in result:
+            continue
+        if key in assigned:
+            badge_id, created = assigned[key]
+            result.update({"result": "created" if created and key not in reported else "already_synced", "badge_id": badge_id})
+            reported.add(key)
+        else:
+            result.update({"result": "already_synced", "badge_id": synced[key]})
+    photo_filenames = db_helpers.get_sne_photo_filenames([result['badge_id'] for result in results if 'badge_id' in result])
+    for result in results:
+        if 'badge_id' in result:
+            result['photo_pending'] = photo_filenames.get(result['badge_id']) in (None, '', 'N/A', 'Upload Error')
+    created_count = sum(1 for result in results if result['result'] == 'created')
+    logger.info(f"SNE sync by {current_user.id}: {created_count}/{len(entries)} created.")
+    return jsonify({"success": True, "created": created_count, "results": results})
+
 @sne_bp.route('/printer')
 @login_required
 @permission_required('access_sne_printer')
@@ -265,6 +384,7 @@ def generate_pdf():
 
     sne_layout_config = {
         "template_path": config.SNE_BADGE_TEMPLATE_PATH,
+        "background_asset": config.SNE_BADGE_ASSET_PATH,
         "text_elements": config.SNE_TEXT_ELEMENTS,
         "photo_config": {
             'paste_x': config.SNE_PHOTO_PASTE_X_PX,
@@ -275,12 +395,13 @@ def generate_pdf():
         },
         "pdf_layout": {
             'orientation': 'L', 'unit': 'mm', 'format': 'A4',
-            'badge_w_mm': 125, 'badge_h_mm': 80, 'margin_mm': 15, 'gap_mm': 0
+            'badge_w_mm': config.SNE_BADGE_SIZE_MM[0], 'badge_h_mm': config.SNE_BADGE_SIZE_MM[1], 'margin_mm': 15, 'gap_mm': 0
         },
         "font_path": config.FONT_PATH,
         "font_bold_path": config.FONT_BOLD_PATH,
         "s3_bucket": config.S3_BUCKET_NAME,
-         "wrap_config": {'field_key': 'address', 'width': 20, 'spacing': 10}
+         "wrap_config": {'field_key': 'address', 'width': 20, 'spacing': 10},
+        "vector_text": config.BADGE_VECTOR_TEXT
     }
     pdf_ready_data = []
     for row_data in badges_data_for_pdf:
@@ -329,6 +450,7 @@ def edit_page():
 @sne_bp.route('/search', methods=['GET'])
 @login_required
 @permission_required('search_sne_entries')
+@conditional_get(SNEForm)
 def search_entries():
     """Searches SNE entries by name or badge ID (PostgreSQL version)."""
     search_name = request.args.get('name', '').strip().lower()
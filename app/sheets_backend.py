@@ -0,0 +1,118 @@
+# sheets_backend.py
+"""
+Google Sheets Backend (optional)
+The app stores everything in the database; Sheets access is only needed by the
+migration and verification scripts. Import this module where Sheets are used -
+never from app.utils or the routes - so gspread/google-auth stay out of the workers.
+
+Requires the packages in requirements-sheets.txt.
+"""
+import os
+import logging
+
+try:
+    import gspread
+    from google.oauth2.service_account import Credentials
+except ImportError as e:
+    raise ImportError(
+        "Google Sheets support needs the optional dependencies: pip install -r requirements-sheets.txt"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+def get_sheet(sheet_id, service_account_path, read_only=False):
+    """Authenticates and returns a specific Google Sheet worksheet object."""
+    try:
+        scopes = ['https://www.googleapis.com/auth/spreadsheets']
+        if read_only:
+            scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+        if not os.path.exists(service_account_path):
+            logger.error(f"Service account file not found: {service_account_path}")
+            return None
+
+        creds = Credentials.from_service_account_file(service_account_path, scopes=scopes)
+        client = gspread.authorize(creds)
+        sheet = client.open_by_key(sheet_id).sheet1
+        logger.info(f"Successfully accessed Google Sheet (ID: {sheet_id}). ReadOnly={read_only}")
+        return sheet
+    except gspread.exceptions.APIError as e:
+        logger.error(f"gspread API Error accessing Sheet (ID: {sheet_id}): {e}", exc_info=True)
+        if hasattr(e, 'response'):
+            if e.response.status_code == 403:
+                 logger.error("Permission denied. Check sheet sharing settings and service account permissions.")
+            elif e.response.status_code == 404:
+                 logger.error("Sheet not found. Verify SHEET_ID.")
+        return None
+    except Exception as e:
+        logger.error(f"Error accessing Google Sheet (ID: {sheet_id}): {e}", exc_info=True)
+        return None
+
+def get_all_sheet_data(sheet_id, service_account_path, headers_list):
+    """Gets all data from the sheet and returns a list of dictionaries."""
+    sheet = get_sheet(sheet_id, service_account_path, read_only=True)
+    if not sheet:
+        # Changed to raise an exception that can be caught by the caller,
+        # as this is usually a critical failure for data-dependent operations.
+        logger.error(f"CRITICAL: Could not connect to sheet {sheet_id} to get data.")
+        raise Exception(f"Could not connect to sheet {sheet_id} to get data.")
+    try:
+        all_values = sheet.get_all_values()
+        if not all_values or len(all_values) < 1: 
+            return []
+
+        header_row = headers_list
+        data_rows = all_values[1:] if len(all_values) > 1 else []
+
+        list_of_dicts = []
+        num_headers = len(header_row)
+        for row_index, row in enumerate(data_rows):
+            padded_row = row + [''] * (num_headers - len(row))
+            truncated_row = padded_row[:num_headers]
+            try:
+                record_dict = dict(zip(header_row, truncated_row))
+                if any(val for val in record_dict.values()): 
+                    list_of_dicts.append(record_dict)
+            except Exception as zip_err:
+                logger.error(f"Error creating dict for row {row_index + 2} in sheet {sheet_id}: {zip_err} - Row: {row}")
+
+        logger.info(f"Fetched {len(list_of_dicts)} records from sheet {sheet_id}.")
+        return list_of_dicts
+    except Exception as e:
+        logger.error(f"Could not get/process sheet data from {sheet_id}: {e}", exc_info=True)
+        # Changed to raise an exception
+        raise Exception(f"Could not get/process sheet data from {sheet_id}: {e}")
+
+
+def find_row_index_by_value(sheet, column_header, value_to_find, headers_list):
+    """Finds the 1-based row index for a value in a specific column."""
+    if not sheet:
+        logger.error("Sheet object is None in find_row_index_by_value.")
+        return None
+    try:
+        col_index = headers_list.index(column_header) + 1
+    except ValueError:
+        logger.error(f"Header '{column_header}' not found in provided headers list.")
+        return None
+
+    value_to_find_cleaned = str(value_to_find).strip().upper()
+    if not value_to_find_cleaned: # Avoid searching for empty strings
+        logger.warning("Attempted to find an empty value in sheet.")
+        return None 
+
+    try:
+        cell = sheet.find(value_to_find_cleaned, in_column=col_index)
+        if cell:
+            logger.info(f"Found '{value_to_find_cleaned}' in column '{column_header}' at row {cell.row}.")
+            return cell.row 
+        else:
+            logger.warning(f"Value '{value_to_find_cleaned}' not found in column '{column_header}'.")
+            return None
+    except gspread.exceptions.APIError as e:
+         logger.error(f"gspread API Error finding value '{value_to_find_cleaned}' in column '{column_header}': {e}", exc_info=True)
+         return None 
+    except Exception as e:
+        logger.error(f"Error finding row index for '{value_to_find_cleaned}' in column '{column_header}': {e}", exc_info=True)
+        return None 
+
+# --- File & Data Utilities ---
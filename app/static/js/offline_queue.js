@@ -0,0 +1,127 @@
+/*
+ * Offline form queue for the operator forms (blood camp donor form, SNE bio data form).
+ *
+ * While the browser is offline, a submitted form is kept in localStorage with its
+ * submission key instead of being posted. Queued forms are sent to the page's sync
+ * endpoint (/blood_camp/sync, /sne/sync) in batches once the connection is back, on
+ * page load and every FLUSH_INTERVAL_MS. The endpoints are idempotent per key, so a
+ * flush that is interrupted halfway is simply sent again.
+ *
+ * Usage:
+ *   OfflineQueue.attach(form, {
+ *       name: 'blood_camp',              // localStorage namespace
+ *       syncUrl: '/blood_camp/sync',
+ *       batchMax: 200,                   // SYNC_BATCH_MAX
+ *       statusElement: ul,               // <ul class="flash-messages"> for queue messages
+ *       describe: result => '...',       // text for one synced entry
+ *       onQueued: () => {},              // optional: extra form reset after queueing
+ *   });
+ */
+(function () {
+    const FLUSH_INTERVAL_MS = 30000;
+
+    function newSubmissionKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID().replace(/-/g, '');
+        let key = '';
+        for (let i = 0; i < 32; i++) key += Math.floor(Math.random() * 16).toString(16);
+        return key;
+    }
+
+    function attach(form, options) {
+        const storageKey = `offlineQueue:${options.name}`;
+        const keyInput = form.querySelector('input[name="submission_key"]');
+        const status = options.statusElement;
+        let flushing = false;
+        let report = [];  // [category, text] of the last flush, shown until the next one
+
+        function load() {
+            try { return JSON.parse(localStorage.getItem(storageKey)) || []; } catch (e) { return []; }
+        }
+
+        function save(entries) {
+            localStorage.setItem(storageKey, JSON.stringify(entries));
+        }
+
+        function render(extra) {
+            const messages = report.slice();
+            const queued = load().length;
+            if (!navigator.onLine) {
+                messages.unshift(['warning', 'Offline: submitted forms are saved on this device and sent when the connection is back.']);
+            }
+            if (queued) {
+                messages.unshift(['info', `${queued} form(s) saved on this device, waiting to sync.`]);
+            }
+            if (extra) messages.unshift(extra);
+            status.innerHTML = '';
+            messages.forEach(([category, text]) => {
+                const item = document.createElement('li');
+                item.className = category;
+                item.textContent = text;
+                status.appendChild(item);
+            });
+            status.hidden = messages.length === 0;
+        }
+
+        function queueForm() {
+            const fields = {};
+            new FormData(form).forEach((value, field) => {
+                // Files (photos) cannot be kept offline; they are added from the edit form later
+                if (field !== 'submission_key' && typeof value === 'string') fields[field] = value;
+            });
+            const entries = load();
+            entries.push({key: keyInput.value, form: fields});
+            save(entries);
+            form.reset();
+            if (options.onQueued) options.onQueued();
+            keyInput.value = newSubmissionKey();  // The next form is a new submission
+        }
+
+        async function flush(continued = false) {
+            const entries = load();
+            if (flushing || !entries.length || !navigator.onLine) {
+                render();
+                return;
+            }
+            flushing = true;
+            try {
+                const batch = entries.slice(0, options.batchMax);
+                const response = await fetch(options.syncUrl, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({entries: batch}),
+                });
+                // A logged-out session is redirected to the login page (HTML, not JSON)
+                const data = await response.json().catch(() => null);
+                if (!response.ok || !data || !data.success) {
+                    const reason = (data && data.error) || `server answered ${response.status}; log in again if the session expired`;
+                    render(['error', `Saved forms could not be synced yet (${reason}). They stay on this device.`]);
+                    return;
+                }
+                const answered = new Set(data.results.map(result => result.key));
+                save(load().filter(entry => !answered.has(entry.key)));
+                report = (continued ? report : []).concat(
+                    data.results.map(result => [result.result === 'invalid' ? 'error' : 'success', options.describe(result)]));
+                render();
+                if (load().length) setTimeout(() => flush(true), 0);  // More than one batch was queued
+            } catch (error) {
+                console.warn('Offline queue: sync failed, will retry', error);
+                render();
+            } finally {
+                flushing = false;
+            }
+        }
+
+        form.addEventListener('submit', (event) => {
+            if (event.defaultPrevented || navigator.onLine) return;
+            event.preventDefault();
+            queueForm();
+            render(['info', 'You are offline. The form was saved on this device and will be synced automatically.']);
+        });
+        window.addEventListener('online', () => flush());
+        window.addEventListener('offline', () => render());
+        window.addEventListener('load', () => flush());
+        setInterval(() => flush(), FLUSH_INTERVAL_MS);
+    }
+
+    window.OfflineQueue = {attach};
+})();
@@ -2,131 +2,76 @@
 import os
 import datetime
 import re
+import json
+import hashlib
 import logging
 from io import BytesIO
 import textwrap
+import uuid
+
+import threading
 
-import gspread
-from google.oauth2.service_account import Credentials
-from fpdf import FPDF
-from PIL import Image, ImageDraw, ImageFont, ImageOps 
 from dateutil.relativedelta import relativedelta
 from dateutil import parser as date_parser
 from werkzeug.utils import secure_filename
-import boto3
-from botocore.exceptions import ClientError
-from botocore.config import Config
 
 # Import configuration constants
-from app import config
+from app import config, photo_uploads, metrics
+from app.cache import TTLCache
+
+# boto3, PIL and fpdf are imported where they are used: together they add about a second
+# and ~30MB per worker process, and most requests never touch them.
+# Google Sheets helpers live in app.sheets_backend (migration scripts only).
+_s3_client = None
+_s3_upload_config = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Returns the process-wide S3 client, creating it on first use (SigV4, explicit region)."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+                client = boto3.client('s3', region_name=config.AWS_REGION, config=Config(signature_version='s3v4'))
+                metrics.instrument_s3_client(client)
+                _s3_client = client
+    return _s3_client
+
+
+def get_s3_upload_config():
+    """
+    Transfer settings for S3 uploads. Uploads read at most max_concurrency * multipart_chunksize
+    bytes into memory at once (boto3's default is 10 x 8MB); files below the threshold go up
+    in a single PUT.
+    """
+    global _s3_upload_config
+    if _s3_upload_config is None:
+        from boto3.s3.transfer import TransferConfig
+        _s3_upload_config = TransferConfig(
+            multipart_threshold=config.S3_MULTIPART_CHUNK_BYTES,
+            multipart_chunksize=config.S3_MULTIPART_CHUNK_BYTES,
+            max_concurrency=config.S3_UPLOAD_MAX_CONCURRENCY,
+        )
+    return _s3_upload_config
+
+
+def __getattr__(name):
+    # Keeps `utils.s3_client` / `utils.S3_UPLOAD_CONFIG` working for scripts written before lazy loading
+    if name == 's3_client':
+        return get_s3_client()
+    if name == 'S3_UPLOAD_CONFIG':
+        return get_s3_upload_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Initialize S3 client globally with explicit region and SigV4
-s3_client = boto3.client('s3', region_name=config.AWS_REGION, config=Config(signature_version='s3v4'))
 logger = logging.getLogger(__name__) # Use a logger instance
 
 def get_current_year():
     """Returns the current year as an integer."""
     return datetime.date.today().year
 
-# --- Google Sheet Utilities ---
-
-def get_sheet(sheet_id, service_account_path, read_only=False):
-    """Authenticates and returns a specific Google Sheet worksheet object."""
-    try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        if read_only:
-            scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-
-        if not os.path.exists(service_account_path):
-            logger.error(f"Service account file not found: {service_account_path}")
-            return None
-
-        creds = Credentials.from_service_account_file(service_account_path, scopes=scopes)
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(sheet_id).sheet1
-        logger.info(f"Successfully accessed Google Sheet (ID: {sheet_id}). ReadOnly={read_only}")
-        return sheet
-    except gspread.exceptions.APIError as e:
-        logger.error(f"gspread API Error accessing Sheet (ID: {sheet_id}): {e}", exc_info=True)
-        if hasattr(e, 'response'):
-            if e.response.status_code == 403:
-                 logger.error("Permission denied. Check sheet sharing settings and service account permissions.")
-            elif e.response.status_code == 404:
-                 logger.error("Sheet not found. Verify SHEET_ID.")
-        return None
-    except Exception as e:
-        logger.error(f"Error accessing Google Sheet (ID: {sheet_id}): {e}", exc_info=True)
-        return None
-
-def get_all_sheet_data(sheet_id, service_account_path, headers_list):
-    """Gets all data from the sheet and returns a list of dictionaries."""
-    sheet = get_sheet(sheet_id, service_account_path, read_only=True)
-    if not sheet:
-        # Changed to raise an exception that can be caught by the caller,
-        # as this is usually a critical failure for data-dependent operations.
-        logger.error(f"CRITICAL: Could not connect to sheet {sheet_id} to get data.")
-        raise Exception(f"Could not connect to sheet {sheet_id} to get data.")
-    try:
-        all_values = sheet.get_all_values()
-        if not all_values or len(all_values) < 1: 
-            return []
-
-        header_row = headers_list
-        data_rows = all_values[1:] if len(all_values) > 1 else []
-
-        list_of_dicts = []
-        num_headers = len(header_row)
-        for row_index, row in enumerate(data_rows):
-            padded_row = row + [''] * (num_headers - len(row))
-            truncated_row = padded_row[:num_headers]
-            try:
-                record_dict = dict(zip(header_row, truncated_row))
-                if any(val for val in record_dict.values()): 
-                    list_of_dicts.append(record_dict)
-            except Exception as zip_err:
-                logger.error(f"Error creating dict for row {row_index + 2} in sheet {sheet_id}: {zip_err} - Row: {row}")
-
-        logger.info(f"Fetched {len(list_of_dicts)} records from sheet {sheet_id}.")
-        return list_of_dicts
-    except Exception as e:
-        logger.error(f"Could not get/process sheet data from {sheet_id}: {e}", exc_info=True)
-        # Changed to raise an exception
-        raise Exception(f"Could not get/process sheet data from {sheet_id}: {e}")
-
-
-def find_row_index_by_value(sheet, column_header, value_to_find, headers_list):
-    """Finds the 1-based row index for a value in a specific column."""
-    if not sheet:
-        logger.error("Sheet object is None in find_row_index_by_value.")
-        return None
-    try:
-        col_index = headers_list.index(column_header) + 1
-    except ValueError:
-        logger.error(f"Header '{column_header}' not found in provided headers list.")
-        return None
-
-    value_to_find_cleaned = str(value_to_find).strip().upper()
-    if not value_to_find_cleaned: # Avoid searching for empty strings
-        logger.warning("Attempted to find an empty value in sheet.")
-        return None 
-
-    try:
-        cell = sheet.find(value_to_find_cleaned, in_column=col_index)
-        if cell:
-            logger.info(f"Found '{value_to_find_cleaned}' in column '{column_header}' at row {cell.row}.")
-            return cell.row 
-        else:
-            logger.warning(f"Value '{value_to_find_cleaned}' not found in column '{column_header}'.")
-            return None
-    except gspread.exceptions.APIError as e:
-         logger.error(f"gspread API Error finding value '{value_to_find_cleaned}' in column '{column_header}': {e}", exc_info=True)
-         return None 
-    except Exception as e:
-        logger.error(f"Error finding row index for '{value_to_find_cleaned}' in column '{column_header}': {e}", exc_info=True)
-        return None 
-
-# --- File & Data Utilities ---
-
 def allowed_file(filename):
     """Checks if the filename has an allowed extension."""
     return '.' in filename and \
@@ -192,10 +137,145 @@ def parse_token_ids(id_string, padding=3):
                 
     return sorted(list(final_ids))
 
+def parse_donor_ids(id_string, limit=None):
+    """
+    Parses donor IDs and ranges (e.g., "BD00012, 15-20, BD00030-BD00035") into a sorted list of
+    donor IDs. Raises ValueError if the ranges would expand to more than limit IDs.
+    """
+    digits_only = re.sub(r'(?i)bd', '', id_string or '')
+    if limit:
+        range_total = sum(abs(int(end) - int(start)) + 1 for start, end in re.findall(r'(\d+)\s*-\s*(\d+)', digits_only))
+        if range_total > limit:
+            raise ValueError(f"Donor ID ranges cover {range_total} IDs (maximum {limit}).")
+    return [f"BD{num}" for num in parse_token_ids(digits_only, padding=5)]
+
+def clean_idempotency_key(value):
+    """Returns a client idempotency key (e.g. a UUID) stripped of whitespace, or None if it is unusable."""
+    key = str(value or '').strip()
+    return key if re.fullmatch(r'[A-Za-z0-9_-]{8,64}', key) else None
+
 # --- S3 Utilities ---
 
+def _build_photo_s3_key(file_storage, s3_prefix, unique_id_part, extension=None):
+    """
+    Builds the S3 key for an uploaded photo: <prefix>/<unique part>_<timestamp>_<random>.<ext>.
+    The random part keeps two uploads in the same second (a resubmitted form) from sharing a key.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    if not extension:
+        base_filename = secure_filename(file_storage.filename)
+        extension = base_filename.rsplit('.', 1)[1].lower()
+    return f"{s3_prefix.strip('/')}/{unique_id_part}_{timestamp}_{uuid.uuid4().hex[:8]}.{extension}"
+
+def original_photo_s3_key(s3_object_key):
+    """
+    S3 key of the untouched upload kept for a processed photo (PHOTO_KEEP_ORIGINAL):
+    originals/<photo key>.orig. The extension is fixed so the key follows from the photo
+    key alone; the upload's image type is kept as the object's ContentType.
+    """
+    return f"{config.PHOTO_ORIGINAL_PREFIX}{s3_object_key.rsplit('.', 1)[0]}.orig"
+
+def _photo_companion_s3_keys(s3_object_key):
+    """Objects stored alongside a photo: its thumbnail and kept original (none for those objects themselves)."""
+    if s3_object_key.startswith((config.PHOTO_THUMBNAIL_PREFIX, config.PHOTO_ORIGINAL_PREFIX)):
+        return []
+    stem = s3_object_key.rsplit('.', 1)[0]
+    # Originals kept before the key was fixed carry the upload's extension
+    legacy_originals = [f"{config.PHOTO_ORIGINAL_PREFIX}{stem}.{extension}" for extension in sorted(config.ALLOWED_EXTENSIONS)]
+    return [thumbnail_s3_key(s3_object_key), original_photo_s3_key(s3_object_key)] + legacy_originals
+
+def thumbnail_s3_key(s3_object_key):
+    """S3 key of a photo's listing thumbnail: thumbnails/<photo key>.jpg"""
+    return f"{config.PHOTO_THUMBNAIL_PREFIX}{s3_object_key.rsplit('.', 1)[0]}.jpg"
+
+def make_photo_thumbnail(img):
+    """Small JPEG of a PIL image for listings (PHOTO_THUMBNAIL_SIZE_PX on the long side). Returns BytesIO."""
+    from PIL import Image
+
+    thumb = img.copy()
+    thumb.thumbnail((config.PHOTO_THUMBNAIL_SIZE_PX, config.PHOTO_THUMBNAIL_SIZE_PX), Image.Resampling.LANCZOS)
+    if 'A' in thumb.getbands() or thumb.mode == 'P':
+        rgba = thumb.convert('RGBA')
+        thumb = Image.new('RGB', rgba.size, (255, 255, 255))
+        thumb.paste(rgba, mask=rgba.getchannel('A'))
+    output = BytesIO()
+    thumb.convert('RGB').save(output, 'JPEG', quality=80, optimize=True)
+    output.seek(0)
+    return output
+
+def prepare_photo_for_upload(file_storage):
+    """
+    Decodes an uploaded photo, applies its EXIF orientation, shrinks it so it just
+    covers the largest badge photo box (aspect ratio kept) and re-encodes it.
+
+    Returns:
+        tuple: (BytesIO, content_type, extension, thumbnail BytesIO), or None if ingest
+               is disabled or the file cannot be decoded (the raw upload is stored instead)
+    """
+    if not config.PHOTO_INGEST_ENABLED:
+        return None
+    from PIL import Image, ImageOps
+
+    try:
+        file_storage.stream.seek(0)
+        with Image.open(file_storage.stream) as img:
+            # JPEG: let the decoder scale by 1/2..1/8 while reading, so a 12MP photo is never
+            # fully decoded. Both axes get the long box side since EXIF rotation may swap them.
+            draft_side = max(config.PHOTO_MAX_WIDTH_PX, config.PHOTO_MAX_HEIGHT_PX)
+            img.draft('RGB', (draft_side, draft_side))
+            img = ImageOps.exif_transpose(img)
+            # Badges stretch the photo into the box, so keep at least box-sized pixels on both axes
+            scale = max(config.PHOTO_MAX_WIDTH_PX / img.width, config.PHOTO_MAX_HEIGHT_PX / img.height)
+            if scale < 1:
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.Resampling.LANCZOS)
+
+            output = BytesIO()
+            if config.PHOTO_OUTPUT_FORMAT == 'WEBP':
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+                img.save(output, 'WEBP', quality=config.PHOTO_OUTPUT_QUALITY, method=4)
+                content_type, extension = 'image/webp', 'webp'
+            else:
+                if 'A' in img.getbands() or img.mode == 'P':
+                    # JPEG has no alpha: flatten transparent areas onto white
+                    rgba = img.convert('RGBA')
+                    img = Image.new('RGB', rgba.size, (255, 255, 255))
+                    img.paste(rgba, mask=rgba.getchannel('A'))
+                img = img.convert('RGB')
+                img.save(output, 'JPEG', quality=config.PHOTO_OUTPUT_QUALITY, optimize=True, progressive=True)
+                content_type, extension = 'image/jpeg', 'jpg'
+            thumbnail = make_photo_thumbnail(img)
+        output.seek(0)
+        logger.info(f"Processed photo '{file_storage.filename}' -> {img.width}x{img.height} {extension}, {output.getbuffer().nbytes} bytes")
+        return output, content_type, extension, thumbnail
+    except Exception as e:
+        logger.warning(f"Could not process photo '{file_storage.filename}', storing original: {e}")
+        return None
+    finally:
+        file_storage.stream.seek(0)
+
+def _prepare_photo_objects(file_storage, s3_prefix, unique_id_part):
+    """
+    Runs the ingest stage and works out what to store for one uploaded photo.
+
+    Returns:
+        tuple: (s3_object_key, body, content_type, extras) where extras are
+               (stream, s3_key, content_type) for the thumbnail and kept original
+    """
+    processed = prepare_photo_for_upload(file_storage)
+    if not processed:
+        return _build_photo_s3_key(file_storage, s3_prefix, unique_id_part), file_storage.stream, file_storage.content_type, []
+
+    body, content_type, extension, thumbnail = processed
+    s3_object_key = _build_photo_s3_key(file_storage, s3_prefix, unique_id_part, extension)
+    extras = [(thumbnail, thumbnail_s3_key(s3_object_key), 'image/jpeg')]
+    if config.PHOTO_KEEP_ORIGINAL:
+        extras.append((file_storage.stream, original_photo_s3_key(s3_object_key), file_storage.content_type))
+    return s3_object_key, body, content_type, extras
+
 def handle_photo_upload(file_storage, bucket_name, s3_prefix, unique_id_part):
     """Handles photo upload to S3."""
+    from botocore.exceptions import ClientError
+
     if not file_storage or file_storage.filename == '':
         return "N/A" 
 
@@ -204,17 +284,26 @@ def handle_photo_upload(file_storage, bucket_name, s3_prefix, unique_id_part):
         return "N/A" 
 
     try:
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        base_filename = secure_filename(file_storage.filename)
-        extension = base_filename.rsplit('.', 1)[1].lower()
-        s3_object_key = f"{s3_prefix.strip('/')}/{unique_id_part}_{timestamp}.{extension}"
-
-        s3_client.upload_fileobj(
-            file_storage,
-            bucket_name,
-            s3_object_key,
-            ExtraArgs={'ContentType': file_storage.content_type} 
-        )
+        s3_object_key, body, content_type, extras = _prepare_photo_objects(file_storage, s3_prefix, unique_id_part)
+
+        # Timed here: s3transfer makes the S3 calls from its worker threads, outside the request
+        with metrics.timed('s3', 'upload_fileobj'):
+            for extra_stream, extra_key, extra_content_type in extras:
+                extra_stream.seek(0)
+                get_s3_client().upload_fileobj(
+                    extra_stream,
+                    bucket_name,
+                    extra_key,
+                    ExtraArgs={'ContentType': extra_content_type},
+                    Config=get_s3_upload_config()
+                )
+            get_s3_client().upload_fileobj(
+                body,
+                bucket_name,
+                s3_object_key,
+                ExtraArgs={'ContentType': content_type},
+                Config=get_s3_upload_config()
+            )
         logger.info(f"Successfully uploaded photo to S3: {s3_object_key}")
         return s3_object_key
     except ClientError as e:
@@ -224,16 +313,65 @@ def handle_photo_upload(file_storage, bucket_name, s3_prefix, unique_id_part):
         logger.error(f"S3 upload failed for photo: {e}", exc_info=True)
         return "Upload Error"
 
-def get_s3_presigned_url(bucket_name, s3_key, expiration=3600):
+def stage_photo_upload(file_storage, bucket_name, s3_prefix, unique_id_part):
+    """
+    Stages a photo for background upload to S3 (see app/photo_uploads.py).
+    Returns a pending marker to save in the photo column, then call
+    dispatch_photo_uploads() once the record is committed.
+    Falls back to handle_photo_upload when staged uploads are disabled.
+    """
+    if not photo_uploads.enabled():
+        return handle_photo_upload(file_storage, bucket_name, s3_prefix, unique_id_part)
+
+    if not file_storage or file_storage.filename == '':
+        return "N/A"
+
+    if not allowed_file(file_storage.filename):
+        logger.warning(f"Invalid file type uploaded: {file_storage.filename}")
+        return "N/A"
+
+    try:
+        s3_object_key, body, content_type, extras = _prepare_photo_objects(file_storage, s3_prefix, unique_id_part)
+        return photo_uploads.stage(body, bucket_name, s3_object_key, content_type, extras=extras)
+    except Exception as e:
+        logger.error(f"Failed to stage photo for upload: {e}", exc_info=True)
+        return "Upload Error"
+
+def dispatch_photo_uploads(*photo_values):
+    """Starts background uploads for staged photos whose record has been committed."""
+    photo_uploads.dispatch(*photo_values)
+
+# Signed URLs are reused until shortly before they expire: signing is skipped and
+# browsers get the same URL for the same photo, so their HTTP cache works too
+_presigned_url_caches = {}
+
+def _presigned_url_cache(expiration):
+    cache = _presigned_url_caches.get(expiration)
+    if cache is None:
+        ttl = max(0, expiration - config.PRESIGNED_URL_REFRESH_MARGIN)
+        cache = _presigned_url_caches.setdefault(expiration, TTLCache(ttl_seconds=ttl, max_entries=config.PRESIGNED_URL_CACHE_SIZE))
+    return cache
+
+def get_s3_presigned_url(bucket_name, s3_key, expiration=config.PRESIGNED_URL_EXPIRATION):
     """Generates a presigned URL for an S3 object. Returns None if key is invalid or on error."""
+    from botocore.exceptions import ClientError
+
     if not s3_key or s3_key in ["N/A", "Upload Error", ""]:
         return None
+    if photo_uploads.is_pending(s3_key):
+        # Not in S3 yet
+        return None
+    cache = _presigned_url_cache(expiration)
+    url = cache.get((bucket_name, s3_key))
+    if url:
+        return url
     try:
-        url = s3_client.generate_presigned_url(
+        url = get_s3_client().generate_presigned_url(
             'get_object',
             Params={'Bucket': bucket_name, 'Key': s3_key},
             ExpiresIn=expiration
         )
+        cache.set((bucket_name, s3_key), url)
         return url
     except ClientError as e:
         logger.error(f"S3 ClientError generating presigned URL for '{s3_key}': {e}", exc_info=True)
@@ -242,15 +380,45 @@ def get_s3_presigned_url(bucket_name, s3_key, expiration=3600):
         logger.error(f"Failed to generate presigned URL for '{s3_key}': {e}", exc_info=True)
         return None
 
+def get_s3_presigned_urls(bucket_name, s3_keys, expiration=config.PRESIGNED_URL_EXPIRATION, thumbnails=False):
+    """
+    Presigned URLs for many keys at once. Returns {key: url or None}, duplicates signed once.
+    With thumbnails=True each photo's listing thumbnail is signed instead (still keyed by photo key).
+    """
+    urls = {}
+    for key in dict.fromkeys(s3_keys):
+        if thumbnails and key and key not in ["N/A", "Upload Error"] and not photo_uploads.is_pending(key):
+            urls[key] = get_s3_presigned_url(bucket_name, thumbnail_s3_key(key), expiration)
+        else:
+            urls[key] = get_s3_presigned_url(bucket_name, key, expiration)
+    return urls
+
 def delete_s3_object(bucket_name, s3_key):
-    """Deletes an object from S3, logging errors."""
+    """Deletes an object from S3 along with its thumbnail and kept original, logging errors."""
+    from botocore.exceptions import ClientError
+
     if not s3_key or s3_key in ["N/A", "Upload Error", ""]:
         logger.debug(f"Skipping S3 deletion for invalid key: {s3_key}")
         return False 
 
+    if photo_uploads.is_pending(s3_key):
+        # Still in the local spool; the uploader removes the S3 copy if it gets there first
+        photo_uploads.discard(s3_key)
+        return True
+
     try:
         logger.info(f"Attempting to delete S3 object: Bucket='{bucket_name}', Key='{s3_key}'")
-        s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+        get_s3_client().delete_object(Bucket=bucket_name, Key=s3_key)
+        companion_keys = _photo_companion_s3_keys(s3_key)
+        if companion_keys:
+            # Most of these do not exist (older photos, PHOTO_KEEP_ORIGINAL off); S3 deletes of missing keys succeed
+            response = get_s3_client().delete_objects(
+                Bucket=bucket_name, Delete={'Objects': [{'Key': key} for key in companion_keys], 'Quiet': True})
+            for error in response.get('Errors', []):
+                logger.error(f"FAILED to delete S3 object '{error.get('Key')}' of photo '{s3_key}': {error.get('Message')}")
+        for cache in _presigned_url_caches.values():
+            for key in [s3_key] + companion_keys:
+                cache.invalidate((bucket_name, key))
         logger.info(f"Successfully deleted S3 object: {s3_key}")
         return True
     except ClientError as e:
@@ -262,12 +430,73 @@ def delete_s3_object(bucket_name, s3_key):
 
 # --- PDF Generation Utility ---
 
+BADGE_PDF_FONT = 'badge'  # fpdf family name the layout's TTF fonts are registered under (vector text)
+PT_PER_MM = 72 / 25.4
+MM_PER_INCH = 25.4
+EXIF_ORIENTATION_TAG = 0x0112
+
+_badge_assets = {}
+
+def badge_text_stretch(mm_per_px_x, mm_per_px_y):
+    """
+    Horizontal stretch of badge text, given the mm per template pixel on each axis: the template
+    is stretched to the badge size, and text drawn on it (legacy composites) stretches with it.
+    The raster text layer and vector text apply the same factor, so text is as wide in every mode.
+    """
+    return mm_per_px_x / mm_per_px_y
+
+
+def load_badge_asset(meta_path):
+    """
+    Loads the metadata of a pre-scaled badge background built by scripts/build_badge_assets.py.
+    Returns the metadata dict (with 'background_path' resolved), or None when the asset is missing
+    or was built from a different template - callers then fall back to the full-size template.
+    Cached per process.
+    """
+    if meta_path in _badge_assets:
+        return _badge_assets[meta_path]
+
+    asset = None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(meta['source'], 'rb') as f:
+            source_sha1 = hashlib.sha1(f.read()).hexdigest()
+        if source_sha1 != meta['source_sha1']:
+            logger.warning(f"Badge asset '{meta_path}' was built from a different '{meta['source']}'. "
+                           f"Run scripts/build_badge_assets.py; using the full-size template until then.")
+        else:
+            meta['background_path'] = os.path.join(os.path.dirname(meta_path), meta['background'])
+            asset = meta
+    except FileNotFoundError as e:
+        logger.warning(f"Badge asset not available ({e}); using the full-size template.")
+    except Exception as e:
+        logger.error(f"Error loading badge asset '{meta_path}': {e}", exc_info=True)
+
+    _badge_assets[meta_path] = asset
+    return asset
+
+
+@metrics.timed('pdf', 'badge_pdf')
 def generate_badge_pdf(badge_data_list, layout_config):
     """
     Generates a PDF document containing badges based on provided data and layout config.
     Dynamically selects badge template based on 'attendant_type' in badge_data if 
     'templates_by_type' is provided in layout_config. Otherwise, uses 'template_path'.
+
+    If 'background_asset' names a pre-scaled background (see load_badge_asset), each badge is
+    placed as layers instead of one re-encoded composite: the background image (embedded in
+    the PDF once), the photos (downscaled to print resolution when stored larger), and a
+    cropped transparent text layer drawn at print resolution. Coordinates in layout_config stay in template pixels.
+
+    With 'vector_text', badges are layered the same way (using the template itself when there
+    is no pre-scaled background) and text elements are written as PDF text in the layout's
+    TTF fonts, which fpdf embeds as subsets - only the template and photos stay raster.
     """
+    from fpdf import FPDF
+    from PIL import Image, ImageDraw, ImageFont, ImageColor
+    from botocore.exceptions import ClientError
+
     pdf_layout = layout_config['pdf_layout']
     text_elements = layout_config['text_elements']
     wrap_config = layout_config.get('wrap_config', {})
@@ -296,8 +525,36 @@ def generate_badge_pdf(badge_data_list, layout_config):
     # --- Pre-load Badge Templates ---
     templates_by_type_paths = layout_config.get('templates_by_type')
     loaded_templates = {}
-
-    if templates_by_type_paths: # For attendants with multiple types
+    asset = load_badge_asset(layout_config['background_asset']) if layout_config.get('background_asset') else None
+    vector_text = layout_config.get('vector_text', False)
+    layered = bool(asset) or vector_text
+
+    def open_template(path):
+        # Layered badges only need the template's path and size, so don't decode it
+        if layered:
+            return Image.open(path)
+        with Image.open(path) as template:
+            return template.convert("RGBA")
+
+    text_layer_size = None
+    if asset: # Pre-scaled background
+        if not vector_text:
+            # Raster text is drawn at the background's print resolution, scaled uniformly from the
+            # template so it gets the same horizontal stretch as the template (see badge_text_stretch)
+            source_w, source_h = asset['source_size_px']
+            layer_scale = asset['size_px'][1] / source_h
+            stretch = badge_text_stretch(BADGE_WIDTH_MM / source_w, BADGE_HEIGHT_MM / source_h)
+            text_layer_size = (round(asset['size_px'][0] / stretch), asset['size_px'][1])
+            text_elements = {
+                key: dict(item, coords=(round(item['coords'][0] * layer_scale), round(item['coords'][1] * layer_scale)),
+                          size=item['size'] * layer_scale) # Fractional, as vector text sizes are
+                for key, item in text_elements.items()
+            }
+            if wrap_config:
+                wrap_config = dict(wrap_config, spacing=round(wrap_config.get('spacing', 4) * layer_scale))
+        logger.info(f"Using pre-scaled badge background: {asset['background_path']}")
+
+    elif templates_by_type_paths: # For attendants with multiple types
         for type_key, path in templates_by_type_paths.items():
             try:
                 if not os.path.exists(path):
@@ -306,7 +563,7 @@ def generate_badge_pdf(badge_data_list, layout_config):
                         logger.error("CRITICAL: Default badge template path is invalid or missing.")
                         # Potentially return None if default is essential and missing
                     continue 
-                loaded_templates[type_key] = Image.open(path).convert("RGBA")
+                loaded_templates[type_key] = open_template(path)
                 logger.info(f"Loaded badge template for type '{type_key}': {path}")
             except Exception as e:
                 logger.error(f"Error loading badge template for type '{type_key}' path '{path}': {e}", exc_info=True)
@@ -325,13 +582,13 @@ def generate_badge_pdf(badge_data_list, layout_config):
             logger.error(f"CRITICAL: Single badge template file not found at 'template_path': {single_template_path}")
             return None
         try:
-            loaded_templates["default"] = Image.open(single_template_path).convert("RGBA")
+            loaded_templates["default"] = open_template(single_template_path)
             logger.info(f"Loaded single badge template from 'template_path': {single_template_path}")
         except Exception as e:
             logger.error(f"CRITICAL: Error loading single badge template from '{single_template_path}': {e}", exc_info=True)
             return None
         
-    if not loaded_templates: # If after all attempts, no templates were loaded
+    if not asset and not loaded_templates: # If after all attempts, no templates were loaded
         logger.error("CRITICAL: No badge templates could be loaded. Aborting PDF generation.")
         return None
 
@@ -374,21 +631,34 @@ def generate_badge_pdf(badge_data_list, layout_config):
             elif not loaded_fonts_bold.get(size): # If bold is needed but somehow not set yet (e.g. not in failed set)
                  loaded_fonts_bold[size] = loaded_fonts[size] # Fallback
 
-    def draw_photo(badge_image, photo_config, data, s3_bucket):
+    if vector_text:
+        # The Pillow fonts above still provide the metrics for positioning; fpdf embeds the glyphs used
+        try:
+            pdf.add_font(BADGE_PDF_FONT, '', font_path)
+            if needs_bold:
+                bold_ok = os.path.exists(font_bold_path) and not bold_load_failed_sizes
+                pdf.add_font(BADGE_PDF_FONT, 'B', font_bold_path if bold_ok else font_path)
+        except Exception as e:
+            logger.error(f"CRITICAL: Error registering PDF fonts '{font_path}' / '{font_bold_path}': {e}", exc_info=True)
+            return None
+
+    def fetch_photo(photo_config, data, s3_bucket):
+        """Photo bytes for the badge (staged copy or S3), or None"""
         if not photo_config:
-            return
+            return None
 
         s3_key_field = photo_config.get('s3_key_field')
         s3_object_key = data.get(s3_key_field, '') if s3_key_field else ''
 
         if s3_object_key and s3_object_key not in ['N/A', 'Upload Error', '']:
             try:
-                logger.info(f"Attempting to download photo from S3: Bucket='{s3_bucket}', Key='{s3_object_key}'")
-                s3_response = s3_client.get_object(Bucket=s3_bucket, Key=s3_object_key)
-                with Image.open(BytesIO(s3_response['Body'].read())).convert("RGBA") as holder_photo:
-                    with holder_photo.resize((photo_config['box_w'], photo_config['box_h']), Image.Resampling.LANCZOS) as resized_photo:
-                        badge_image.paste(resized_photo, (photo_config['paste_x'], photo_config['paste_y']), resized_photo)
-                logger.info(f"Successfully added photo '{s3_object_key}' to badge.")
+                photo_bytes = photo_uploads.read_staged(s3_object_key) if photo_uploads.is_pending(s3_object_key) else None
+                if photo_bytes is None:
+                    s3_object_key = photo_uploads.s3_key_of(s3_object_key)
+                    logger.info(f"Attempting to download photo from S3: Bucket='{s3_bucket}', Key='{s3_object_key}'")
+                    s3_response = get_s3_client().get_object(Bucket=s3_bucket, Key=s3_object_key)
+                    photo_bytes = s3_response['Body'].read()
+                return photo_bytes
             except ClientError as e:
                 if e.response['Error']['Code'] == 'NoSuchKey':
                     logger.warning(f"S3 photo not found: Key='{s3_object_key}', Bucket='{s3_bucket}'")
@@ -396,9 +666,182 @@ def generate_badge_pdf(badge_data_list, layout_config):
                     logger.error(f"S3 ClientError downloading photo '{s3_object_key}': {e}", exc_info=True)
             except Exception as e:
                 logger.error(f"Error processing S3 photo '{s3_object_key}': {e}", exc_info=True)
+        return None
+
+    def draw_photo(badge_image, photo_config, data, s3_bucket):
+        photo_bytes = fetch_photo(photo_config, data, s3_bucket)
+        if photo_bytes is None:
+            return
+        try:
+            with Image.open(BytesIO(photo_bytes)).convert("RGBA") as holder_photo:
+                with holder_photo.resize((photo_config['box_w'], photo_config['box_h']), Image.Resampling.LANCZOS) as resized_photo:
+                    badge_image.paste(resized_photo, (photo_config['paste_x'], photo_config['paste_y']), resized_photo)
+            logger.info(f"Successfully added photo '{data.get(photo_config.get('s3_key_field'))}' to badge.")
+        except Exception as e:
+            logger.error(f"Error processing S3 photo '{data.get(photo_config.get('s3_key_field'))}': {e}", exc_info=True)
+
+    def print_ready_photo(photo_bytes, box_w_mm, box_h_mm):
+        """
+        The stored photo, upright and no larger than its box at BADGE_PHOTO_PRINT_DPI (re-encoded
+        only when that changes it). Photos stored before ingest are multi-MB camera originals.
+        """
+        from PIL import ImageOps
+        target_w = max(1, round(box_w_mm / MM_PER_INCH * config.BADGE_PHOTO_PRINT_DPI))
+        target_h = max(1, round(box_h_mm / MM_PER_INCH * config.BADGE_PHOTO_PRINT_DPI))
+        with Image.open(BytesIO(photo_bytes)) as img:
+            stored_size = img.size
+            rotated = img.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1
+            # Both axes get the long box side since EXIF rotation may swap them (as in ingest)
+            img.draft('RGB', (max(target_w, target_h),) * 2)
+            img = ImageOps.exif_transpose(img)
+            # The box stretches the photo, so keep at least box-sized pixels on both axes
+            scale = max(target_w / img.width, target_h / img.height)
+            if scale >= 1 and not rotated and img.size == stored_size:
+                return photo_bytes
+            if scale < 1:
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.Resampling.LANCZOS)
+            output = BytesIO()
+            if 'A' in img.getbands() or img.mode == 'P':
+                img.save(output, 'PNG') # Keep transparency; the template shows through as in the composite
+            else:
+                img.convert('RGB').save(output, 'JPEG', quality=config.PHOTO_OUTPUT_QUALITY, optimize=True)
+            return output.getvalue()
+
+    def place_photo(photo_config, data, s3_bucket, x_pos, y_pos, mm_per_px_x, mm_per_px_y):
+        """Layered mode: the stored photo (see print_ready_photo) goes into the PDF scaled into its box"""
+        photo_bytes = fetch_photo(photo_config, data, s3_bucket)
+        if photo_bytes is None:
+            return
+        try:
+            box_w_mm = photo_config['box_w'] * mm_per_px_x
+            box_h_mm = photo_config['box_h'] * mm_per_px_y
+            pdf.image(BytesIO(print_ready_photo(photo_bytes, box_w_mm, box_h_mm)),
+                      x=x_pos + photo_config['paste_x'] * mm_per_px_x, y=y_pos + photo_config['paste_y'] * mm_per_px_y,
+                      w=box_w_mm, h=box_h_mm)
+        except Exception as e:
+            logger.error(f"Error placing photo '{data.get(photo_config.get('s3_key_field'))}' on badge: {e}", exc_info=True)
+
+    def photo_configs_for(data):
+        photo_configs = [layout_config.get('photo_config')]
+        if data.get('attendant_type') == 'family':
+            photo_configs.append(layout_config.get('sne_photo_config'))
+        return [photo_config for photo_config in photo_configs if photo_config]
+
+    def draw_text_elements(draw, data):
+        for key, text_config_item in text_elements.items():
+            text_to_draw = str(data.get(key, '')).upper() 
+            if text_to_draw: 
+                font_size = text_config_item['size']
+                is_bold = text_config_item.get('is_bold', False)
+                color = text_config_item.get('color', 'black') 
+
+                font_to_use = loaded_fonts_bold.get(font_size) if is_bold and loaded_fonts_bold else loaded_fonts.get(font_size)
+                if not font_to_use:
+                    logger.warning(f"Font not available for size {font_size} (bold={is_bold}) for key '{key}'. Skipping text.")
+                    continue
+                
+                coords = text_config_item['coords']
+                if wrap_config and key == wrap_config.get('field_key'):
+                    wrapped_text = "\n".join(textwrap.wrap(text_to_draw, width=wrap_config.get('width', 20)))
+                    draw.multiline_text(coords, wrapped_text, fill=color, font=font_to_use, spacing=wrap_config.get('spacing', 4))
+                else:
+                    draw.text(coords, text_to_draw, fill=color, font=font_to_use)
+
+    def write_pdf_text(data, x_pos, y_pos, mm_per_px_x, mm_per_px_y):
+        """
+        Vector mode: text elements as PDF text, placed where ImageDraw.text would draw them
+        (coords are the top-left of the line at ascender height; PDF text is placed by baseline).
+        """
+        pdf.set_stretching(100 * badge_text_stretch(mm_per_px_x, mm_per_px_y))
+        for key, text_config_item in text_elements.items():
+            text_to_draw = str(data.get(key, '')).upper()
+            if text_to_draw:
+                font_size = text_config_item['size']
+                is_bold = text_config_item.get('is_bold', False)
+                color = text_config_item.get('color', 'black')
+
+                metrics_font = loaded_fonts_bold.get(font_size) if is_bold and loaded_fonts_bold else loaded_fonts.get(font_size)
+                if not metrics_font:
+                    logger.warning(f"Font not available for size {font_size} (bold={is_bold}) for key '{key}'. Skipping text.")
+                    continue
+
+                pdf.set_font(BADGE_PDF_FONT, 'B' if is_bold else '', size=font_size * mm_per_px_y * PT_PER_MM)
+                pdf.set_text_color(*(color if isinstance(color, tuple) else ImageColor.getrgb(color)))
+
+                x_px, y_px = text_config_item['coords']
+                baseline_px = y_px + metrics_font.getmetrics()[0]
+                if wrap_config and key == wrap_config.get('field_key'):
+                    lines = textwrap.wrap(text_to_draw, width=wrap_config.get('width', 20))
+                    line_spacing_px = metrics_font.getbbox("A")[3] + wrap_config.get('spacing', 4) # As multiline_text
+                else:
+                    lines = [text_to_draw]
+                    line_spacing_px = 0
+                for line_num, line in enumerate(lines):
+                    pdf.text(x_pos + x_px * mm_per_px_x, y_pos + (baseline_px + line_num * line_spacing_px) * mm_per_px_y, line)
+
+    def next_position():
+        """Top-left corner (mm) of the next badge slot, starting a new page when full"""
+        nonlocal col_num, row_num
+        if col_num >= badges_per_row:
+            col_num = 0
+            row_num += 1
+
+        if row_num >= badges_per_col:
+            row_num = 0
+            col_num = 0 
+            pdf.add_page()
+
+        x_pos = MARGIN_MM + col_num * effective_badge_width
+        y_pos = MARGIN_MM + row_num * effective_badge_height
+        col_num += 1
+        return x_pos, y_pos
+
+    def place_layered_badge(data):
+        if asset:
+            background_path = asset['background_path']
+            source_w, source_h = asset['source_size_px']
+        else:
+            template = loaded_templates.get(str(data.get('attendant_type', 'default')).lower()) or loaded_templates.get("default")
+            if not template:
+                logger.error(f"CRITICAL: No suitable template found for badge: {data.get('badge_id', data.get('token_id', 'N/A'))}. Skipping.")
+                return
+            background_path = template.filename
+            source_w, source_h = template.size
+        mm_per_px_x = BADGE_WIDTH_MM / source_w
+        mm_per_px_y = BADGE_HEIGHT_MM / source_h
+
+        text_png = None
+        if not vector_text:
+            with Image.new("RGBA", text_layer_size, (0, 0, 0, 0)) as text_layer:
+                draw_text_elements(ImageDraw.Draw(text_layer), data)
+                text_box = text_layer.getbbox()
+                if text_box:
+                    with BytesIO() as temp_img_buffer:
+                        text_layer.crop(text_box).save(temp_img_buffer, format="PNG")
+                        text_png = temp_img_buffer.getvalue()
+
+        x_pos, y_pos = next_position()
+        # Same path every time, so fpdf embeds the background once and references it per badge
+        pdf.image(background_path, x=x_pos, y=y_pos, w=BADGE_WIDTH_MM, h=BADGE_HEIGHT_MM)
+        for photo_config in photo_configs_for(data):
+            place_photo(photo_config, data, layout_config['s3_bucket'], x_pos, y_pos, mm_per_px_x, mm_per_px_y)
+        if vector_text:
+            write_pdf_text(data, x_pos, y_pos, mm_per_px_x, mm_per_px_y)
+        elif text_png:
+            mm_per_layer_px_x = BADGE_WIDTH_MM / text_layer_size[0]
+            mm_per_layer_px_y = BADGE_HEIGHT_MM / text_layer_size[1]
+            pdf.image(BytesIO(text_png), x=x_pos + text_box[0] * mm_per_layer_px_x, y=y_pos + text_box[1] * mm_per_layer_px_y,
+                      w=(text_box[2] - text_box[0]) * mm_per_layer_px_x, h=(text_box[3] - text_box[1]) * mm_per_layer_px_y)
 
     # --- Generate Badges ---
     for data in badge_data_list:
+        if layered:
+            try:
+                place_layered_badge(data)
+            except Exception as e:
+                logger.error(f"Badge composition failed for data: {data.get('badge_id', data.get('token_id', 'N/A'))}: {e}", exc_info=True)
+            continue
+
         badge_image_composite = None 
         try:
             badge_specific_type_key = str(data.get('attendant_type', 'default')).lower()
@@ -415,52 +858,21 @@ def generate_badge_pdf(badge_data_list, layout_config):
             draw = ImageDraw.Draw(badge_image_composite)
 
             # --- Add Photos from S3 ---
-            draw_photo(badge_image_composite, layout_config.get('photo_config'), data, layout_config['s3_bucket'])
-            
-            if data.get('attendant_type') == 'family':
-                draw_photo(badge_image_composite, layout_config.get('sne_photo_config'), data, layout_config['s3_bucket'])
+            for photo_config in photo_configs_for(data):
+                draw_photo(badge_image_composite, photo_config, data, layout_config['s3_bucket'])
 
 
             # --- Draw Text onto Badge ---
-            for key, text_config_item in text_elements.items():
-                text_to_draw = str(data.get(key, '')).upper() 
-                if text_to_draw: 
-                    font_size = text_config_item['size']
-                    is_bold = text_config_item.get('is_bold', False)
-                    color = text_config_item.get('color', 'black') 
-
-                    font_to_use = loaded_fonts_bold.get(font_size) if is_bold and loaded_fonts_bold else loaded_fonts.get(font_size)
-                    if not font_to_use:
-                        logger.warning(f"Font not available for size {font_size} (bold={is_bold}) for key '{key}'. Skipping text.")
-                        continue
-                    
-                    coords = text_config_item['coords']
-                    if wrap_config and key == wrap_config.get('field_key'):
-                        wrapped_text = "\n".join(textwrap.wrap(text_to_draw, width=wrap_config.get('width', 20)))
-                        draw.multiline_text(coords, wrapped_text, fill=color, font=font_to_use, spacing=wrap_config.get('spacing', 4))
-                    else:
-                        draw.text(coords, text_to_draw, fill=color, font=font_to_use)
+            draw_text_elements(draw, data)
 
             # --- Place Badge onto PDF Page ---
-            if col_num >= badges_per_row:
-                col_num = 0
-                row_num += 1
-
-            if row_num >= badges_per_col:
-                row_num = 0
-                col_num = 0 
-                pdf.add_page()
-
-            x_pos = MARGIN_MM + col_num * effective_badge_width
-            y_pos = MARGIN_MM + row_num * effective_badge_height
+            x_pos, y_pos = next_position()
 
             with BytesIO() as temp_img_buffer:
                 badge_image_composite.save(temp_img_buffer, format="PNG")
                 temp_img_buffer.seek(0)
                 pdf.image(temp_img_buffer, x=x_pos, y=y_pos, w=BADGE_WIDTH_MM, h=BADGE_HEIGHT_MM, type='PNG')
 
-            col_num += 1
-
         except Exception as e:
             logger.error(f"Badge composition failed for data: {data.get('badge_id', data.get('token_id', 'N/A'))}: {e}", exc_info=True)
         finally:
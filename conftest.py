@@ -0,0 +1,41 @@
+"""
+Shared pytest fixtures: the app on a throwaway SQLite database, and logged-in clients.
+Only the pytest-style test files use these; the older test_*.py scripts run on import.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Metrics files of test runs stay out of instance/metrics
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='rssb-test-metrics-'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    # Kept for the whole session: the database helpers check USE_SQLITE on every call
+    database_dir = tempfile.mkdtemp(prefix='rssb-tests-')
+    os.environ.update({
+        'SECRET_KEY': 'test-secret',
+        'USE_DATABASE': 'true',
+        'USE_SQLITE': 'true',
+        'SQLITE_DB_PATH': os.path.join(database_dir, 'test.db'),
+        'ADMIN_PASSWORD': 'test-password',
+    })
+    from app import create_app
+    from app.models import db
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'test-password'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Benchmark
+Simulates concurrent blood camp submissions against a throwaway SQLite database
+and compares the default SQLite settings with the tuned profile (WAL, busy_timeout,
+synchronous=NORMAL, BEGIN IMMEDIATE for ID allocation).
+
+Usage:
+    python scripts/benchmark_sqlite_concurrency.py                       # Compare both profiles
+    python scripts/benchmark_sqlite_concurrency.py --profile tuned       # Tuned profile only
+    python scripts/benchmark_sqlite_concurrency.py --writers 30 --submissions 20 --readers 5
+"""
+import sys
+import os
+import argparse
+import logging
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['USE_SQLITE'] = 'true'
+
+from flask import Flask
+from sqlalchemy import func
+
+# Configure logging (keep app INFO logs out of the benchmark output)
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def create_app(db_path, tuned):
+    """Create minimal Flask app bound to a fresh SQLite file"""
+    os.environ['SQLITE_DB_PATH'] = db_path
+    os.environ['SQLITE_TUNING'] = 'true' if tuned else 'false'
+
+    from app.database import init_db
+    from app.models import db
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark-secret'
+    init_db(app)
+    app.config['SQLALCHEMY_ECHO'] = False
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def writer(app, worker_num, submissions, results):
+    """Registers new donors one after another, like an operator at the registration desk"""
+    from app import db_helpers
+    from app.models import db
+
+    with app.app_context():
+        for i in range(submissions):
+            started = time.perf_counter()
+            try:
+                for _ in range(3):
+                    donor_id = db_helpers.get_next_donor_id_postgres(prefix="BD")
+                    _, success, error_msg = db_helpers.create_blood_donor(
+                        donor_id, f"9{worker_num:04d}{i:05d}", f"Bench Donor {worker_num}-{i}",
+                        blood_group='O+', status=''
+                    )
+                    if success:
+                        results['ok'] += 1
+                        break
+                    if error_msg == "DUPLICATE_DONOR_ID" or 'UNIQUE' in (error_msg or ''):
+                        results['duplicate_retries'] += 1
+                        continue
+                    raise Exception(error_msg)
+                else:
+                    results['failed'] += 1
+            except Exception as e:
+                db.session.rollback()
+                if 'locked' in str(e):
+                    results['locked_errors'] += 1
+                else:
+                    results['failed'] += 1
+                    logger.warning(f"Writer {worker_num} submission {i} failed: {e}")
+            finally:
+                results['latencies'].append(time.perf_counter() - started)
+                db.session.remove()
+
+
+def reader(app, stop_event, results):
+    """Polls aggregate counts, like an open dashboard"""
+    from app.models import db, BloodCampDonor
+
+    with app.app_context():
+        while not stop_event.is_set():
+            try:
+                db.session.query(func.count(BloodCampDonor.id)).scalar()
+                results['reads'] += 1
+            except Exception as e:
+                results['read_errors'] += 1
+                logger.warning(f"Reader failed: {e}")
+            finally:
+                db.session.remove()
+
+
+def run_profile(tuned, writers, submissions, readers):
+    """Runs one benchmark pass and returns its summary"""
+    from app.models import db, BloodCampDonor
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='sqlite_bench_'), 'bench.db')
+    app = create_app(db_path, tuned)
+
+    results = {'ok': 0, 'failed': 0, 'locked_errors': 0, 'duplicate_retries': 0,
+               'reads': 0, 'read_errors': 0, 'latencies': []}
+    stop_event = threading.Event()
+
+    reader_threads = [threading.Thread(target=reader, args=(app, stop_event, results)) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(app, n, submissions, results)) for n in range(writers)]
+
+    started = time.perf_counter()
+    for t in reader_threads + writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    for t in reader_threads:
+        t.join()
+
+    with app.app_context():
+        total_rows = db.session.query(func.count(BloodCampDonor.id)).scalar()
+        distinct_ids = db.session.query(func.count(func.distinct(BloodCampDonor.donor_id))).scalar()
+        db.engine.dispose()
+
+    latencies = sorted(results['latencies']) or [0]
+    return {
+        'profile': 'tuned' if tuned else 'default',
+        'elapsed_s': elapsed,
+        'throughput': results['ok'] / elapsed if elapsed else 0,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0] * 1000,
+        'rows': total_rows,
+        'duplicate_ids': total_rows - distinct_ids,
+        **{k: v for k, v in results.items() if k != 'latencies'}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent SQLite submissions')
+    parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both',
+                       help='Which SQLite profile to benchmark')
+    parser.add_argument('--writers', type=int, default=20, help='Concurrent submitting threads')
+    parser.add_argument('--submissions', type=int, default=10, help='Submissions per writer')
+    parser.add_argument('--readers', type=int, default=2, help='Concurrent dashboard-style readers')
+    args = parser.parse_args()
+
+    profiles = {'default': [False], 'tuned': [True], 'both': [False, True]}[args.profile]
+
+    print("=" * 70)
+    print(f"SQLite concurrency benchmark: {args.writers} writers x {args.submissions} submissions, {args.readers} readers")
+    print("=" * 70)
+
+    for tuned in profiles:
+        summary = run_profile(tuned, args.writers, args.submissions, args.readers)
+        print(f"\nProfile: {summary['profile']}")
+        print(f"  Inserted:          {summary['ok']} / {args.writers * args.submissions}")
+        print(f"  'locked' errors:   {summary['locked_errors']}")
+        print(f"  Other failures:    {summary['failed']}")
+        print(f"  Duplicate retries: {summary['duplicate_retries']}")
+        print(f"  Duplicate IDs:     {summary['duplicate_ids']}")
+        print(f"  Throughput:        {summary['throughput']:.1f} submissions/s")
+        print(f"  Latency p50/p95:   {summary['p50_ms']:.1f} ms / {summary['p95_ms']:.1f} ms")
+        print(f"  Reads completed:   {summary['reads']} ({summary['read_errors']} errors)")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Badge Asset Build
+Pre-scales the SNE badge template to the exact pixel size it prints at and writes the
+background plus its metadata, which generate_badge_pdf uses instead of the full template:
+
+    app/static/images/build/sne_badge_<dpi>dpi.jpg   background (opaque, so JPEG)
+    app/static/images/build/sne_badge.json           source hash, source/print sizes, DPI
+
+Text and photo coordinates in config stay in template pixels; the metadata carries the
+sizes needed to scale them. Rerun after changing the template image - the app detects a
+changed template by its hash and falls back to the full-size template until then.
+
+Usage:
+    python scripts/build_badge_assets.py
+    python scripts/build_badge_assets.py --dpi 300 --quality 92
+"""
+import sys
+import os
+import json
+import hashlib
+import argparse
+import logging
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MM_PER_INCH = 25.4
+
+
+def build_asset(source_path, meta_path, size_mm, dpi, quality):
+    """Writes the pre-scaled background and its metadata; paths are relative to the repo root"""
+    with open(os.path.join(REPO_ROOT, source_path), 'rb') as f:
+        source_bytes = f.read()
+
+    size_px = (round(size_mm[0] / MM_PER_INCH * dpi), round(size_mm[1] / MM_PER_INCH * dpi))
+    background_name = f"{os.path.splitext(os.path.basename(meta_path))[0]}_{dpi}dpi.jpg"
+    out_dir = os.path.join(REPO_ROOT, os.path.dirname(meta_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(os.path.join(REPO_ROOT, source_path)) as template:
+        source_size = template.size
+        # The template is printed stretched to the badge size, so scale each axis separately
+        with template.convert("RGB") as rgb, rgb.resize(size_px, Image.Resampling.LANCZOS) as background:
+            background.save(os.path.join(out_dir, background_name), format="JPEG",
+                            quality=quality, subsampling=0, optimize=True, dpi=(dpi, dpi))
+
+    meta = {
+        'source': source_path,
+        'source_sha1': hashlib.sha1(source_bytes).hexdigest(),
+        'source_size_px': list(source_size),
+        'background': background_name,
+        'size_px': list(size_px),
+        'size_mm': list(size_mm),
+        'dpi': dpi,
+    }
+    with open(os.path.join(REPO_ROOT, meta_path), 'w') as f:
+        json.dump(meta, f, indent=2)
+        f.write('\n')
+
+    background_kb = os.path.getsize(os.path.join(out_dir, background_name)) / 1024
+    logger.info(f"{source_path} {source_size[0]}x{source_size[1]} ({len(source_bytes) / 1024:.0f} KB) -> "
+                f"{background_name} {size_px[0]}x{size_px[1]} ({background_kb:.0f} KB)")
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build pre-scaled badge background assets')
+    parser.add_argument('--dpi', type=int, default=None, help='Print resolution (default: SNE_BADGE_PRINT_DPI)')
+    parser.add_argument('--quality', type=int, default=92, help='JPEG quality of the background')
+    args = parser.parse_args()
+
+    from app import config
+
+    build_asset(config.SNE_BADGE_TEMPLATE_PATH, config.SNE_BADGE_ASSET_PATH, config.SNE_BADGE_SIZE_MM,
+                args.dpi or config.SNE_BADGE_PRINT_DPI, args.quality)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+PgBouncer Transaction-Pooling Safety Check
+Runs concurrent donor ID allocations from several processes through a transaction-mode
+pooler (PgBouncer, or any stand-in listening on DB_HOST/DB_PORT) and verifies that:
+- no donor ID is handed out twice (advisory lock works across worker processes)
+- each allocation and its INSERT ran in one server transaction
+- no advisory locks are left behind after the run
+
+Usage:
+    # PgBouncer in front of PostgreSQL, e.g. pool_mode=transaction on port 6432
+    DB_PORT=6432 DB_POOLER_SAFE=true python scripts/check_pooler_safety.py
+    python scripts/check_pooler_safety.py --processes 4 --threads 8 --allocations 25 --prefix PB
+"""
+import sys
+import os
+import argparse
+import logging
+import multiprocessing
+import threading
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['USE_SQLITE'] = 'false'
+os.environ.setdefault('DB_POOLER_SAFE', 'true')
+
+from flask import Flask
+from sqlalchemy import text
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def create_app():
+    """Create minimal Flask app for database access"""
+    from app.database import init_db
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'pooler-check-secret'
+    init_db(app)
+    app.config['SQLALCHEMY_ECHO'] = False
+    return app
+
+
+def allocate(app, prefix, allocations, results):
+    """Allocates and inserts donors, recording the server transaction of each step"""
+    from app import db_helpers
+    from app.models import db
+
+    with app.app_context():
+        for i in range(allocations):
+            try:
+                donor_id = db_helpers.get_next_donor_id_postgres(prefix=prefix)
+                lock_txid = db.session.execute(text("SELECT txid_current()")).scalar()
+                _, success, error_msg = db_helpers.create_blood_donor(
+                    donor_id, '9000000000', f"Pooler Check {os.getpid()}-{i}", status=''
+                )
+                if not success:
+                    results.append(('failed', donor_id, error_msg))
+                    continue
+                insert_txid = db.session.execute(
+                    text("SELECT xmin::text::bigint FROM blood_camp_donors WHERE donor_id = :donor_id"),
+                    {'donor_id': donor_id}
+                ).scalar()
+                db.session.commit()
+                # xmin is the 32-bit epoch-less part of the inserting transaction's ID
+                same_txn = (lock_txid & 0xFFFFFFFF) == insert_txid
+                results.append(('ok', donor_id, same_txn))
+            except Exception as e:
+                db.session.rollback()
+                results.append(('failed', None, str(e)))
+            finally:
+                db.session.remove()
+
+
+def worker_process(prefix, threads, allocations, queue):
+    """One 'gunicorn worker': own engine, own pool, own hash seed"""
+    app = create_app()
+    results = []
+    pool = [threading.Thread(target=allocate, args=(app, prefix, allocations, results)) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify ID allocation is safe behind a transaction pooler')
+    parser.add_argument('--processes', type=int, default=4, help='Worker processes (separate pools)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per process')
+    parser.add_argument('--allocations', type=int, default=10, help='Allocations per thread')
+    parser.add_argument('--prefix', default='PB', help='Donor ID prefix used for test rows')
+    parser.add_argument('--keep', action='store_true', help='Keep test rows instead of deleting them')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"Pooler safety check against {os.environ.get('DB_HOST', 'localhost')}:{os.environ.get('DB_PORT', '5432')} "
+          f"(DB_POOLER_SAFE={os.environ['DB_POOLER_SAFE']})")
+    print("=" * 70)
+
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker_process,
+                                         args=(args.prefix, args.threads, args.allocations, queue))
+                 for _ in range(args.processes)]
+    for p in processes:
+        p.start()
+    results = [r for _ in processes for r in queue.get()]
+    for p in processes:
+        p.join()
+
+    ok = [r for r in results if r[0] == 'ok']
+    failed = [r for r in results if r[0] == 'failed']
+    ids = [r[1] for r in ok]
+    duplicates = len(ids) - len(set(ids))
+    split_txns = sum(1 for r in ok if not r[2])
+
+    from app.models import db
+    app = create_app()
+    with app.app_context():
+        leftover_locks = db.session.execute(
+            text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")
+        ).scalar()
+        if not args.keep:
+            db.session.execute(
+                text("DELETE FROM blood_camp_donors WHERE donor_id LIKE :pattern AND name_of_donor LIKE 'Pooler Check %'"),
+                {'pattern': f"{args.prefix}%"}
+            )
+            db.session.commit()
+
+    print(f"\nAllocations inserted:        {len(ok)} / {args.processes * args.threads * args.allocations}")
+    print(f"Failures:                    {len(failed)}")
+    print(f"Duplicate IDs:               {duplicates}")
+    print(f"Lock/INSERT in different tx: {split_txns}")
+    print(f"Advisory locks left behind:  {leftover_locks}")
+    for _, donor_id, error in failed[:5]:
+        print(f"  - {donor_id}: {error}")
+
+    passed = not failed and duplicates == 0 and split_txns == 0 and leftover_locks == 0
+    print("\n" + ("✅ PASS: ID allocation is pooler-safe" if passed else "❌ FAIL: see counts above"))
+    print("=" * 70)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
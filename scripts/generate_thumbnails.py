@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Backfill
+Creates listing thumbnails (thumbnails/<photo key>.jpg) for photos uploaded before
+thumbnails were generated at upload time. Existing thumbnails are skipped.
+
+Usage:
+    python scripts/generate_thumbnails.py              # Backfill all missing thumbnails
+    python scripts/generate_thumbnails.py --dry-run    # Only count what would be generated
+    python scripts/generate_thumbnails.py --force --workers 16
+"""
+import sys
+import os
+import argparse
+import logging
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from flask import Flask
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def create_app():
+    """Create minimal Flask app for database access"""
+    from app.database import init_db
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'thumbnail-backfill-secret'
+    init_db(app)
+    return app
+
+
+def collect_photo_keys():
+    """All uploaded photo keys referenced by SNE and attendant records"""
+    from app.models import db
+    from app.db_helpers import PHOTO_COLUMNS
+    from app import photo_uploads
+
+    keys = set()
+    for column in PHOTO_COLUMNS:
+        for (key,) in db.session.query(column).filter(column.isnot(None)).distinct():
+            if key and key not in ('N/A', 'Upload Error') and not photo_uploads.is_pending(key):
+                keys.add(key)
+    return sorted(keys)
+
+
+def backfill_one(s3_key, bucket, force, dry_run):
+    """Returns 'created', 'exists', 'missing' or 'error' for one photo"""
+    from app import utils
+
+    thumb_key = utils.thumbnail_s3_key(s3_key)
+    try:
+        if not force:
+            try:
+                utils.get_s3_client().head_object(Bucket=bucket, Key=thumb_key)
+                return 'exists'
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                    raise
+        if dry_run:
+            return 'created'
+
+        response = utils.get_s3_client().get_object(Bucket=bucket, Key=s3_key)
+        with Image.open(BytesIO(response['Body'].read())) as img:
+            img.draft('RGB', (512, 512))
+            thumbnail = utils.make_photo_thumbnail(ImageOps.exif_transpose(img))
+        utils.get_s3_client().put_object(Bucket=bucket, Key=thumb_key, Body=thumbnail.getvalue(), ContentType='image/jpeg')
+        return 'created'
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            logger.warning(f"Photo missing in S3: {s3_key}")
+            return 'missing'
+        logger.error(f"S3 error for {s3_key}: {e}")
+        return 'error'
+    except Exception as e:
+        logger.error(f"Failed to create thumbnail for {s3_key}: {e}")
+        return 'error'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate missing photo thumbnails')
+    parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that already exist')
+    parser.add_argument('--dry-run', action='store_true', help='Count thumbnails to generate without writing')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel S3 workers')
+    args = parser.parse_args()
+
+    from app import config
+
+    app = create_app()
+    with app.app_context():
+        keys = collect_photo_keys()
+    logger.info(f"Found {len(keys)} photos referenced by records")
+
+    counts = {'created': 0, 'exists': 0, 'missing': 0, 'error': 0}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for done, result in enumerate(pool.map(lambda k: backfill_one(k, config.S3_BUCKET_NAME, args.force, args.dry_run), keys), 1):
+            counts[result] += 1
+            if done % 100 == 0:
+                logger.info(f"Progress: {done}/{len(keys)} ({counts})")
+
+    verb = "Would create" if args.dry_run else "Created"
+    print("=" * 60)
+    print(f"{verb}: {counts['created']}  Already present: {counts['exists']}  "
+          f"Missing originals: {counts['missing']}  Errors: {counts['error']}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,13 @@
 PostgreSQL to SQLite Migration Script
 Migrates all data from RDS PostgreSQL to local SQLite database
 
+Tables are streamed in parallel with server-side cursors and bulk-loaded into a new
+SQLite file (one transaction, journaling off, indexes built afterwards) that replaces
+the existing database only once the load succeeded.
+
 Usage:
     python scripts/migrate_postgres_to_sqlite.py
+    python scripts/migrate_postgres_to_sqlite.py --yes --batch-size 10000
 
 Requirements:
     - PostgreSQL credentials in environment or .env file
@@ -14,14 +19,19 @@ Requirements:
 
 import os
 import sys
+import time
+import queue
+import argparse
+import threading
 from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, select, func
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -29,6 +39,7 @@ load_dotenv()
 
 # Import models
 from app.models import db, SNEForm, BloodCampDonor, Attendant
+from app.database import DatabaseConfig
 
 def get_postgres_uri():
     """Get PostgreSQL connection URI from environment"""
@@ -73,80 +84,157 @@ def create_backup(postgres_engine):
     
     return backup_file
 
-def migrate_data(postgres_engine, sqlite_engine):
-    """Migrate all data from PostgreSQL to SQLite"""
-    
-    # Create sessions
-    PostgresSession = sessionmaker(bind=postgres_engine)
-    SQLiteSession = sessionmaker(bind=sqlite_engine)
-    
-    pg_session = PostgresSession()
-    sqlite_session = SQLiteSession()
-    
+def stream_table(source_engine, table, batches, batch_size):
+    """
+    Producer thread: streams one table from the source with a server-side cursor
+    (rows arrive batch_size at a time instead of being loaded all at once).
+    Puts (table name, list of row tuples in table column order) on the queue, then
+    (table name, None) when done or (table name, exception) on failure.
+    """
+    try:
+        with source_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(table).order_by(table.c.id)
+            )
+            for partition in result.partitions():
+                batches.put((table.name, [tuple(row) for row in partition]))
+        batches.put((table.name, None))
+    except Exception as e:
+        batches.put((table.name, e))
+
+def sqlite_insert_statement(dialect, table):
+    """
+    Positional INSERT for executemany straight on the driver, plus the column type
+    conversions SQLAlchemy would apply (dates/datetimes to SQLite's text format).
+    Skipping per-row parameter compilation roughly halves the load time.
+    """
+    quote = dialect.identifier_preparer.quote
+    columns = list(table.columns)
+    sql = (f"INSERT INTO {quote(table.name)} ({', '.join(quote(c.name) for c in columns)}) "
+           f"VALUES ({', '.join('?' for _ in columns)})")
+    processors = [(i, c.type.dialect_impl(dialect).bind_processor(dialect)) for i, c in enumerate(columns)]
+    return sql, [(i, processor) for i, processor in processors if processor]
+
+def bind_rows(rows, processors):
+    """Applies the column bind processors to a batch of row tuples"""
+    if not processors:
+        return rows
+    bound = []
+    for row in rows:
+        row = list(row)
+        for i, processor in processors:
+            row[i] = processor(row[i])
+        bound.append(tuple(row))
+    return bound
+
+def migrate_data(postgres_engine, target_path, batch_size=5000):
+    """
+    Copy all tables from PostgreSQL into a new SQLite file at target_path.
+
+    The three tables are read in parallel (one PostgreSQL connection each) and written
+    by this thread - SQLite has a single writer - with executemany, all in one
+    transaction. The file is new and only moved into place after a successful load,
+    so the load runs with journal_mode=OFF and synchronous=OFF. Indexes (including
+    the unique badge/donor ID indexes, already enforced by PostgreSQL) are built once
+    after the rows are in instead of being updated row by row.
+    """
     models_to_migrate = [
         (SNEForm, 'SNE Forms'),
         (BloodCampDonor, 'Blood Camp Donors'),
         (Attendant, 'Attendants'),
     ]
-    
+    tables = {model.__table__.name: (model.__table__, name) for model, name in models_to_migrate}
     migration_summary = {}
-    
-    for model, name in models_to_migrate:
-        try:
-            print(f"\n📋 Migrating {name}...")
-            
-            # Count records in PostgreSQL
-            pg_count = pg_session.query(model).count()
-            print(f"   Found {pg_count} records in PostgreSQL")
-            
-            if pg_count == 0:
-                print(f"   ⚠️  No records to migrate")
-                migration_summary[name] = {'source': 0, 'migrated': 0, 'status': 'empty'}
+
+    with postgres_engine.connect() as conn:
+        source_counts = {table_name: conn.execute(select(func.count()).select_from(table)).scalar()
+                         for table_name, (table, _) in tables.items()}
+    for table_name, (table, name) in tables.items():
+        print(f"   {name}: {source_counts[table_name]} records in PostgreSQL")
+
+    sqlite_engine = create_engine(f"sqlite:///{target_path}")
+    inserts = {table_name: sqlite_insert_statement(sqlite_engine.dialect, table) for table_name, (table, _) in tables.items()}
+    loaded = dict.fromkeys(tables, 0)
+    errors = {}
+    started = time.perf_counter()
+
+    with sqlite_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=OFF")
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA cache_size=-200000")
+        conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+        for table, _ in tables.values():
+            conn.execute(CreateTable(table))
+
+        # Bounded so a fast source cannot buffer whole tables in memory
+        batches = queue.Queue(maxsize=16)
+        producers = [
+            threading.Thread(target=stream_table, args=(postgres_engine, table, batches, batch_size), daemon=True)
+            for table, _ in tables.values()
+        ]
+        for producer in producers:
+            producer.start()
+
+        remaining = len(producers)
+        while remaining:
+            table_name, rows = batches.get()
+            if rows is None or isinstance(rows, Exception):
+                remaining -= 1
+                if isinstance(rows, Exception):
+                    errors[table_name] = rows
+                    print(f"   ❌ Error reading {tables[table_name][1]}: {rows}")
+                else:
+                    print(f"   ✅ {tables[table_name][1]}: {loaded[table_name]} records loaded")
                 continue
-            
-            # Fetch all records from PostgreSQL
-            records = pg_session.query(model).all()
-            
-            # Insert into SQLite
-            migrated_count = 0
-            for record in records:
-                # Create a dictionary of all columns
-                record_dict = {c.name: getattr(record, c.name) for c in record.__table__.columns}
-                
-                # Create new instance for SQLite
-                new_record = model(**record_dict)
-                sqlite_session.add(new_record)
-                migrated_count += 1
-                
-                # Commit in batches of 100
-                if migrated_count % 100 == 0:
-                    sqlite_session.commit()
-                    print(f"   Migrated {migrated_count}/{pg_count} records...")
-            
-            # Final commit
-            sqlite_session.commit()
-            
-            # Verify count in SQLite
-            sqlite_count = sqlite_session.query(model).count()
-            
-            if sqlite_count == pg_count:
-                print(f"   ✅ Successfully migrated {sqlite_count} records")
-                migration_summary[name] = {'source': pg_count, 'migrated': sqlite_count, 'status': 'success'}
-            else:
-                print(f"   ⚠️  Warning: Count mismatch! PostgreSQL: {pg_count}, SQLite: {sqlite_count}")
-                migration_summary[name] = {'source': pg_count, 'migrated': sqlite_count, 'status': 'warning'}
-        
-        except Exception as e:
-            print(f"   ❌ Error migrating {name}: {str(e)}")
-            migration_summary[name] = {'source': pg_count if 'pg_count' in locals() else 0, 'migrated': 0, 'status': 'error', 'error': str(e)}
-            sqlite_session.rollback()
-    
-    # Close sessions
-    pg_session.close()
-    sqlite_session.close()
-    
+            if errors or not rows:
+                continue  # After a failure, drain the queue so producers can finish; the file is discarded
+            sql, processors = inserts[table_name]
+            conn.exec_driver_sql(sql, bind_rows(rows, processors))
+            loaded[table_name] += len(rows)
+        load_seconds = time.perf_counter() - started
+
+        if not errors:
+            print("   Building indexes...")
+            index_started = time.perf_counter()
+            for table, _ in tables.values():
+                for index in table.indexes:
+                    index.create(conn)
+            conn.commit()
+            # Back to the app's journal mode for normal operation
+            journal_mode = DatabaseConfig.get_sqlite_pragmas()['journal_mode'] if DatabaseConfig.sqlite_tuning_enabled() else 'DELETE'
+            conn.exec_driver_sql(f"PRAGMA journal_mode={journal_mode}")
+            print(f"   Loaded rows in {load_seconds:.1f}s, built indexes in {time.perf_counter() - index_started:.1f}s")
+        else:
+            conn.rollback()
+    sqlite_engine.dispose()
+
+    for table_name, (table, name) in tables.items():
+        if table_name in errors:
+            migration_summary[name] = {'source': source_counts[table_name], 'migrated': 0, 'status': 'error', 'error': str(errors[table_name])}
+        elif errors:
+            migration_summary[name] = {'source': source_counts[table_name], 'migrated': 0, 'status': 'error', 'error': 'Not saved: another table failed'}
+        elif source_counts[table_name] == 0:
+            migration_summary[name] = {'source': 0, 'migrated': 0, 'status': 'empty'}
+        elif loaded[table_name] == source_counts[table_name]:
+            migration_summary[name] = {'source': source_counts[table_name], 'migrated': loaded[table_name], 'status': 'success'}
+        else:
+            print(f"   ⚠️  Warning: Count mismatch for {name}! PostgreSQL: {source_counts[table_name]}, SQLite: {loaded[table_name]}")
+            migration_summary[name] = {'source': source_counts[table_name], 'migrated': loaded[table_name], 'status': 'warning'}
+
     return migration_summary
 
+def replace_sqlite_file(new_path, target_path):
+    """Move the freshly loaded database into place, keeping the previous file as a backup"""
+    if os.path.exists(target_path):
+        backup_path = f"{target_path}.pre-migration-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        os.replace(target_path, backup_path)
+        print(f"   Previous SQLite database kept as {backup_path}")
+    # WAL/SHM files of the old database must not be applied to the new one
+    for suffix in ('-wal', '-shm', '-journal'):
+        if os.path.exists(target_path + suffix):
+            os.remove(target_path + suffix)
+    os.replace(new_path, target_path)
+
 def verify_migration(postgres_engine, sqlite_engine):
     """Verify that migration was successful"""
     print("\n🔍 Verifying migration...")
@@ -177,51 +265,65 @@ def verify_migration(postgres_engine, sqlite_engine):
 
 def main():
     """Main migration function"""
+    parser = argparse.ArgumentParser(description='Migrate PostgreSQL data to SQLite')
+    parser.add_argument('--source-uri', help='Source database URI (default: built from DB_* environment variables)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows fetched and inserted per batch (default: 5000)')
+    parser.add_argument('--yes', action='store_true', help='Skip the backup prompt')
+    args = parser.parse_args()
+
     print("=" * 70)
     print("PostgreSQL to SQLite Migration Script")
     print("=" * 70)
     
     # Get database URIs
-    postgres_uri = get_postgres_uri()
+    postgres_uri = args.source_uri or get_postgres_uri()
     sqlite_uri = get_sqlite_uri()
+    sqlite_path = sqlite_uri.replace('sqlite:///', '')
     
     print(f"\n📊 Source: PostgreSQL (RDS)")
-    print(f"📊 Target: {sqlite_uri.replace('sqlite:///', '')}")
+    print(f"📊 Target: {sqlite_path}")
     
     # Create database engines
     print("\n🔌 Connecting to databases...")
     try:
         postgres_engine = create_engine(postgres_uri)
-        sqlite_engine = create_engine(sqlite_uri)
         
         # Test connections
         with postgres_engine.connect() as conn:
             print("   ✅ Connected to PostgreSQL")
-        
-        with sqlite_engine.connect() as conn:
-            print("   ✅ Connected to SQLite")
     
     except Exception as e:
         print(f"   ❌ Connection error: {str(e)}")
         sys.exit(1)
     
     # Create backup prompt
-    create_backup(postgres_engine)
-    
-    # Create SQLite schema
-    print("\n🏗️  Creating SQLite schema...")
-    from app.models import db
-    
-    # Bind metadata to SQLite engine and create tables
-    db.metadata.create_all(sqlite_engine)
-    print("   ✅ Schema created successfully")
+    if not args.yes:
+        create_backup(postgres_engine)
     
-    # Migrate data
+    # Load into a new file next to the target; the live database is untouched until it succeeds
     print("\n🚀 Starting data migration...")
-    migration_summary = migrate_data(postgres_engine, sqlite_engine)
-    
-    # Verify migration
-    all_match = verify_migration(postgres_engine, sqlite_engine)
+    started = time.perf_counter()
+    new_path = f"{sqlite_path}.migrating"
+    for leftover in (new_path, new_path + '-journal'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    try:
+        migration_summary = migrate_data(postgres_engine, new_path, args.batch_size)
+    except Exception:
+        if os.path.exists(new_path):
+            os.remove(new_path)
+        raise
+    
+    if any(stats['status'] == 'error' for stats in migration_summary.values()):
+        os.remove(new_path)
+        all_match = False
+    else:
+        replace_sqlite_file(new_path, sqlite_path)
+        print(f"   ✅ SQLite database ready in {time.perf_counter() - started:.1f}s")
+        
+        # Verify migration
+        sqlite_engine = create_engine(sqlite_uri)
+        all_match = verify_migration(postgres_engine, sqlite_engine)
     
     # Print summary
     print("\n" + "=" * 70)
@@ -229,7 +331,7 @@ def main():
     print("=" * 70)
     
     for table_name, stats in migration_summary.items():
-        status_icon = "✅" if stats['status'] == 'success' else "⚠️" if stats['status'] == 'warning' else "❌"
+        status_icon = "✅" if stats['status'] in ('success', 'empty') else "⚠️" if stats['status'] == 'warning' else "❌"
         print(f"{status_icon} {table_name}: {stats['migrated']} / {stats['source']} records")
         if stats['status'] == 'error':
             print(f"   Error: {stats.get('error', 'Unknown error')}")
@@ -5,13 +5,20 @@ Google Sheets to PostgreSQL Migration Script
 Migrates all existing data from Google Sheets to PostgreSQL database.
 Handles all three sheets: SNE Forms, Blood Camp Donors, and Attendants.
 
+Rows are inserted in chunks (COPY on PostgreSQL, executemany on SQLite); each chunk
+commits together with a per-table checkpoint, so an interrupted run resumes where it
+stopped. Records whose badge/donor ID already exists are skipped.
+
 Usage:
-    python migrate_sheets_to_postgres.py              # Migrate all data
+    python migrate_sheets_to_postgres.py              # Migrate all data (resumes if interrupted)
     python migrate_sheets_to_postgres.py --dry-run    # Test without writing
     python migrate_sheets_to_postgres.py --table sne  # Migrate specific table
+    python migrate_sheets_to_postgres.py --restart --chunk-size 5000
 """
+import io
 import sys
 import os
+import time
 import argparse
 import logging
 from datetime import datetime
@@ -21,9 +28,10 @@ from dateutil import parser as date_parser
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from flask import Flask
+from sqlalchemy import Table, MetaData, Column, String, Integer, DateTime, select, insert
 from app.models import db, SNEForm, BloodCampDonor, Attendant
 from app.database import init_db, check_connection
-from app import config, utils
+from app import config, utils, sheets_backend
 
 # Configure logging
 logging.basicConfig(
@@ -71,290 +79,292 @@ def parse_int(int_str):
         return None
 
 
-def migrate_sne_forms(dry_run=False):
-    """Migrate SNE Forms from Google Sheets to PostgreSQL"""
-    logger.info("\n" + "=" * 60)
-    logger.info("Migrating SNE Forms")
-    logger.info("=" * 60)
-    
-    try:
-        # Fetch data from Google Sheets
-        logger.info("Fetching data from Google Sheets...")
-        sheet_data = utils.get_all_sheet_data(
-            config.SNE_SHEET_ID,
-            config.SNE_SERVICE_ACCOUNT_FILE,
-            config.SNE_SHEET_HEADERS
-        )
-        logger.info(f"Found {len(sheet_data)} records in Google Sheets")
-        
-        if dry_run:
-            logger.info("DRY RUN - No data will be written to database")
-            if sheet_data:
-                logger.info("\nSample record:")
-                sample = sheet_data[0]
-                for key, value in sample.items():
-                    logger.info(f"  {key}: {value[:50] if len(str(value)) > 50 else value}")
-            return len(sheet_data)
-        
-        # Migrate each record
-        migrated = 0
-        skipped = 0
-        errors = 0
-        
-        for idx, record in enumerate(sheet_data, 1):
-            try:
-                badge_id = record.get('Badge ID', '').strip()
-                if not badge_id:
-                    logger.warning(f"Row {idx}: Missing Badge ID, skipping")
-                    skipped += 1
-                    continue
-                
-                # Check if already exists
-                existing = SNEForm.query.filter_by(badge_id=badge_id).first()
-                if existing:
-                    logger.debug(f"Badge ID {badge_id} already exists, skipping")
-                    skipped += 1
-                    continue
-                
-                # Create new record
-                sne = SNEForm(
-                    badge_id=badge_id,
-                    submission_date=parse_date(record.get('Submission Date')) or datetime.now().date(),
-                    area=record.get('Area', '').strip(),
-                    satsang_place=record.get('Satsang Place', '').strip(),
-                    first_name=record.get('First Name', '').strip(),
-                    last_name=record.get('Last Name', '').strip(),
-                    father_husband_name=record.get("Father's/Husband's Name", '').strip(),
-                    gender=record.get('Gender', '').strip(),
-                    date_of_birth=parse_date(record.get('Date of Birth')),
-                    age=parse_int(record.get('Age')),
-                    blood_group=record.get('Blood Group', '').strip(),
-                    aadhaar_no=utils.clean_aadhaar_number(record.get('Aadhaar No', '')),
-                    mobile_no=utils.clean_phone_number(record.get('Mobile No', '')),
-                    physically_challenged=record.get('Physically Challenged (Yes/No)', '').strip(),
-                    physically_challenged_details=record.get('Physically Challenged Details', '').strip(),
-                    help_required_home_pickup=record.get('Help Required for Home Pickup (Yes/No)', '').strip(),
-                    help_pickup_reasons=record.get('Help Pickup Reasons', '').strip(),
-                    handicap=record.get('Handicap (Yes/No)', '').strip(),
-                    stretcher_required=record.get('Stretcher Required (Yes/No)', '').strip(),
-                    wheelchair_required=record.get('Wheelchair Required (Yes/No)', '').strip(),
-                    ambulance_required=record.get('Ambulance Required (Yes/No)', '').strip(),
-                    pacemaker_operated=record.get('Pacemaker Operated (Yes/No)', '').strip(),
-                    chair_required_sitting=record.get('Chair Required for Sitting (Yes/No)', '').strip(),
-                    special_attendant_required=record.get('Special Attendant Required (Yes/No)', '').strip(),
-                    hearing_loss=record.get('Hearing Loss (Yes/No)', '').strip(),
-                    willing_attend_satsangs=record.get('Willing to Attend Satsangs (Yes/No)', '').strip(),
-                    satsang_pickup_help_details=record.get('Satsang Pickup Help Details', '').strip(),
-                    other_special_requests=record.get('Other Special Requests', '').strip(),
-                    emergency_contact_name=record.get('Emergency Contact Name', '').strip(),
-                    emergency_contact_number=record.get('Emergency Contact Number', '').strip(),
-                    emergency_contact_relation=record.get('Emergency Contact Relation', '').strip(),
-                    address=record.get('Address', '').strip(),
-                    state=record.get('State', '').strip(),
-                    pin_code=record.get('PIN Code', '').strip(),
-                    photo_filename=record.get('Photo Filename', '').strip()
-                )
-                
-                db.session.add(sne)
-                migrated += 1
-                
-                if migrated % 100 == 0:
-                    db.session.commit()
-                    logger.info(f"Progress: {migrated}/{len(sheet_data)} records migrated")
-                
-            except Exception as e:
-                logger.error(f"Row {idx} (Badge ID: {record.get('Badge ID', 'N/A')}): {e}")
-                errors += 1
-                continue
-        
-        # Final commit
-        db.session.commit()
-        
-        logger.info(f"\nSNE Forms Migration Complete:")
-        logger.info(f"  ✓ Migrated: {migrated}")
-        logger.info(f"  - Skipped:  {skipped}")
-        logger.info(f"  ✗ Errors:   {errors}")
-        
-        return migrated
-        
-    except Exception as e:
-        logger.error(f"Fatal error migrating SNE forms: {e}", exc_info=True)
-        return 0
+# --- Row mappings (sheet record -> table columns) ---
 
+def sne_row(record):
+    return dict(
+        badge_id=record.get('Badge ID', '').strip(),
+        submission_date=parse_date(record.get('Submission Date')) or datetime.now().date(),
+        area=record.get('Area', '').strip(),
+        satsang_place=record.get('Satsang Place', '').strip(),
+        first_name=record.get('First Name', '').strip(),
+        last_name=record.get('Last Name', '').strip(),
+        father_husband_name=record.get("Father's/Husband's Name", '').strip(),
+        gender=record.get('Gender', '').strip(),
+        date_of_birth=parse_date(record.get('Date of Birth')),
+        age=parse_int(record.get('Age')),
+        blood_group=record.get('Blood Group', '').strip(),
+        aadhaar_no=utils.clean_aadhaar_number(record.get('Aadhaar No', '')),
+        mobile_no=utils.clean_phone_number(record.get('Mobile No', '')),
+        physically_challenged=record.get('Physically Challenged (Yes/No)', '').strip(),
+        physically_challenged_details=record.get('Physically Challenged Details', '').strip(),
+        help_required_home_pickup=record.get('Help Required for Home Pickup (Yes/No)', '').strip(),
+        help_pickup_reasons=record.get('Help Pickup Reasons', '').strip(),
+        handicap=record.get('Handicap (Yes/No)', '').strip(),
+        stretcher_required=record.get('Stretcher Required (Yes/No)', '').strip(),
+        wheelchair_required=record.get('Wheelchair Required (Yes/No)', '').strip(),
+        ambulance_required=record.get('Ambulance Required (Yes/No)', '').strip(),
+        pacemaker_operated=record.get('Pacemaker Operated (Yes/No)', '').strip(),
+        chair_required_sitting=record.get('Chair Required for Sitting (Yes/No)', '').strip(),
+        special_attendant_required=record.get('Special Attendant Required (Yes/No)', '').strip(),
+        hearing_loss=record.get('Hearing Loss (Yes/No)', '').strip(),
+        willing_attend_satsangs=record.get('Willing to Attend Satsangs (Yes/No)', '').strip(),
+        satsang_pickup_help_details=record.get('Satsang Pickup Help Details', '').strip(),
+        other_special_requests=record.get('Other Special Requests', '').strip(),
+        emergency_contact_name=record.get('Emergency Contact Name', '').strip(),
+        emergency_contact_number=record.get('Emergency Contact Number', '').strip(),
+        emergency_contact_relation=record.get('Emergency Contact Relation', '').strip(),
+        address=record.get('Address', '').strip(),
+        state=record.get('State', '').strip(),
+        pin_code=record.get('PIN Code', '').strip(),
+        photo_filename=record.get('Photo Filename', '').strip()
+    )
 
-def migrate_blood_camp(dry_run=False):
-    """Migrate Blood Camp Donors from Google Sheets to PostgreSQL"""
-    logger.info("\n" + "=" * 60)
-    logger.info("Migrating Blood Camp Donors")
-    logger.info("=" * 60)
-    
-    try:
-        logger.info("Fetching data from Google Sheets...")
-        sheet_data = utils.get_all_sheet_data(
-            config.BLOOD_CAMP_SHEET_ID,
-            config.BLOOD_CAMP_SERVICE_ACCOUNT_FILE,
-            config.BLOOD_CAMP_SHEET_HEADERS
-        )
-        logger.info(f"Found {len(sheet_data)} records in Google Sheets")
-        
-        if dry_run:
-            logger.info("DRY RUN - No data will be written to database")
-            if sheet_data:
-                logger.info("\nSample record:")
-                sample = sheet_data[0]
-                for key, value in sample.items():
-                    logger.info(f"  {key}: {value[:50] if len(str(value)) > 50 else value}")
-            return len(sheet_data)
-        
-        migrated = 0
-        skipped = 0
-        errors = 0
-        
-        for idx, record in enumerate(sheet_data, 1):
-            try:
-                donor_id = record.get('Donor ID', '').strip()
-                if not donor_id:
-                    logger.warning(f"Row {idx}: Missing Donor ID, skipping")
-                    skipped += 1
-                    continue
-                
-                existing = BloodCampDonor.query.filter_by(donor_id=donor_id).first()
-                if existing:
-                    logger.debug(f"Donor ID {donor_id} already exists, skipping")
-                    skipped += 1
-                    continue
-                
-                donor = BloodCampDonor(
-                    donor_id=donor_id,
-                    submission_timestamp=parse_datetime(record.get('Submission Timestamp')) or datetime.now(),
-                    area=record.get('Area', '').strip(),
-                    name_of_donor=record.get('Name of Donor', '').strip(),
-                    father_husband_name=record.get("Father's/Husband's Name", '').strip(),
-                    date_of_birth=parse_date(record.get('Date of Birth')),
-                    gender=record.get('Gender', '').strip(),
-                    occupation=record.get('Occupation', '').strip(),
-                    house_no=record.get('House No.', '').strip(),
-                    sector=record.get('Sector', '').strip(),
-                    city=record.get('City', '').strip(),
-                    mobile_number=utils.clean_phone_number(record.get('Mobile Number', '')),
-                    blood_group=record.get('Blood Group', '').strip(),
-                    allow_call=record.get('Allow Call', '').strip(),
-                    donation_date=parse_date(record.get('Donation Date')),
-                    donation_location=record.get('Donation Location', '').strip(),
-                    first_donation_date=parse_date(record.get('First Donation Date')),
-                    total_donations=parse_int(record.get('Total Donations')) or 1,
-                    status=record.get('Status', 'Pending').strip(),
-                    reason_for_rejection=record.get('Reason for Rejection', '').strip()
-                )
-                
-                db.session.add(donor)
-                migrated += 1
-                
-                if migrated % 100 == 0:
-                    db.session.commit()
-                    logger.info(f"Progress: {migrated}/{len(sheet_data)} records migrated")
-                
-            except Exception as e:
-                logger.error(f"Row {idx} (Donor ID: {record.get('Donor ID', 'N/A')}): {e}")
-                errors += 1
-                continue
-        
-        db.session.commit()
-        
-        logger.info(f"\nBlood Camp Migration Complete:")
-        logger.info(f"  ✓ Migrated: {migrated}")
-        logger.info(f"  - Skipped:  {skipped}")
-        logger.info(f"  ✗ Errors:   {errors}")
-        
-        return migrated
-        
-    except Exception as e:
-        logger.error(f"Fatal error migrating blood camp: {e}", exc_info=True)
+
+def blood_camp_row(record):
+    return dict(
+        donor_id=record.get('Donor ID', '').strip(),
+        submission_timestamp=parse_datetime(record.get('Submission Timestamp')) or datetime.now(),
+        area=record.get('Area', '').strip(),
+        name_of_donor=record.get('Name of Donor', '').strip(),
+        father_husband_name=record.get("Father's/Husband's Name", '').strip(),
+        date_of_birth=parse_date(record.get('Date of Birth')),
+        gender=record.get('Gender', '').strip(),
+        occupation=record.get('Occupation', '').strip(),
+        house_no=record.get('House No.', '').strip(),
+        sector=record.get('Sector', '').strip(),
+        city=record.get('City', '').strip(),
+        mobile_number=utils.clean_phone_number(record.get('Mobile Number', '')),
+        blood_group=record.get('Blood Group', '').strip(),
+        allow_call=record.get('Allow Call', '').strip(),
+        donation_date=parse_date(record.get('Donation Date')),
+        donation_location=record.get('Donation Location', '').strip(),
+        first_donation_date=parse_date(record.get('First Donation Date')),
+        total_donations=parse_int(record.get('Total Donations')) or 1,
+        status=record.get('Status', 'Pending').strip(),
+        reason_for_rejection=record.get('Reason for Rejection', '').strip()
+    )
+
+
+def attendant_row(record):
+    return dict(
+        badge_id=record.get('Badge ID', '').strip(),
+        submission_date=parse_date(record.get('Submission Date')) or datetime.now().date(),
+        area=record.get('Area', '').strip(),
+        centre=record.get('Centre', '').strip(),
+        name=record.get('Name', '').strip(),
+        phone_number=utils.clean_phone_number(record.get('Phone Number', '')),
+        address=record.get('Address', '').strip(),
+        attendant_type=record.get('Attendant Type', '').strip(),
+        photo_filename=record.get('Photo Filename', '').strip(),
+        sne_id=record.get('SNE ID', '').strip(),
+        sne_name=record.get('SNE Name', '').strip(),
+        sne_gender=record.get('SNE Gender', '').strip(),
+        sne_address=record.get('SNE Address', '').strip(),
+        sne_photo_filename=record.get('SNE Photo Filename', '').strip()
+    )
+
+
+# name: (label, model, ID column, sheet ID, service account file, headers, row mapping)
+TABLES = {
+    'sne': ('SNE Forms', SNEForm, 'badge_id',
+            config.SNE_SHEET_ID, config.SNE_SERVICE_ACCOUNT_FILE, config.SNE_SHEET_HEADERS, sne_row),
+    'blood': ('Blood Camp Donors', BloodCampDonor, 'donor_id',
+              config.BLOOD_CAMP_SHEET_ID, config.BLOOD_CAMP_SERVICE_ACCOUNT_FILE, config.BLOOD_CAMP_SHEET_HEADERS, blood_camp_row),
+    'attendant': ('Attendants', Attendant, 'badge_id',
+                  config.ATTENDANT_SHEET_ID, config.ATTENDANT_SERVICE_ACCOUNT_FILE, config.ATTENDANT_SHEET_HEADERS, attendant_row),
+}
+
+
+# --- Checkpoints ---
+# One row per migrated table, updated in the same transaction as each chunk, so a
+# resumed run continues exactly after the last committed chunk.
+checkpoint_table = Table(
+    'sheet_migration_checkpoints', MetaData(),
+    Column('table_name', String(50), primary_key=True),
+    Column('sheet_id', String(100), nullable=False),
+    Column('next_row', Integer, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+
+def load_checkpoint(table_name, sheet_id):
+    """Index of the first sheet record not yet processed (0 if none or sheet changed)"""
+    row = db.session.execute(
+        select(checkpoint_table.c.sheet_id, checkpoint_table.c.next_row)
+        .where(checkpoint_table.c.table_name == table_name)
+    ).first()
+    if not row:
         return 0
+    if row.sheet_id != sheet_id:
+        logger.warning(f"Checkpoint for {table_name} belongs to another sheet ({row.sheet_id}), starting from the top")
+        return 0
+    return row.next_row
+
+
+def save_checkpoint(table_name, sheet_id, next_row):
+    values = {'sheet_id': sheet_id, 'next_row': next_row, 'updated_at': datetime.now()}
+    updated = db.session.execute(
+        checkpoint_table.update().where(checkpoint_table.c.table_name == table_name).values(**values)
+    ).rowcount
+    if not updated:
+        db.session.execute(checkpoint_table.insert().values(table_name=table_name, **values))
+
+
+def clear_checkpoint(table_name):
+    db.session.execute(checkpoint_table.delete().where(checkpoint_table.c.table_name == table_name))
+    db.session.commit()
+
+
+# --- Bulk insert ---
+
+def _copy_literal(value):
+    # COPY CSV: unquoted empty field is NULL, everything else is quoted
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(table, rows):
+    """
+    PostgreSQL COPY FROM STDIN on the session's connection (same transaction).
+    Returns False if the driver has no COPY support so the caller can fall back.
+    """
+    cursor = db.session.connection().connection.cursor()
+    if not hasattr(cursor, 'copy_expert') and not hasattr(cursor, 'copy'):
+        return False
+    quote = db.engine.dialect.identifier_preparer.quote
+    columns = list(rows[0].keys())
+    sql = f"COPY {quote(table.name)} ({', '.join(quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)"
+    data = ''.join(','.join(_copy_literal(row[c]) for c in columns) + '\n' for row in rows)
+    if hasattr(cursor, 'copy_expert'):  # psycopg2
+        cursor.copy_expert(sql, io.StringIO(data))
+    else:  # psycopg 3
+        with cursor.copy(sql) as copy:
+            copy.write(data)
+    return True
+
+
+def insert_rows(table, rows, use_copy):
+    """Inserts a chunk: COPY on PostgreSQL, executemany (one INSERT, many parameter sets) elsewhere"""
+    if use_copy and copy_rows(table, rows):
+        return
+    db.session.execute(insert(table), rows)
+
+
+def insert_rows_individually(table, rows, id_column):
+    """Fallback for a chunk that failed as a whole: isolates the bad rows. Returns (inserted, errors)"""
+    inserted = errors = 0
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), [row])
+            inserted += 1
+        except Exception as e:
+            logger.error(f"{id_column} {row[id_column]}: insert failed: {getattr(e, 'orig', e)}")
+            errors += 1
+    return inserted, errors
+
 
+def migrate_table(name, dry_run=False, chunk_size=1000, restart=False):
+    """
+    Migrates one sheet into its table in chunks of chunk_size rows.
 
-def migrate_attendants(dry_run=False):
-    """Migrate Attendants from Google Sheets to PostgreSQL"""
+    Each chunk is inserted and checkpointed in one transaction. Rows whose ID already
+    exists in the table (or earlier in the sheet) are skipped, so re-running after a
+    failure - with or without the checkpoint - never duplicates records.
+    """
+    label, model, id_column, sheet_id, service_account_file, headers, to_row = TABLES[name]
+    table = model.__table__
     logger.info("\n" + "=" * 60)
-    logger.info("Migrating Attendants")
+    logger.info(f"Migrating {label}")
     logger.info("=" * 60)
-    
+
     try:
         logger.info("Fetching data from Google Sheets...")
-        sheet_data = utils.get_all_sheet_data(
-            config.ATTENDANT_SHEET_ID,
-            config.ATTENDANT_SERVICE_ACCOUNT_FILE,
-            config.ATTENDANT_SHEET_HEADERS
-        )
-        logger.info(f"Found {len(sheet_data)} records in Google Sheets")
-        
-        if dry_run:
+        started = time.perf_counter()
+        sheet_data = sheets_backend.get_all_sheet_data(sheet_id, service_account_file, headers)
+        logger.info(f"Found {len(sheet_data)} records in Google Sheets ({time.perf_counter() - started:.1f}s)")
+
+        if dry_run and sheet_data:
             logger.info("DRY RUN - No data will be written to database")
-            if sheet_data:
-                logger.info("\nSample record:")
-                sample = sheet_data[0]
-                for key, value in sample.items():
-                    logger.info(f"  {key}: {value[:50] if len(str(value)) > 50 else value}")
-            return len(sheet_data)
-        
-        migrated = 0
-        skipped = 0
-        errors = 0
-        
-        for idx, record in enumerate(sheet_data, 1):
+            logger.info("\nSample record:")
+            for key, value in sheet_data[0].items():
+                logger.info(f"  {key}: {value[:50] if len(str(value)) > 50 else value}")
+
+        if not dry_run:
+            checkpoint_table.create(db.session.connection(), checkfirst=True)
+            db.session.commit()
+            if restart:
+                clear_checkpoint(name)
+        start = 0 if (restart or dry_run) else load_checkpoint(name, sheet_id)
+        if start >= len(sheet_data) > 0:
+            logger.info(f"All {len(sheet_data)} records were processed by an earlier run (use --restart to rescan)")
+        elif start:
+            logger.info(f"Resuming from checkpoint at record {start + 1}")
+
+        # One query for all existing IDs instead of one per row
+        existing_ids = set(db.session.execute(select(getattr(model, id_column))).scalars())
+        use_copy = db.engine.dialect.name == 'postgresql'
+        now = datetime.utcnow()
+
+        migrated = skipped = errors = 0
+        started = time.perf_counter()
+        chunk = []
+        for idx in range(start, len(sheet_data)):
+            record = sheet_data[idx]
             try:
-                badge_id = record.get('Badge ID', '').strip()
-                if not badge_id:
-                    logger.warning(f"Row {idx}: Missing Badge ID, skipping")
-                    skipped += 1
-                    continue
-                
-                existing = Attendant.query.filter_by(badge_id=badge_id).first()
-                if existing:
-                    logger.debug(f"Badge ID {badge_id} already exists, skipping")
-                    skipped += 1
-                    continue
-                
-                attendant = Attendant(
-                    badge_id=badge_id,
-                    submission_date=parse_date(record.get('Submission Date')) or datetime.now().date(),
-                    area=record.get('Area', '').strip(),
-                    centre=record.get('Centre', '').strip(),
-                    name=record.get('Name', '').strip(),
-                    phone_number=utils.clean_phone_number(record.get('Phone Number', '')),
-                    address=record.get('Address', '').strip(),
-                    attendant_type=record.get('Attendant Type', '').strip(),
-                    photo_filename=record.get('Photo Filename', '').strip(),
-                    sne_id=record.get('SNE ID', '').strip(),
-                    sne_name=record.get('SNE Name', '').strip(),
-                    sne_gender=record.get('SNE Gender', '').strip(),
-                    sne_address=record.get('SNE Address', '').strip(),
-                    sne_photo_filename=record.get('SNE Photo Filename', '').strip()
-                )
-                
-                db.session.add(attendant)
-                migrated += 1
-                
-                if migrated % 100 == 0:
-                    db.session.commit()
-                    logger.info(f"Progress: {migrated}/{len(sheet_data)} records migrated")
-                
+                row = to_row(record)
             except Exception as e:
-                logger.error(f"Row {idx} (Badge ID: {record.get('Badge ID', 'N/A')}): {e}")
+                logger.error(f"Row {idx + 1} ({id_column}: {record.get('Badge ID') or record.get('Donor ID', 'N/A')}): {e}")
                 errors += 1
+                row = None
+            if row is not None:
+                if not row[id_column]:
+                    logger.warning(f"Row {idx + 1}: Missing {id_column}, skipping")
+                    skipped += 1
+                elif row[id_column] in existing_ids:
+                    logger.debug(f"{id_column} {row[id_column]} already exists, skipping")
+                    skipped += 1
+                else:
+                    # COPY skips column defaults, so set the timestamps here
+                    row['created_at'] = row['updated_at'] = now
+                    existing_ids.add(row[id_column])
+                    chunk.append(row)
+
+            if dry_run:
                 continue
-        
-        db.session.commit()
-        
-        logger.info(f"\nAttendants Migration Complete:")
-        logger.info(f"  ✓ Migrated: {migrated}")
+            if len(chunk) >= chunk_size or (idx == len(sheet_data) - 1):
+                if chunk:
+                    try:
+                        insert_rows(table, chunk, use_copy)
+                        migrated += len(chunk)
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.warning(f"Bulk insert of {len(chunk)} rows failed, inserting one by one: {e}")
+                        inserted, failed = insert_rows_individually(table, chunk, id_column)
+                        migrated += inserted
+                        errors += failed
+                save_checkpoint(name, sheet_id, idx + 1)
+                db.session.commit()
+                chunk = []
+                logger.info(f"Progress: {idx + 1}/{len(sheet_data)} records processed, {migrated} migrated")
+
+        elapsed = time.perf_counter() - started
+        if dry_run:
+            logger.info(f"\n{label} (dry run): {len(chunk)} would be migrated, {skipped} skipped, {errors} errors")
+            return len(chunk)
+
+        logger.info(f"\n{label} Migration Complete:")
+        logger.info(f"  ✓ Migrated: {migrated} ({migrated / elapsed if elapsed else 0:.0f} rows/s)")
         logger.info(f"  - Skipped:  {skipped}")
         logger.info(f"  ✗ Errors:   {errors}")
-        
         return migrated
-        
+
     except Exception as e:
-        logger.error(f"Fatal error migrating attendants: {e}", exc_info=True)
+        db.session.rollback()
+        logger.error(f"Fatal error migrating {label}: {e}", exc_info=True)
+        logger.error("Committed chunks are kept; re-run to resume from the last checkpoint")
         return 0
 
 
@@ -364,6 +374,10 @@ def main():
                        help='Test migration without writing to database')
     parser.add_argument('--table', choices=['sne', 'blood', 'attendant', 'all'],
                        default='all', help='Which table to migrate')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                       help='Rows inserted and committed per chunk (default: 1000)')
+    parser.add_argument('--restart', action='store_true',
+                       help='Ignore saved checkpoints and scan each sheet from the top')
     args = parser.parse_args()
     
     logger.info("=" * 60)
@@ -383,14 +397,9 @@ def main():
         total_migrated = 0
         
         # Migrate tables
-        if args.table in ['sne', 'all']:
-            total_migrated += migrate_sne_forms(args.dry_run)
-        
-        if args.table in ['blood', 'all']:
-            total_migrated += migrate_blood_camp(args.dry_run)
-        
-        if args.table in ['attendant', 'all']:
-            total_migrated += migrate_attendants(args.dry_run)
+        for name in TABLES:
+            if args.table in [name, 'all']:
+                total_migrated += migrate_table(name, args.dry_run, args.chunk_size, args.restart)
         
         # Summary
         logger.info("\n" + "=" * 60)
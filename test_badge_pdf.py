@@ -0,0 +1,110 @@
+"""
+Badge PDF tests: layered SNE badges embed photos at print resolution, whatever size they were stored at.
+Run with: python -m pytest test_badge_pdf.py
+"""
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SECRET_KEY', 'test-badge-pdf')
+
+import pytest
+from PIL import Image
+
+from app import config, utils
+
+
+def sne_layout(vector_text):
+    return {
+        "template_path": config.SNE_BADGE_TEMPLATE_PATH,
+        "background_asset": config.SNE_BADGE_ASSET_PATH,
+        "text_elements": config.SNE_TEXT_ELEMENTS,
+        "photo_config": {
+            'paste_x': config.SNE_PHOTO_PASTE_X_PX,
+            'paste_y': config.SNE_PHOTO_PASTE_Y_PX,
+            'box_w': config.SNE_PHOTO_BOX_WIDTH_PX,
+            'box_h': config.SNE_PHOTO_BOX_HEIGHT_PX,
+            's3_key_field': 'Photo Filename'
+        },
+        "pdf_layout": {
+            'orientation': 'L', 'unit': 'mm', 'format': 'A4',
+            'badge_w_mm': config.SNE_BADGE_SIZE_MM[0], 'badge_h_mm': config.SNE_BADGE_SIZE_MM[1], 'margin_mm': 15, 'gap_mm': 0
+        },
+        "font_path": config.FONT_PATH,
+        "font_bold_path": config.FONT_BOLD_PATH,
+        "s3_bucket": 'test-bucket',
+        "wrap_config": {'field_key': 'address', 'width': 20, 'spacing': 10},
+        "vector_text": vector_text
+    }
+
+
+BADGE = {
+    "badge_id": "SNE-AH-061001", "name": "RAM KUMAR", "gender": "MALE", "age": 75,
+    "centre": "CHD-I (SEC 27)", "area": "CHANDIGARH", "address": "HOUSE 12, SECTOR 27 CHANDIGARH PUNJAB",
+    "Photo Filename": "sne_photos/photo.jpg",
+}
+
+
+def camera_jpeg(size):
+    """A noisy photo-like JPEG, so its encoded size grows with its pixel count as a camera's does"""
+    noise = Image.effect_noise(size, 60).convert('RGB')
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    output = BytesIO()
+    Image.blend(noise, gradient, 0.5).save(output, 'JPEG', quality=92)
+    return output.getvalue()
+
+
+@pytest.fixture
+def stored_photo(monkeypatch):
+    """Serves the photo bytes put into the returned dict as the badge's S3 object"""
+    photo = {}
+
+    class FakeS3:
+        def get_object(self, Bucket, Key):
+            return {'Body': BytesIO(photo['bytes'])}
+
+    monkeypatch.setattr(utils, 'get_s3_client', lambda: FakeS3())
+    return photo
+
+
+@pytest.mark.parametrize('vector_text', [True, False])
+def test_oversized_photo_is_downscaled_for_print(stored_photo, vector_text):
+    # Box-sized photo as stored by ingest (template pixels)
+    stored_photo['bytes'] = camera_jpeg((config.SNE_PHOTO_BOX_WIDTH_PX, config.SNE_PHOTO_BOX_HEIGHT_PX))
+    box_sized_pdf = utils.generate_badge_pdf([BADGE], sne_layout(vector_text)).getvalue()
+
+    # 12MP camera original stored before ingest existed
+    stored_photo['bytes'] = camera_jpeg((3000, 4000))
+    assert len(stored_photo['bytes']) > 2 * 1024 * 1024
+    oversized_pdf = utils.generate_badge_pdf([BADGE], sne_layout(vector_text)).getvalue()
+
+    assert len(oversized_pdf) < len(box_sized_pdf) + 512 * 1024
+
+
+@pytest.mark.parametrize('text', ["RAM KUMAR", "CHD-I (SEC 27)", "SNE-AH-061001"])
+def test_text_width_matches_across_text_modes(monkeypatch, text):
+    """The raster text layer and vector text stretch text the same way (BADGE_VECTOR_TEXT must not move the layout)"""
+    from fpdf import FPDF
+    placed = {'text': [], 'image': []}
+    original_text, original_image = FPDF.text, FPDF.image
+
+    def record_text(pdf, x, y, txt='', *args, **kwargs):
+        placed['text'].append(pdf.get_string_width(txt))
+        return original_text(pdf, x, y, txt, *args, **kwargs)
+
+    def record_image(pdf, name, *args, **kwargs):
+        if isinstance(name, BytesIO): # The text layer; the background is placed by path
+            placed['image'].append(kwargs['w'])
+        return original_image(pdf, name, *args, **kwargs)
+
+    monkeypatch.setattr(FPDF, 'text', record_text)
+    monkeypatch.setattr(FPDF, 'image', record_image)
+    badge = {'name': text} # Only one line, so the cropped text layer is that line
+
+    utils.generate_badge_pdf([badge], sne_layout(vector_text=True))
+    utils.generate_badge_pdf([badge], sne_layout(vector_text=False))
+
+    (vector_width,), (raster_width,) = placed['text'], placed['image']
+    # Ink box vs advance width and hinting at print resolution differ by a few percent at most
+    assert raster_width == pytest.approx(vector_width, rel=0.04)
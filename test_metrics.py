@@ -0,0 +1,99 @@
+"""
+Request metrics tests: S3 time of inline photo uploads is attributed to the request, and a
+scrape adds up the totals of all workers.
+Run with: python -m pytest test_metrics.py
+"""
+import os
+import sys
+import subprocess
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SECRET_KEY', 'test-metrics')
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from app import config, metrics, utils
+
+
+@pytest.fixture
+def s3_client(monkeypatch, tmp_path):
+    """A real S3 client with metrics hooks, answering PutObject from a Stubber"""
+    monkeypatch.setattr(config, 'METRICS_DIR', str(tmp_path))
+    client = boto3.client('s3', region_name='ap-south-1', aws_access_key_id='test', aws_secret_access_key='test')
+    metrics.instrument_s3_client(client)
+    monkeypatch.setattr(utils, 'get_s3_client', lambda: client)
+    with Stubber(client) as stubber:
+        yield client, stubber
+
+
+def test_inline_upload_counts_towards_request_s3_time(s3_client, monkeypatch):
+    client, stubber = s3_client
+    stubber.add_response('put_object', {})
+    monkeypatch.setattr(config, 'PHOTO_INGEST_ENABLED', False) # Raw upload: one PutObject
+
+    app = Flask(__name__)
+    metrics.init_app(app)
+    request_s3 = {}
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        photo = FileStorage(BytesIO(b'\xff\xd8photo'), filename='photo.jpg', content_type='image/jpeg')
+        key = utils.handle_photo_upload(photo, 'test-bucket', 'sne_photos', '123412341234')
+        from flask import g
+        request_s3['calls'], request_s3['seconds'] = g.metrics_components['s3']
+        return key
+
+    response = app.test_client().post('/upload')
+
+    assert response.status_code == 200 and response.get_data(as_text=True).startswith('sne_photos/')
+    stubber.assert_no_pending_responses()
+    # The upload is one S3 call of the request, whichever thread s3transfer sent the PutObject from
+    assert request_s3['calls'] == 1
+    assert request_s3['seconds'] > 0
+    assert ('upload',) in metrics._histograms['http_request_s3_seconds']
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def scraped_value(text, line_prefix):
+    values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_prefix)]
+    assert len(values) == 1, values
+    return float(values[0])
+
+
+def test_scrape_adds_up_all_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(config, 'METRICS_DIR', str(tmp_path))
+    labels = ('test.other_workers', 'GET', '200')
+    requests_line = 'rssb_http_requests_total{endpoint="test.other_workers",method="GET",status="200"}'
+    count_line = 'rssb_http_request_duration_seconds_count{endpoint="test.other_workers",method="GET"}'
+
+    metrics._inc('http_requests_total', labels)
+    metrics._observe('http_request_duration_seconds', labels[:2], 0.2)
+    own_requests = scraped_value(metrics.render_prometheus(), requests_line)
+
+    # Another running worker, and one that has exited since its last flush
+    for pid, requests in ((os.getppid(), 3), (exited_pid(), 4)):
+        metrics._dump(str(tmp_path / metrics._worker_filename(pid, 1000.0)),
+                      {'http_requests_total': {labels: requests}},
+                      {'http_request_duration_seconds': {labels[:2]: [0] * 6 + [requests] + [0] * 6 + [requests, 0.2 * requests]}},
+                      pid=pid, started_at=1000.0)
+
+    scraped = metrics.render_prometheus()
+    assert scraped_value(scraped, requests_line) == own_requests + 7
+    assert scraped_value(scraped, count_line) == own_requests + 7
+    assert f'rssb_process_info{{pid="{os.getppid()}"}} 1' in scraped
+
+    # The exited worker's totals were retired, not dropped
+    assert (tmp_path / metrics.RETIRED_FILE).exists()
+    assert len(list(tmp_path.glob('worker-*.json'))) == 2  # This worker and the running one
+    assert scraped_value(metrics.render_prometheus(), requests_line) == own_requests + 7
@@ -0,0 +1,71 @@
+"""
+Photo storage tests: a deleted photo takes its thumbnail and kept original (PHOTO_KEEP_ORIGINAL) with it.
+Run with: python -m pytest test_photo_storage.py
+"""
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SECRET_KEY', 'test-photo-storage')
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app import config, utils
+
+
+class FakeS3:
+    """A bucket in a dict: key -> (bytes, content type)"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_fileobj(self, stream, bucket, key, ExtraArgs=None, Config=None):
+        self.objects[key] = (stream.read(), (ExtraArgs or {}).get('ContentType'))
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete['Objects']:
+            self.objects.pop(item['Key'], None)
+        return {}
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(utils, 'get_s3_client', lambda: fake)
+    monkeypatch.setattr(config, 'PHOTO_INGEST_ENABLED', True)
+    monkeypatch.setattr(config, 'PHOTO_KEEP_ORIGINAL', True)
+    return fake
+
+
+def png_upload():
+    output = BytesIO()
+    Image.new('RGB', (600, 800), (200, 120, 40)).save(output, 'PNG')
+    output.seek(0)
+    return FileStorage(output, filename='camera photo.PNG', content_type='image/png')
+
+
+def test_kept_original_is_stored_at_a_key_derived_from_the_photo_key(s3):
+    upload = png_upload()
+    key = utils.handle_photo_upload(upload, 'test-bucket', 'sne_photos', '123412341234')
+
+    assert key.startswith('sne_photos/') and key.endswith('.jpg')
+    assert set(s3.objects) == {key, utils.thumbnail_s3_key(key), utils.original_photo_s3_key(key)}
+    assert s3.objects[utils.original_photo_s3_key(key)] == (upload.stream.getvalue(), 'image/png')
+
+
+def test_deleting_a_photo_deletes_its_thumbnail_and_original(s3):
+    kept = utils.handle_photo_upload(png_upload(), 'test-bucket', 'sne_photos', '111111111111')
+    key = utils.handle_photo_upload(png_upload(), 'test-bucket', 'sne_photos', '123412341234')
+    # An original kept before its key was fixed, under the upload's extension
+    legacy_original = f"originals/{key.rsplit('.', 1)[0]}.png"
+    s3.objects[legacy_original] = (b'png', 'image/png')
+
+    assert utils.delete_s3_object('test-bucket', key)
+
+    assert set(s3.objects) == {kept, utils.thumbnail_s3_key(kept), utils.original_photo_s3_key(kept)}
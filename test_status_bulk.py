@@ -0,0 +1,70 @@
+"""
+Bulk donor status updates (/blood_camp/update_status_bulk): per-entry results and the batch limit.
+Run with: python -m pytest test_status_bulk.py
+"""
+import datetime
+import uuid
+
+from app.models import db, BloodCampDonor
+
+
+def add_donor(app):
+    """A pending donor with a fresh donor ID"""
+    with app.app_context():
+        donor_id = f"BD{uuid.uuid4().int % 10**8:08d}"
+        db.session.add(BloodCampDonor(donor_id=donor_id, submission_timestamp=datetime.datetime.utcnow(),
+                                      name_of_donor='Test Donor', mobile_number='9876543210', status=''))
+        db.session.commit()
+    return donor_id
+
+
+def donor_status(app, donor_id):
+    with app.app_context():
+        donor = BloodCampDonor.query.filter_by(donor_id=donor_id).one()
+        return donor.status, donor.reason_for_rejection
+
+
+def test_results_split_into_updated_not_found_and_invalid(app, admin_client):
+    accepted, rejected = add_donor(app), add_donor(app)
+    updates = [
+        {"donor_id": accepted.lower(), "status": "accepted"},
+        {"donor_id": rejected, "status": "Rejected", "reason": "Low Hb"},
+        {"donor_id": "BD99999999999", "status": "Accepted"},
+        {"donor_id": accepted, "status": "Rejected"},  # No reason
+        {"donor_id": "not-an-id", "status": "Accepted"},
+        {"donor_id": accepted, "status": "Deferred"},
+        "not an object",
+    ]
+
+    response = admin_client.post('/blood_camp/update_status_bulk', json={"updates": updates})
+
+    body = response.get_json()
+    assert response.status_code == 200 and body['success']
+    assert [result['result'] for result in body['results']] == [
+        'updated', 'updated', 'not_found', 'invalid', 'invalid', 'invalid', 'invalid']
+    assert body['updated'] == 2
+    assert body['results'][0]['donor_id'] == accepted
+    assert all(result['message'] for result in body['results'] if result['result'] == 'invalid')
+    assert donor_status(app, accepted)[0] == 'Accepted'
+    assert donor_status(app, rejected) == ('Rejected', 'Low Hb')
+
+
+def test_more_than_status_bulk_max_updates_are_refused(app, admin_client, monkeypatch):
+    donor_id = add_donor(app)
+    monkeypatch.setattr('app.config.STATUS_BULK_MAX', 2)
+
+    at_limit = admin_client.post('/blood_camp/update_status_bulk',
+                                 json={"updates": [{"donor_id": donor_id, "status": "Accepted"}] * 2})
+    over_limit = admin_client.post('/blood_camp/update_status_bulk',
+                                   json={"updates": [{"donor_id": donor_id, "status": "Rejected", "reason": "Low Hb"}] * 3})
+
+    assert at_limit.status_code == 200
+    assert over_limit.status_code == 400
+    assert not over_limit.get_json()['success']
+    assert donor_status(app, donor_id)[0] == 'Accepted'
+
+
+def test_empty_or_malformed_request_is_refused(admin_client):
+    for payload in ({}, {"updates": []}, {"updates": "BD0001"}):
+        response = admin_client.post('/blood_camp/update_status_bulk', json=payload)
+        assert response.status_code == 400
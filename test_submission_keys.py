@@ -0,0 +1,176 @@
+"""
+Idempotent form submissions: a resubmitted form (double-click, retry, resent sync batch)
+is recorded once and answers with the ID of the first submission.
+Run with: python -m pytest test_submission_keys.py
+"""
+import datetime
+import random
+import uuid
+
+import pytest
+
+from app import db_helpers
+from app.models import BloodCampDonor, SNEForm, SubmissionKey
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def donor_form(**overrides):
+    form = {
+        'donor_name': 'Ravi Kumar', 'father_husband_name': 'Mohan Lal', 'dob': '1990-01-01', 'gender': 'Male',
+        'city': 'Zirakpur', 'blood_group': 'A+', 'donation_location': 'Zirakpur', 'allow_call': 'Yes',
+        'donation_date': datetime.date.today().isoformat(),
+        'mobile_no': f"9{random.randrange(10**9):09d}",
+    }
+    form.update(overrides)
+    return form
+
+
+def sne_form(**overrides):
+    form = {
+        'area': 'Chandigarh', 'satsang_place': 'CHD-I (Sec 27)', 'first_name': 'Ram', 'last_name': 'Singh',
+        'father_husband_name': 'Sher Singh', 'gender': 'Male', 'dob': '1950-01-01',
+        'emergency_contact_name': 'Gurpreet', 'emergency_contact_number': '9999999999',
+        'emergency_contact_relation': 'Son', 'address': 'House 1, Sector 27', 'state': 'Punjab',
+        'aadhaar_no': f"{random.randrange(10**11, 10**12)}",
+    }
+    form.update(overrides)
+    return form
+
+
+def rows(app, model, **filters):
+    with app.app_context():
+        return model.query.filter_by(**filters).all()
+
+
+def recorded_id(app, kind, key):
+    with app.app_context():
+        return db_helpers.get_submission_record_ids(kind, [key]).get(key)
+
+
+# --- Form submit replay ---
+
+def test_resubmitted_donor_form_is_recorded_once(app, admin_client):
+    form = donor_form(submission_key=new_key())
+
+    admin_client.post('/blood_camp/submit', data=form)
+    replay = admin_client.post('/blood_camp/submit', data=form, follow_redirects=True)
+
+    donors = rows(app, BloodCampDonor, mobile_number=form['mobile_no'])
+    assert len(donors) == 1
+    assert recorded_id(app, db_helpers.SUBMISSION_KIND_BLOOD_CAMP, form['submission_key']) == donors[0].donor_id
+    assert f"already submitted. Donor ID: {donors[0].donor_id}" in replay.get_data(as_text=True)
+
+
+def test_resubmitted_sne_form_is_recorded_once(app, admin_client):
+    form = sne_form(submission_key=new_key())
+
+    admin_client.post('/sne/submit', data=form)
+    replay = admin_client.post('/sne/submit', data=form, follow_redirects=True)
+
+    records = rows(app, SNEForm, aadhaar_no=form['aadhaar_no'])
+    assert len(records) == 1
+    assert f"already submitted. Badge ID: {records[0].badge_id}" in replay.get_data(as_text=True)
+
+
+# --- Lost race: the key is recorded between the check and the insert ---
+
+def test_donor_insert_with_recorded_key_reports_duplicate_submission(app):
+    key = new_key()
+    form = donor_form()
+    with app.app_context():
+        first, success, _ = db_helpers.create_blood_donor(
+            db_helpers.get_next_donor_id_postgres(prefix="BD"), form['mobile_no'], 'Ravi Kumar', submission_key=key)
+        assert success
+        first_id = first.donor_id
+
+        # A concurrent request that passed the pre-check with the same key
+        second, success, error = db_helpers.create_blood_donor(
+            db_helpers.get_next_donor_id_postgres(prefix="BD"), form['mobile_no'], 'Ravi Kumar', submission_key=key)
+
+    assert (second, success, error) == (None, False, "DUPLICATE_SUBMISSION")
+    assert [donor.donor_id for donor in rows(app, BloodCampDonor, mobile_number=form['mobile_no'])] == [first_id]
+    assert recorded_id(app, db_helpers.SUBMISSION_KIND_BLOOD_CAMP, key) == first_id
+
+
+def test_sne_insert_with_recorded_key_reports_duplicate_submission(app):
+    from app.routes.sne_routes import _sne_fields
+    key = new_key()
+    with app.app_context():
+        _, success, _ = db_helpers.create_sne_form(badge_id=f"SNE-T-{new_key()[:8]}", submission_key=key,
+                                                   **_sne_fields(sne_form(), 'N/A'))
+        assert success
+        first_id = db_helpers.get_submission_record_ids(db_helpers.SUBMISSION_KIND_SNE, [key])[key]
+
+        second, success, error = db_helpers.create_sne_form(badge_id=f"SNE-T-{new_key()[:8]}", submission_key=key,
+                                                            **_sne_fields(sne_form(), 'N/A'))
+
+    assert (second, success, error) == (None, False, "DUPLICATE_SUBMISSION")
+    assert recorded_id(app, db_helpers.SUBMISSION_KIND_SNE, key) == first_id
+    with app.app_context():
+        assert SubmissionKey.query.filter_by(kind=db_helpers.SUBMISSION_KIND_SNE, key=key).count() == 1
+
+
+# --- Sync batches ---
+
+@pytest.mark.parametrize('url, kind, make_form, id_field, model', [
+    ('/blood_camp/sync', db_helpers.SUBMISSION_KIND_BLOOD_CAMP, donor_form, 'donor_id', BloodCampDonor),
+    ('/sne/sync', db_helpers.SUBMISSION_KIND_SNE, sne_form, 'badge_id', SNEForm),
+])
+def test_resent_sync_batch_returns_the_same_ids(app, admin_client, url, kind, make_form, id_field, model):
+    entries = [{'key': new_key(), 'form': make_form()} for _ in range(3)]
+    id_column = getattr(model, id_field)
+    with app.app_context():
+        count_before = model.query.count()
+
+    first = admin_client.post(url, json={'entries': entries}).get_json()
+    resent = admin_client.post(url, json={'entries': entries}).get_json()
+
+    assert [result['result'] for result in first['results']] == ['created'] * 3
+    assert [result['result'] for result in resent['results']] == ['already_synced'] * 3
+    assert [result[id_field] for result in resent['results']] == [result[id_field] for result in first['results']]
+    assert resent['created'] == 0
+    with app.app_context():
+        assert model.query.count() == count_before + 3
+        assert model.query.filter(id_column.in_([result[id_field] for result in first['results']])).count() == 3
+
+
+@pytest.mark.parametrize('url, make_form, id_field, model', [
+    ('/blood_camp/sync', donor_form, 'donor_id', BloodCampDonor),
+    ('/sne/sync', sne_form, 'badge_id', SNEForm),
+])
+def test_key_repeated_within_a_batch_is_created_once(app, admin_client, url, make_form, id_field, model):
+    key = new_key()
+    form = make_form()
+    with app.app_context():
+        count_before = model.query.count()
+
+    response = admin_client.post(url, json={'entries': [{'key': key, 'form': form}, {'key': key, 'form': form}]}).get_json()
+
+    first, repeat = response['results']
+    assert (first['result'], repeat['result']) == ('created', 'already_synced')
+    assert first[id_field] == repeat[id_field]
+    assert response['created'] == 1
+    with app.app_context():
+        assert model.query.count() == count_before + 1
+
+
+def test_synced_sne_records_report_photo_pending(admin_client):
+    response = admin_client.post('/sne/sync', json={'entries': [{'key': new_key(), 'form': sne_form()}]}).get_json()
+    assert response['results'][0]['photo_pending'] is True
+
+
+def test_repeat_donor_later_in_the_batch_counts_the_earlier_donation(app, admin_client):
+    mobile = donor_form()['mobile_no']
+    entries = [
+        {'key': new_key(), 'form': donor_form(mobile_no=mobile, donation_date='2026-01-05')},
+        {'key': new_key(), 'form': donor_form(mobile_no=mobile, donation_date='2026-06-05')},
+    ]
+
+    admin_client.post('/blood_camp/sync', json={'entries': entries})
+
+    donations = sorted(rows(app, BloodCampDonor, mobile_number=mobile), key=lambda donor: donor.donation_date)
+    assert [donor.total_donations for donor in donations] == [1, 2]
+    assert {donor.first_donation_date for donor in donations} == {datetime.date(2026, 1, 5)}
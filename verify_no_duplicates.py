@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import app utilities
-from app import utils, config
+from app import sheets_backend, config
 
 def check_blood_camp_duplicates():
     """Check for duplicate Donor IDs in Blood Camp sheet"""
@@ -21,7 +21,7 @@ def check_blood_camp_duplicates():
     print("=" * 70)
     
     try:
-        sheet = utils.get_sheet(
+        sheet = sheets_backend.get_sheet(
             config.BLOOD_CAMP_SHEET_ID,
             config.BLOOD_CAMP_SERVICE_ACCOUNT_FILE,
             read_only=True
@@ -70,7 +70,7 @@ def check_sne_duplicates():
     print("=" * 70)
     
     try:
-        sheet = utils.get_sheet(
+        sheet = sheets_backend.get_sheet(
             config.SNE_SHEET_ID,
             config.SNE_SERVICE_ACCOUNT_FILE,
             read_only=True
@@ -119,7 +119,7 @@ def check_attendant_duplicates():
     print("=" * 70)
     
     try:
-        sheet = utils.get_sheet(
+        sheet = sheets_backend.get_sheet(
             config.ATTENDANT_SHEET_ID,
             config.ATTENDANT_SERVICE_ACCOUNT_FILE,
             read_only=True